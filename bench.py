@@ -0,0 +1,774 @@
+"""
+Benchmarks for the services, each run against local data or a local stub server.
+
+Run from the repository root:
+
+    python bench.py                 # list the benchmarks
+    python bench.py <name> [args]   # run one
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple, Union
+
+# The services refuse to load without API keys; the benchmarks only talk to local stubs.
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("SERPAPI_API_KEY", "bench")
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(function: Callable) -> Callable:
+    """Register bench_<name> as benchmark <name>; it receives the remaining command-line arguments."""
+    BENCHMARKS[function.__name__[len("bench_"):]] = function
+    return function
+
+
+def serve(respond: Callable[[BaseHTTPRequestHandler], Tuple[int, Dict[str, str], Union[bytes, str]]]) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start a local HTTP server whose GET and POST requests are answered by
+    respond(handler), a (status, headers, body) tuple. The handler's rfile still
+    holds the request body. Returns the server and its base URL.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self):
+            status, headers, body = respond(self)
+            body = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = _reply
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@benchmark
+def bench_ai_service(calls: str = "200"):
+    """Per-call overhead of AIChatService against a local OpenAI-compatible stub."""
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from langchain_openai import ChatOpenAI
+
+    from config.settings import settings
+    from prompts.summarizer_prompt import SUMMARIZER_PROMPT
+    from services.ai_service import AIChatService
+
+    def respond(handler):
+        request = json.loads(handler.rfile.read(int(handler.headers["Content-Length"])))
+        tokens = ["Stub ", "answer ", "from ", "the ", "local ", "server."]
+        if request.get("stream"):
+            events = [{"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": request["model"],
+                       "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None}]}
+                      for token in tokens]
+            return 200, {"Content-Type": "text/event-stream"}, "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return 200, {"Content-Type": "application/json"}, json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(tokens)}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    server, base_url = serve(respond)
+    base_url += "/v1"
+    calls = int(calls)
+
+    async def unpooled_call():
+        # What every request used to do: a fresh model, prompt and chain.
+        llm = ChatOpenAI(model=settings.OPENAI_LINK_MODEL, temperature=0.7, streaming=False,
+                         openai_api_key="stub", openai_api_base=base_url)
+        prompt = PromptTemplate(template=SUMMARIZER_PROMPT, input_variables=["question", "urls"])
+        return await (prompt | llm | StrOutputParser()).ainvoke({"question": "q", "urls": "https://example.com"})
+
+    async def measure():
+        service = AIChatService()
+        service.api_key, service.base_url = "stub", base_url
+        cache, service.cache = service.cache, None
+        pooled_call = lambda: service.get_relevant_link_summary("q", ["https://example.com"])
+        cached_service = AIChatService()
+        cached_service.api_key, cached_service.base_url, cached_service.cache = "stub", base_url, cache
+        cached_call = lambda: cached_service.get_relevant_link_summary("q", ["https://example.com"])
+
+        for name, call in (("per-request clients", unpooled_call), ("pooled clients", pooled_call), ("cached answers", cached_call)):
+            await call()  # warm up
+            started = time.perf_counter()
+            for _ in range(calls):
+                await call()
+            sequential = (time.perf_counter() - started) / calls
+            started = time.perf_counter()
+            await asyncio.gather(*(call() for _ in range(calls)))
+            concurrent = (time.perf_counter() - started) / calls
+            print(f"{name:20} sequential {sequential * 1000:6.2f} ms/call, concurrent {concurrent * 1000:6.2f} ms/call")
+
+        streamed = [json.loads(chunk) async for chunk in service.ai_chat_response("q", "info")]
+        print(f"streamed {len(streamed) - 1} tokens: {streamed[-1]['response']!r}")
+        if cache is not None:
+            print(f"cache: {cache.metrics()}")
+
+    asyncio.run(measure())
+    server.shutdown()
+
+
+@benchmark
+def bench_search_service(concurrent: str = "50"):
+    """Coalescing and caching of AISearchTools' async searches against a local SerpAPI stub."""
+    from urllib.parse import parse_qs, urlparse
+
+    from config.settings import settings
+    from services.search_service import search_service
+
+    upstream_calls = []
+
+    def respond(handler):
+        query = parse_qs(urlparse(handler.path).query)["q"][0]
+        upstream_calls.append(query)
+        time.sleep(0.2)  # upstream latency
+        return 200, {"Content-Type": "application/json"}, json.dumps({"organic_results": [
+            {"title": f"{query} result {i}", "link": f"https://example.com/{i}", "snippet": "..."} for i in range(3)
+        ]})
+
+    server, base_url = serve(respond)
+    settings.SERPAPI_BASE_URL = f"{base_url}/search.json"
+    concurrent = int(concurrent)
+
+    async def measure():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(search_service.advanced_search_async("acme annual report") for _ in range(concurrent)))
+        elapsed = time.perf_counter() - started
+        coalesced_calls = len(upstream_calls)
+        started = time.perf_counter()
+        await search_service.advanced_search_async("ACME  annual report")
+        cached = time.perf_counter() - started
+        await search_service.get_organization_website_async("Acme")
+        print(f"{concurrent} concurrent identical searches: {elapsed * 1000:.0f} ms, {coalesced_calls} upstream call(s); "
+              f"cached repeat: {cached * 1000:.2f} ms; {len(results[0]['results'])} results each")
+        print(f"upstream calls: {upstream_calls}, single-flight: {search_service.single_flight.stats}, cache: {search_service.cache.stats}")
+
+    asyncio.run(measure())
+    server.shutdown()
+
+
+@benchmark
+def bench_embedding_cache():
+    """Cold and warm CachedEmbeddings runs over a deterministic local fake embedding model."""
+    import tempfile
+
+    import numpy as np
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from services.embedding_cache import CachedEmbeddings
+
+    class CountingFakeEmbeddings(DeterministicFakeEmbedding):
+        calls: int = 0
+        texts: int = 0
+        model: str = "fake-embedding"
+
+        def embed_documents(self, texts):
+            time.sleep(0.05)  # request latency
+            self.calls += 1
+            self.texts += len(texts)
+            return super().embed_documents(texts)
+
+    boilerplate = ["Accept cookies", "Privacy policy", "Contact us"]
+    chunks = [f"Chunk {i} of the annual report." for i in range(2000)] + boilerplate * 100
+
+    with tempfile.TemporaryDirectory() as directory:
+        fake = CountingFakeEmbeddings(size=256)
+        embeddings = CachedEmbeddings(fake, directory=directory, batch_size=128, max_concurrency=4)
+        started = time.perf_counter()
+        first = embeddings.embed_documents(chunks)
+        cold = time.perf_counter() - started
+        print(f"cold: {len(chunks)} chunks, {fake.texts} embedded in {fake.calls} calls, {cold * 1000:.0f} ms")
+
+        # A new process: a fresh wrapper reopens the memory-mapped file.
+        fake.calls = fake.texts = 0
+        embeddings = CachedEmbeddings(fake, directory=directory)
+        started = time.perf_counter()
+        second = asyncio.run(embeddings.aembed_documents(chunks + ["A new chunk."]))
+        warm = time.perf_counter() - started
+        print(f"warm: {fake.texts} embedded in {fake.calls} calls, {warm * 1000:.0f} ms, stats {embeddings.stats}")
+
+        expected = fake.embed_documents(chunks[:5] + boilerplate)
+        assert np.allclose(first[:5] + first[2000:2003], expected, atol=1e-6)
+        assert np.allclose(second[:len(chunks)], first)
+        print("vectors match the uncached model (float32 precision)")
+
+
+@benchmark
+def bench_dom_cleaner(*args):
+    """Single-pass DOMCleaner against the per-selector implementation on a synthetic page and any HTML files given."""
+    import timeit
+    from urllib.parse import urljoin
+
+    from bs4 import BeautifulSoup, NavigableString
+
+    from services.dom_cleaner import REMOVE_SELECTORS, REMOVE_TAGS, dom_cleaner
+
+    def select_based_extract(html, url):
+        soup = BeautifulSoup(html, 'html.parser')
+        for selector in REMOVE_SELECTORS:
+            for element in soup.select(selector):
+                element.decompose()
+        for element in soup(REMOVE_TAGS):
+            element.decompose()
+        link_map = {}
+        for link in soup.find_all('a', href=True):
+            full_url = urljoin(url, link['href'])
+            if full_url.startswith(('http://', 'https://')):
+                anchor_text = link.get_text(strip=True)
+                if anchor_text:
+                    link_map[link] = (full_url, anchor_text)
+        for link, (full_url, anchor_text) in link_map.items():
+            link.replace_with(NavigableString(f'[{anchor_text}]({full_url})'))
+        for element in soup.find_all():
+            if not element.get_text(strip=True):
+                element.decompose()
+        text_content = soup.get_text(separator='\n', strip=True)
+        text_lines = [line.strip() for line in text_content.split('\n') if line.strip()]
+        return '\n'.join(text_lines), {full_url for full_url, _ in link_map.values()}
+
+    def synthetic_page(sections=200, depth=12):
+        parts = ['<html><head><title>Fixture</title><meta charset="utf-8"></head><body>',
+                 '<header class="site-header"><nav><a href="/">Home</a></nav></header>']
+        for i in range(sections):
+            opening = ''.join(f'<div class="wrap-{d}">' for d in range(depth))
+            parts.append(
+                f'{opening}<h2>Section {i}</h2><p>Paragraph {i} with <a href="/page/{i}">a link</a>'
+                f' and <b>bold</b> text.</p><div class="sidebar-box">Related</div>'
+                f'<form><input type="text"></form><span> </span><div><i></i></div>'
+                f'<TYPE type="Submit">x</TYPE>{"</div>" * depth}'
+            )
+        parts.append('<footer id="page-footer">Footer</footer><script>var x = 1;</script></body></html>')
+        return ''.join(parts)
+
+    corpus = {'synthetic': synthetic_page()}
+    for path in args:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            corpus[path] = f.read()
+
+    for name, html in corpus.items():
+        url = 'https://example.com/'
+        expected = select_based_extract(html, url)
+        actual = dom_cleaner.extract(html, url)
+        old = min(timeit.repeat(lambda: select_based_extract(html, url), number=1, repeat=3))
+        new = min(timeit.repeat(lambda: dom_cleaner.extract(html, url), number=1, repeat=3))
+        print(f"{name}: {len(html)} bytes, output matches: {expected == actual}, "
+              f"select-based {old * 1000:.1f} ms, single-pass {new * 1000:.1f} ms, speedup {old / new:.1f}x")
+
+
+@benchmark
+def bench_url_canonicalizer(path: str = "organized_urls.json"):
+    """Fetches saved by canonicalising the URLs of a saved crawl."""
+    import json
+
+    from services.url_canonicalizer import url_key
+
+    with open(path) as f:
+        organized = json.load(f)
+
+    base_url = organized["base_url"]
+    raw_urls = set()
+    for group, items in organized.items():
+        if not isinstance(items, list):
+            continue
+        prefix = base_url.rstrip("/") + ("" if group == "/" else group) + "/"
+        for item in items:
+            raw_urls.add(base_url if item == "home" else prefix + item)
+
+    keys = {url_key(url) for url in raw_urls}
+    saved = len(raw_urls) - len(keys)
+    print(f"{path}: {len(raw_urls)} raw URLs, {len(keys)} distinct documents, "
+          f"{saved} fetches saved ({saved / len(raw_urls):.0%})")
+
+
+@benchmark
+def bench_visited_set(count: str = "1000000"):
+    """Memory and speed of the visited-set backends against a plain set."""
+    from services.visited_set import FingerprintSet, ScalableBloomFilter, set_memory_usage
+
+    count = int(count)
+    urls = [f"example.com/section-{i % 1000}/article-{i}?page={i % 7}" for i in range(count)]
+    absent = [f"example.org/missing-{i}" for i in range(count // 10)]
+
+    backends = [
+        ('set', set()),
+        ('fingerprint', FingerprintSet()),
+        ('bloom', ScalableBloomFilter()),
+    ]
+    for name, visited in backends:
+        started = time.perf_counter()
+        for url in urls:
+            visited.add(url)
+        added = time.perf_counter() - started
+
+        started = time.perf_counter()
+        misses = sum(url not in visited for url in urls)
+        false_positives = sum(url in visited for url in absent)
+        lookups = time.perf_counter() - started
+
+        memory = set_memory_usage(visited) if isinstance(visited, set) else visited.memory_usage()
+        print(f"{name:12} {memory / 2 ** 20:8.1f} MiB  {memory / count:6.1f} B/url  "
+              f"add {added:5.2f}s  lookup {lookups:5.2f}s  "
+              f"missed {misses}  false positives {false_positives / len(absent):.4%}")
+
+
+@benchmark
+def bench_crawl_checkpoint(pages: str = "10000"):
+    """Journal overhead per page of CrawlCheckpoint for a synthetic crawl."""
+    import tempfile
+
+    from services.crawl_checkpoint import CrawlCheckpoint
+
+    pages = int(pages)
+    queued_per_page = 5
+    content = "lorem ipsum dolor sit amet " * 400
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = CrawlCheckpoint("bench", directory=directory)
+        started = time.perf_counter()
+        for i in range(pages):
+            for j in range(queued_per_page):
+                url = f"https://example.com/p{i}-{j}"
+                checkpoint.queued(url, 2, url[8:])
+            checkpoint.completed(f"https://example.com/p{i}", {'content': content, 'links': []})
+            if checkpoint.due():
+                checkpoint.flush()
+        checkpoint.finish()
+        checkpoint.flush()
+        elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        state = checkpoint.load()
+        replay = time.perf_counter() - started
+        size = os.path.getsize(checkpoint.path)
+        checkpoint.close()
+
+    print(f"{pages} pages: {elapsed / pages * 1e6:.1f} us/page journaled, "
+          f"{size / 2 ** 20:.1f} MiB on disk, replayed {len(state.results)} results in {replay:.2f}s")
+
+
+@benchmark
+def bench_sharded_crawler(pages_per_host: str = "40"):
+    """Scaling of ShardedCrawler with worker count on a generated multi-host fixture site."""
+    import functools
+    import tempfile
+    from http.server import SimpleHTTPRequestHandler
+
+    from services.sharded_crawler import ShardedCrawler
+
+    os.environ['HTTP_CACHE_ENABLED'] = '0'  # inherited by the spawned workers
+    hosts = [f"127.0.0.{i}" for i in range(1, 9)]
+    pages_per_host = int(pages_per_host)
+    filler = "".join(f"<div class='c'><p>Paragraph {i} with <b>some</b> <i>markup</i> and <a href='#x{i}'>anchors</a>.</p></div>"
+                     for i in range(600))
+
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(pages_per_host):
+            links = "".join(f"<a href='http://{host}:{{port}}/p{i + 1}.html'>next</a>" for host in hosts)
+            with open(os.path.join(root, f"p{i}.html"), "w") as f:
+                f.write(f"<html><body><main><p>{links}</p>{filler}</main></body></html>")
+
+        class QuietHandler(SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('0.0.0.0', 0), functools.partial(QuietHandler, directory=root))
+        port = server.server_address[1]
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            with open(path) as f:
+                html = f.read().replace("{port}", str(port))
+            with open(path, "w") as f:
+                f.write(html)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        start_links = "".join(f"<a href='http://{host}:{port}/p0.html'>start</a>" for host in hosts)
+        with open(os.path.join(root, "index.html"), "w") as f:
+            f.write(f"<html><body>{start_links}</body></html>")
+
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            if workers > (os.cpu_count() or 1):
+                break
+            crawler = ShardedCrawler(workers=workers, max_pages=10_000)
+            crawler.crawl(f"http://127.0.0.1:{port}/index.html", max_depth=1)  # warm up the workers
+            started = time.perf_counter()
+            pages = crawler.crawl(f"http://127.0.0.1:{port}/index.html", max_depth=pages_per_host + 1)
+            elapsed = time.perf_counter() - started
+            crawler.close()
+            baseline = baseline or len(pages) / elapsed
+            print(f"{workers} workers: {len(pages)} pages in {elapsed:.2f}s, "
+                  f"{len(pages) / elapsed:.0f} pages/s ({len(pages) / elapsed / baseline:.1f}x)")
+        server.shutdown()
+
+
+@benchmark
+def bench_browser_pool(url: str = "https://example.com/", calls: str = "5"):
+    """Pooled Chrome sessions against a fresh browser per call (needs Chrome)."""
+    from services.browser_pool import BrowserPool, chrome_driver_factory
+
+    calls = int(calls)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        driver = chrome_driver_factory()
+        try:
+            driver.get(url)
+        finally:
+            driver.quit()
+    fresh = (time.perf_counter() - started) / calls
+
+    pool = BrowserPool(size=1)
+    started = time.perf_counter()
+    for _ in range(calls):
+        with pool.session() as driver:
+            driver.get(url)
+    pooled = (time.perf_counter() - started) / calls
+    pool.close()
+
+    report = pool.report()
+    print(f"fresh browser: {fresh:.2f}s/call, pooled: {pooled:.2f}s/call, "
+          f"saved {report['saved_seconds_per_call']:.2f}s per reused checkout (reuse rate {report['reuse_rate']:.0%})")
+
+
+@benchmark
+def bench_rag_pipeline():
+    """RAGPipeline against running its stages one after another, on a slow local fixture site."""
+    import tempfile
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.vectorstores import InMemoryVectorStore
+
+    from config.settings import settings
+    from services.ai_service import ai_chat_service
+    from services.crawl_engine import AsyncCrawler
+    from services.rag_pipeline import RAGPipeline
+    from services.scraper_service import scraper_service
+    from services.search_service import search_service
+
+    STAGE_SECONDS = 0.5  # compress, search, each page download, each embedding call
+    PAGES = 5
+
+    class SlowEmbeddings(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            time.sleep(STAGE_SECONDS)
+            return super().embed_documents(texts)
+
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(PAGES):
+            with open(os.path.join(root, f"p{i}.html"), "w") as f:
+                f.write(f"<html><body><main><p>Page {i} about the annual report. {'Filler text. ' * 200}</p></main></body></html>")
+
+        class SlowHandler(SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(STAGE_SECONDS * (1 + int(self.path[2:].split('.')[0])) / 2)
+                super().do_GET()
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(SlowHandler, directory=root))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        async def fake_compress(question, name):
+            await asyncio.sleep(STAGE_SECONDS)
+            return json.dumps({"type": "agent", "status": "finished", "response": f'"{question}"'})
+
+        async def fake_search(query, max_results=5):
+            await asyncio.sleep(STAGE_SECONDS)
+            return {"query": query, "results": [{"title": "", "url": f"{base}/p{i}.html", "snippet": ""} for i in range(max_results)]}
+
+        ai_chat_service.compress_user_query = fake_compress
+        search_service.advanced_search_async = fake_search
+        os.environ['HTTP_CACHE_ENABLED'] = '0'
+        settings.HTTP_CACHE_ENABLED = False
+
+        async def sequential():
+            started = time.perf_counter()
+            query = await RAGPipeline.compress("annual report", base)
+            hits = (await search_service.advanced_search_async(query, max_results=PAGES))["results"]
+            crawler = AsyncCrawler(scraper_service)
+            documents = []
+            for hit in hits:
+                documents += await RAGPipeline.load(crawler, hit["url"])
+            await InMemoryVectorStore(SlowEmbeddings(size=64)).aadd_documents(documents)
+            return time.perf_counter() - started
+
+        async def measure():
+            baseline = await sequential()
+            for prefetch in (False, True):
+                pipeline = RAGPipeline(max_results=PAGES, prefetch=prefetch, prefetch_results=PAGES)
+                started = time.perf_counter()
+                result = await pipeline.run("annual report", base, InMemoryVectorStore(SlowEmbeddings(size=64)))
+                returned = time.perf_counter() - started
+                await asyncio.wrap_future(result.embedded)  # in hybrid mode, embedding outlives run()
+                stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result.timings.items())
+                print(f"pipelined (prefetch={prefetch}, {pipeline.retrieval}): {len(result.documents)} documents, "
+                      f"returned after {returned:.2f}s; {stages}")
+            print(f"sequential: {baseline:.2f}s")
+
+        asyncio.run(measure())
+        server.shutdown()
+
+
+@benchmark
+def bench_vector_index():
+    """Embedding calls of VectorIndex for a first and a repeat session over the same sources."""
+    import tempfile
+
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.vectorstores import InMemoryVectorStore
+
+    from services.vector_index import VectorIndex
+
+    class CountingEmbeddings(DeterministicFakeEmbedding):
+        calls: int = 0
+        texts: int = 0
+
+        def embed_documents(self, texts):
+            self.calls += 1
+            self.texts += len(texts)
+            return super().embed_documents(texts)
+
+    def memory_factory(embeddings, directory, collection_name):
+        return InMemoryVectorStore(embeddings)
+
+    def session(index, pages):
+        return index.add_documents(
+            Document(page_content=text, metadata={"source": url}) for url, text in pages.items()
+        )
+
+    pages = {f"https://example.com/result-{i}": f"Result page {i}. " * 50 for i in range(5)}
+    with tempfile.TemporaryDirectory() as directory:
+        embeddings = CountingEmbeddings(size=64)
+        index = VectorIndex(directory, embeddings=embeddings, vectorstore_factory=memory_factory)
+        print("first session:", session(index, pages), f"{embeddings.calls} embedding calls")
+
+        # A new process: the manifest is reloaded from disk (the in-memory store stands in for persisted Chroma).
+        store = index.vectorstore
+        index = VectorIndex(directory, embeddings=embeddings, vectorstore_factory=lambda *args: store)
+        embeddings.calls = 0
+        print("repeat session:", session(index, pages), f"{embeddings.calls} embedding calls")
+
+        pages["https://example.com/result-0"] = "Updated content."
+        del pages["https://example.com/result-4"]
+        embeddings.calls = 0
+        print("one page changed:", session(index, pages), f"{embeddings.calls} embedding calls")
+        print("vanished page removed:", index.remove(["https://example.com/result-4"]), f"({len(store.store)} documents left)")
+        retrieved = index.as_retriever(list(pages)[:2], k=5).invoke("Result page")
+        print("retrieval limited to two sources:", sorted({doc.metadata['source'][-8:] for doc in retrieved}))
+
+
+@benchmark
+def bench_chunker():
+    """Retrieval precision over whole pages and over chunks, with a local bag-of-words embedding."""
+    import hashlib
+    import math
+    import random
+    import re
+
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.vectorstores import InMemoryVectorStore
+
+    from services.chunker import chunker
+
+    class HashingEmbeddings(Embeddings):
+        """Bag of hashed words: enough to rank texts by shared vocabulary, offline."""
+
+        def _embed(self, text):
+            vector = [0.0] * 512
+            for word in re.findall(r'\w+', text.lower()):
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 512] += 1
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            return [v / norm for v in vector]
+
+        def embed_documents(self, texts):
+            return [self._embed(text) for text in texts]
+
+        def embed_query(self, text):
+            return self._embed(text)
+
+    random.seed(7)
+    vocabulary = [f"word{i}" for i in range(400)]
+    topics = [f"topic{i}" for i in range(40)]
+    pages = []
+    for page in range(8):
+        lines = [f"# Report {page}"]
+        for section in range(5):
+            topic = topics[page * 5 + section]
+            lines.append(f"## Section {topic}")
+            for _ in range(6):
+                lines.append(" ".join(random.choices(vocabulary, k=60)) + f" {topic} {topic}.")
+                lines.append("")
+        pages.append(Document(page_content="\n".join(lines), metadata={"source": f"https://example.com/report-{page}"}))
+
+    started = time.perf_counter()
+    chunks = chunker.split_documents(pages)
+    elapsed = time.perf_counter() - started
+    sizes = [chunk.metadata["tokens"] for chunk in chunks]
+    print(f"{len(pages)} pages -> {len(chunks)} chunks in {elapsed * 1000:.0f} ms, "
+          f"{min(sizes)}-{max(sizes)} tokens (limit {chunker.chunk_tokens})")
+    assert all(pages[int(c.metadata["source"][-1])].page_content[c.metadata["start_index"]:c.metadata["end_index"]] == c.page_content
+               for c in chunks)
+
+    k = 4
+    for name, documents in (("whole pages", pages), ("chunks", chunks)):
+        store = InMemoryVectorStore(HashingEmbeddings())
+        store.add_documents(documents)
+        relevant = prompt_tokens = 0
+        for topic in topics:
+            retrieved = store.similarity_search(f"{topic}", k=k)
+            relevant += sum(1 for doc in retrieved if f"{topic} {topic}." in doc.page_content) / k
+            prompt_tokens += sum(chunker.count_tokens(doc.page_content) for doc in retrieved)
+        print(f"{name}: precision@{k} {relevant / len(topics):.2f}, {prompt_tokens / len(topics):.0f} context tokens per question")
+
+
+@benchmark
+def bench_numpy_vector_store(backend: str = "", count: str = "0"):
+    """Build time, query latency and memory of NumpyVectorStore against Chroma at 1k, 10k and 100k vectors."""
+    import subprocess
+    import tempfile
+
+    import numpy as np
+    from langchain_core.embeddings import Embeddings
+
+    from services.numpy_vector_store import NumpyVectorStore
+
+    DIM = 384
+    QUERIES = 200
+
+    class IndexedEmbeddings(Embeddings):
+        """Random unit vectors looked up by the number at the end of each text ("chunk 42")."""
+
+        def __init__(self, count: int):
+            rng = np.random.default_rng(0)
+            self.vectors = rng.standard_normal((count, DIM), dtype=np.float32)
+            self.queries = rng.standard_normal((QUERIES, DIM), dtype=np.float32)
+
+        def embed_documents(self, texts):
+            return self.vectors[[int(text.rsplit(' ', 1)[1]) for text in texts]].tolist()
+
+        def embed_query(self, text):
+            return self.queries[int(text.rsplit(' ', 1)[1])].tolist()
+
+    def rss_mb() -> float:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+    def run(backend: str, count: int) -> None:
+        embeddings = IndexedEmbeddings(count)
+        texts = [f"chunk {i}" for i in range(count)]
+        metadatas = [{"source": f"https://example.com/{i % 500}", "url_key": f"example.com/{i % 500}"} for i in range(count)]
+        session = {"url_key": {"$in": [f"example.com/{i}" for i in range(5)]}}
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = rss_mb()
+            started = time.perf_counter()
+            if backend == 'chroma':
+                from langchain_chroma import Chroma
+                store = Chroma(collection_name="bench", embedding_function=embeddings, persist_directory=directory)
+            else:
+                store = NumpyVectorStore(embeddings, directory if backend == 'numpy-mmap' else None)
+            for start in range(0, count, 5000):  # Chroma's maximum batch size is a little over 5000
+                store.add_texts(texts[start:start + 5000], metadatas[start:start + 5000])
+            build = time.perf_counter() - started
+
+            latencies = {}
+            for name, search_filter in (("all", None), ("5 sources", session)):
+                started = time.perf_counter()
+                for i in range(QUERIES):
+                    store.similarity_search(f"query {i}", k=4, filter=search_filter)
+                latencies[name] = (time.perf_counter() - started) / QUERIES * 1000
+            print(f"{backend:>10} {count:>7}: build {build:7.2f}s, query {latencies['all']:6.2f} ms "
+                  f"(filtered {latencies['5 sources']:6.2f} ms), memory +{rss_mb() - baseline:6.0f} MB", flush=True)
+
+    if backend:
+        run(backend, int(count))
+    else:
+        print(f"{DIM}-dimensional vectors, {QUERIES} queries with k=4; each run in its own process")
+        for count in (1_000, 10_000, 100_000):
+            for backend in ('numpy', 'numpy-mmap', 'chroma'):
+                subprocess.run([sys.executable, __file__, "numpy_vector_store", backend, str(count)], check=False)
+
+
+@benchmark
+def bench_bm25_index():
+    """Time to the first retrieved context per retrieval mode, with a slow fake embedding model."""
+    import random
+    import tempfile
+
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.vectorstores import InMemoryVectorStore
+
+    from services.bm25_index import RETRIEVAL_MODES, BM25Index, FusionRetriever, bm25_index, session_retriever
+    from services.vector_index import vector_index
+
+    EMBED_SECONDS_PER_100 = 0.5  # latency of an embeddings request for 100 chunks
+
+    class SlowEmbeddings(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            time.sleep(EMBED_SECONDS_PER_100 * len(texts) / 100)
+            return super().embed_documents(texts)
+
+    random.seed(3)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    documents = [
+        Document(page_content=" ".join(random.choices(vocabulary, k=300)) + f" topic{i}",
+                 metadata={"source": f"https://example.com/page-{i // 10}", "start_index": i % 10})
+        for i in range(2000)
+    ]
+
+    started = time.perf_counter()
+    index = BM25Index()
+    index.add_documents(documents)
+    build = time.perf_counter() - started
+    postings = sum(len(p.docs) for p in index._postings.values())
+    started = time.perf_counter()
+    for i in range(200):
+        index.search(f"topic{i} word{i}", k=4)
+    print(f"BM25: {len(documents)} chunks indexed in {build * 1000:.0f} ms, {postings} postings "
+          f"in {postings * 6 / 2 ** 20:.1f} MB, {(time.perf_counter() - started) / 200 * 1000:.2f} ms per query")
+
+    for mode in RETRIEVAL_MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            bm25_index._reset()
+            vector_index.__init__(directory, embeddings=SlowEmbeddings(size=64),
+                                  vectorstore_factory=lambda embeddings, *args: InMemoryVectorStore(embeddings))
+            started = time.perf_counter()
+            retriever = session_retriever(documents, mode)
+            found = retriever.invoke("topic42")
+            first = time.perf_counter() - started
+            hit = any("topic42" in doc.page_content.split() for doc in found)
+            print(f"{mode:>6}: first context after {first:5.2f}s (relevant chunk retrieved: {hit})")
+            if isinstance(retriever, FusionRetriever):
+                retriever.semantic.result()
+                print(f"        vectors ready after {time.perf_counter() - started:5.2f}s, "
+                      f"then fused: {len(retriever.invoke('topic42'))} chunks")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__.strip())
+        for name, function in BENCHMARKS.items():
+            print(f"  {name:20} {function.__doc__.strip().splitlines()[0]}")
+        sys.exit(len(sys.argv) > 1)
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
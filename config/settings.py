@@ -4,5 +4,111 @@ class Settings:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     OPENAI_LINK_MODEL: str = "gpt-4o-mini"
     OPENAI_CHAT_MODEL: str = "gpt-4o"
+    # Point at any OpenAI-compatible server (e.g. a local stub in tests); None uses the official API.
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL")
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "120"))
+
+    # LLM response cache (set LLM_CACHE_SQLITE_PATH to share it across uvicorn workers)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    LLM_CACHE_TTL: float = float(os.getenv("LLM_CACHE_TTL", str(24 * 60 * 60)))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+    LLM_CACHE_SQLITE_PATH: str = os.getenv("LLM_CACHE_SQLITE_PATH", "")
+    LLM_CACHE_SQLITE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_SQLITE_MAX_ENTRIES", "100000"))
+
+    # Crawl engine
+    CRAWL_MAX_CONCURRENCY: int = int(os.getenv("CRAWL_MAX_CONCURRENCY", "20"))
+    CRAWL_PER_HOST_LIMIT: int = int(os.getenv("CRAWL_PER_HOST_LIMIT", "4"))
+    CRAWL_MAX_PAGES: int = int(os.getenv("CRAWL_MAX_PAGES", "500"))
+    CRAWL_WORKERS: int = int(os.getenv("CRAWL_WORKERS", str(os.cpu_count() or 1)))
+    # "async" crawls in this process; "sharded" spreads hosts over CRAWL_WORKERS processes (services/sharded_crawler.py)
+    CRAWL_MODE: str = os.getenv("CRAWL_MODE", "async")
+    CRAWL_VISITED_BACKEND: str = os.getenv("CRAWL_VISITED_BACKEND", "set")
+    CRAWL_VISITED_CAPACITY: int = int(os.getenv("CRAWL_VISITED_CAPACITY", "4096"))
+    CRAWL_BLOOM_ERROR_RATE: float = float(os.getenv("CRAWL_BLOOM_ERROR_RATE", "0.001"))
+    CRAWL_CHECKPOINT_DIR: str = os.getenv("CRAWL_CHECKPOINT_DIR", ".cache/checkpoints")
+    CRAWL_CHECKPOINT_RECORDS: int = int(os.getenv("CRAWL_CHECKPOINT_RECORDS", "500"))
+    CRAWL_CHECKPOINT_INTERVAL: float = float(os.getenv("CRAWL_CHECKPOINT_INTERVAL", "5"))
+
+    # Sitemap discovery
+    SITEMAP_MAX_FILES: int = int(os.getenv("SITEMAP_MAX_FILES", "50"))
+    SITEMAP_MAX_URLS: int = int(os.getenv("SITEMAP_MAX_URLS", "50000"))
+    SITEMAP_MIN_URLS: int = int(os.getenv("SITEMAP_MIN_URLS", "10"))
+
+    # Search (SerpAPI)
+    SERPAPI_BASE_URL: str = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com/search.json")
+    SEARCH_CACHE_TTL: float = float(os.getenv("SEARCH_CACHE_TTL", str(60 * 60)))
+    SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "512"))
+
+    # Pipelined search -> scrape -> embed (RAGPipeline)
+    RAG_MAX_RESULTS: int = int(os.getenv("RAG_MAX_RESULTS", "5"))
+    RAG_EMBED_BATCH_SIZE: int = int(os.getenv("RAG_EMBED_BATCH_SIZE", "16"))
+    # Speculatively search the raw question and fetch its top hits while the query is compressed (costs one extra search).
+    RAG_PREFETCH: bool = os.getenv("RAG_PREFETCH", "false").lower() in ("1", "true", "yes")
+    RAG_PREFETCH_RESULTS: int = int(os.getenv("RAG_PREFETCH_RESULTS", "3"))
+
+    # Chunking before indexing (token counts use tiktoken's encoding for OPENAI_CHAT_MODEL when installed)
+    CHUNK_TOKENS: int = int(os.getenv("CHUNK_TOKENS", "400"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))
+
+    # Retrieval: "hybrid" answers from BM25 straight away and fuses in vector results once embedded,
+    # "vector" waits for embeddings, "bm25" never embeds.
+    RAG_RETRIEVAL: str = os.getenv("RAG_RETRIEVAL", "hybrid")
+    RETRIEVAL_K: int = int(os.getenv("RETRIEVAL_K", "4"))
+    BM25_K1: float = float(os.getenv("BM25_K1", "1.5"))
+    BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+    # The shared BM25 index drops its least recently indexed sources beyond this many chunks.
+    BM25_MAX_DOCUMENTS: int = int(os.getenv("BM25_MAX_DOCUMENTS", "50000"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+
+    # Persistent vector index shared by the RAG entry points
+    VECTOR_INDEX_DIR: str = os.getenv("VECTOR_INDEX_DIR", "./chroma_db")
+    VECTOR_INDEX_COLLECTION: str = os.getenv("VECTOR_INDEX_COLLECTION", "rag_documents")
+    # "chroma", or "numpy" for a float32 matrix searched with numpy (faster to open, fine up to ~100k chunks).
+    VECTOR_INDEX_BACKEND: str = os.getenv("VECTOR_INDEX_BACKEND", "chroma")
+
+    # Embedding cache (float32 vectors in a memory-mapped file, indexed in SQLite)
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+    # Rough proxy for the per-request token limit of the embeddings API (~4 characters per token).
+    EMBEDDING_BATCH_MAX_CHARS: int = int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", "400000"))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+    # Background crawl jobs (/api/v1/jobs)
+    JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", ".cache/jobs.sqlite3")
+    JOBS_MAX_WORKERS: int = int(os.getenv("JOBS_MAX_WORKERS", "2"))
+    JOBS_RESULTS_PAGE_SIZE: int = int(os.getenv("JOBS_RESULTS_PAGE_SIZE", "50"))
+    JOBS_POLL_INTERVAL: float = float(os.getenv("JOBS_POLL_INTERVAL", "0.5"))
+    # Deepest max_depth a crawl job may ask for; pages per job are capped at CRAWL_MAX_PAGES.
+    JOBS_MAX_DEPTH: int = int(os.getenv("JOBS_MAX_DEPTH", "5"))
+    # A running job whose owner hasn't renewed its lease for this long is taken over by another worker process.
+    JOBS_LEASE_SECONDS: float = float(os.getenv("JOBS_LEASE_SECONDS", "30"))
+
+    # URL extraction strategies
+    URL_EXTRACTOR_PARALLEL: bool = os.getenv("URL_EXTRACTOR_PARALLEL", "false").lower() in ("1", "true", "yes")
+    STRATEGY_MEMORY_PATH: str = os.getenv("STRATEGY_MEMORY_PATH", ".cache/strategy_memory.json")
+    STRATEGY_MEMORY_HALF_LIFE: float = float(os.getenv("STRATEGY_MEMORY_HALF_LIFE", str(7 * 24 * 60 * 60)))
+
+    # Headless browser pool
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    BROWSER_MAX_PAGES: int = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+    BROWSER_PAGE_LOAD_TIMEOUT: float = float(os.getenv("BROWSER_PAGE_LOAD_TIMEOUT", "20"))
+
+    # Shared HTTP client
+    HTTP_POOL_CONNECTIONS: int = int(os.getenv("HTTP_POOL_CONNECTIONS", "20"))
+    HTTP_POOL_MAXSIZE: int = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "15"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    # Persistent HTTP cache
+    HTTP_CACHE_ENABLED: bool = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    HTTP_CACHE_DIR: str = os.getenv("HTTP_CACHE_DIR", ".cache/http")
+    HTTP_CACHE_MAX_BYTES: int = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+    # PDF extraction
+    PDF_MAX_BYTES: int = int(os.getenv("PDF_MAX_BYTES", str(64 * 1024 * 1024)))
+    PDF_MAX_PAGES: int = int(os.getenv("PDF_MAX_PAGES", "500"))
+    PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
 
 settings = Settings()
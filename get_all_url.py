@@ -2,10 +2,12 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
+from services.http_client import http_client
+
 def extract_urls(base_url):
     try:
         # Send a request to the website
-        response = requests.get(base_url)
+        response = http_client.get(base_url)
         response.raise_for_status()  # Raise an exception for HTTP errors
         
         # Parse the website content
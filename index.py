@@ -1,15 +1,18 @@
 import os
 from langchain.chains import RetrievalQA
 from langchain.schema import Document
-from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
+from langchain_community.document_loaders import WebBaseLoader
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
 from services.search_service import search_service
 import json
 import logging
 import requests
 from services.ai_service import ai_chat_service
 from services.scraper_service import scraper_service
+from services.bm25_index import session_retriever
+from services.chunker import chunker
+from services.rag_pipeline import rag_pipeline
+from services.vector_index import vector_index
 logger = logging.getLogger(__name__)
 
 os.environ['OPENAI_API_KEY'] = os.getenv("OPENAI_API_KEY")
@@ -23,10 +26,11 @@ def load_documents(sources):
     for source in sources:
         try:
             if source.endswith('.pdf'):
-                loader = PyPDFLoader(source)
-                documents.extend(loader.load())
+                # Pages arrive as they are extracted, capped by PDF_MAX_BYTES / PDF_MAX_PAGES.
+                for page in scraper_service.iter_pdf_pages(source):
+                    documents.append(Document(page_content=page.text, metadata={"source": source, "page": page.number - 1}))
             else:
-                scraped_results = scraper_service.scrape_page_info(source, max_depth=1)
+                scraped_results = scraper_service.scrape_page_info(source, max_depth=1, keep_links=False)
                 # If the result is a tuple, convert it to a dict with the original source as the key.
                 if isinstance(scraped_results, tuple):
                     scraped_results = {source: scraped_results}
@@ -44,15 +48,15 @@ def load_documents(sources):
 
 # Initialize LangChain components
 def setup_qa_system(sources):
-    # Load documents
-    documents = load_documents(sources)
+    # Load documents and split them into overlapping, token-sized chunks
+    documents = chunker.split_documents(load_documents(sources))
 
-    # Create an index using OpenAI embeddings and Chroma vector store
-    embeddings = OpenAIEmbeddings()
-    vectorstore = Chroma.from_documents(documents, embeddings)
+    # BM25 answers straight away; the vector index (which skips unchanged pages) is
+    # filled in the background and fused in once it is ready (see RAG_RETRIEVAL)
+    return build_qa_chain(session_retriever(documents))
 
+def build_qa_chain(retriever):
     # Set up the retrieval-based QA chain
-    retriever = vectorstore.as_retriever()
     qa_chain = RetrievalQA.from_chain_type(
         llm=ChatOpenAI(temperature=0, openai_api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4o"),
         chain_type="stuff",
@@ -65,19 +69,19 @@ async def main():
     question = input("Enter your question: ")
     url = input("Enter the URL: ")
 
-    search_query = await ai_chat_service.compress_user_query(question, name=url)
-    search_query = json.loads(search_query)
-    query_text = search_query["response"]
-    query_text = query_text.strip('"\'')  # Remove both single and double quotes
-
-    print(query_text)
-    search_result = search_service.advanced_search(query_text, max_results=5)
-    logger.info(search_result)
-    print(search_result)
-    # Set up the QA system
-    sources = [result['url'] for result in search_result['results']]
-    print(sources)
-    qa_system = setup_qa_system(sources)
+    # Compress, search, scrape and embed as one pipeline; hits are scraped and
+    # embedded while the slower ones are still downloading. Pages already in
+    # the persistent index with unchanged content are not embedded again.
+    result = await rag_pipeline.run(question, url, vector_index)
+    print(result.query)
+    logger.info(result.hits)
+    print([hit['url'] for hit in result.hits])
+    print(f"Loaded {len(result.documents)} documents: {result.timings}")
+    print(f"Vector index: {vector_index.stats}")
+    # The pipeline already indexed the documents; only build the retriever over them
+    # (in hybrid mode, vectors are fused in once the background embedding is done)
+    qa_system = build_qa_chain(session_retriever(result.documents, rag_pipeline.retrieval, skip_index=True,
+                                                 embedded=result.embedded))
 
     # Interact with the QA system
     while True:
@@ -95,5 +99,6 @@ async def main():
         except Exception as e:
             print(f"Error during query: {e}")
 
-import asyncio
-asyncio.run(main())
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(main())
@@ -5,12 +5,13 @@ from langchain_core.runnables import RunnablePassthrough
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores.chroma import Chroma
 from services.search_service import search_service
 import json
 import logging
 import requests
 from services.ai_service import ai_chat_service
+from services.bm25_index import session_retriever
+from services.chunker import chunker
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -39,12 +40,8 @@ def load_documents(sources):
     return documents
 
 def setup_qa_system(sources):
-    # Load documents
-    documents = load_documents(sources)
-
-    # Create embeddings and vector store
-    embeddings = OpenAIEmbeddings()
-    vectorstore = Chroma.from_documents(documents, embeddings)
+    # Load documents and split them into overlapping, token-sized chunks
+    documents = chunker.split_documents(load_documents(sources))
 
     # Initialize GPT-4 model
     llm = ChatOpenAI(
@@ -52,8 +49,9 @@ def setup_qa_system(sources):
         temperature=0
     )
 
-    # Create the retriever
-    retriever = vectorstore.as_retriever()
+    # Create the retriever, limited to this session's sources: BM25 straight away, fused with
+    # the vector index once the documents are embedded in the background (see RAG_RETRIEVAL)
+    retriever = session_retriever(documents)
 
     # Create prompt template
     prompt = ChatPromptTemplate.from_template("""
@@ -75,7 +73,7 @@ def setup_qa_system(sources):
         | StrOutputParser()
     )
 
-    return rag_chain, vectorstore
+    return rag_chain, retriever
 
 async def main():
     question = input("Enter your question: ")
@@ -95,7 +93,7 @@ async def main():
     print(sources)
     
     # Set up the QA system
-    qa_system, vectorstore = setup_qa_system(sources)
+    qa_system, retriever = setup_qa_system(sources)
 
     # Interact with the QA system
     while True:
@@ -109,7 +107,7 @@ async def main():
             print("\nAnswer:", response)
             
             # Get source documents
-            relevant_docs = vectorstore.similarity_search(query)
+            relevant_docs = retriever.invoke(query)
             print("\nSources:")
             for doc in relevant_docs:
                 print("-", doc.metadata.get("source", "Unknown"))
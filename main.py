@@ -1,11 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routers import summarizer
+from routers import summarizer, jobs
 from fastapi.middleware.cors import CORSMiddleware
+from services.http_client import http_client
+from services.job_service import job_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background job workers live as long as the app; unfinished jobs resume on the next start.
+    await job_service.start()
+    yield
+    await job_service.stop()
+    await http_client.aclose()
+
 
 app = FastAPI(
     title="AI Summary API",
     description="An API to fetch URLs and summarize them using AI.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -18,3 +32,4 @@ app.add_middleware(
 
 # Include router
 app.include_router(summarizer.router, prefix="/api/v1", tags=["Summarizer"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["Jobs"])
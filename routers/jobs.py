@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from config.settings import settings
+from services.job_service import job_service, FINISHED_STATUSES
+import asyncio
+import json
+
+router = APIRouter()
+
+
+async def _job_or_404(job_id: str) -> dict:
+    job = await asyncio.to_thread(job_service.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}.")
+    return job
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(request: Request):
+    """
+    Submit a background job and return it straight away with status 'queued'.
+
+    Body: {"kind": "crawl", "url": ..., "max_depth": 2} to follow links (up to
+    JOBS_MAX_DEPTH; "max_pages" defaults to and is capped at CRAWL_MAX_PAGES; add
+    "mode": "sharded" to crawl on several processes; defaults to CRAWL_MODE), or
+    {"kind": "scrape", "urls": [...]} to fetch a list of pages.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="The body must be a JSON object.")
+    kind = data.pop("kind", "crawl")
+    try:
+        return await job_service.submit(kind, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress counters (pages stored, errors) of a job."""
+    return await _job_or_404(job_id)
+
+
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, after: int = 0, limit: int = None):
+    """
+    One page of a job's results. Pass the returned next_after as `after` to get the
+    next page; results can be read while the job is still running.
+    """
+    job = await _job_or_404(job_id)
+    limit = min(limit or settings.JOBS_RESULTS_PAGE_SIZE, 10 * settings.JOBS_RESULTS_PAGE_SIZE)
+    results = await asyncio.to_thread(job_service.results, job_id, after, limit)
+    return {
+        "job": job,
+        "results": results,
+        "next_after": results[-1]["seq"] if results else after,
+    }
+
+
+@router.get("/jobs/{job_id}/results/stream")
+async def stream_job_results(job_id: str, request: Request, after: int = 0):
+    """
+    Stream a job's results as NDJSON, following the job until it finishes,
+    then end with one {"type": "job"} line holding its final state.
+    """
+    await _job_or_404(job_id)
+
+    async def events():
+        cursor = after
+        while not await request.is_disconnected():
+            # Read the status first, so pages stored just before the job finished are still sent.
+            job = await asyncio.to_thread(job_service.get, job_id)
+            results = await asyncio.to_thread(job_service.results, job_id, cursor)
+            for result in results:
+                yield json.dumps({"type": "page", **result}) + "\n"
+            if results:
+                cursor = results[-1]["seq"]
+                continue
+            if job["status"] in FINISHED_STATUSES:
+                yield json.dumps({"type": "job", **job}) + "\n"
+                return
+            await asyncio.sleep(settings.JOBS_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_job(job_id: str):
+    """Queue a failed or cancelled job again; crawls resume from their checkpoint."""
+    await _job_or_404(job_id)
+    try:
+        return await job_service.retry(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job. Pages stored so far are kept."""
+    await _job_or_404(job_id)
+    return await job_service.cancel(job_id)
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from services.ai_service import ai_chat_service
+from services.crawl_engine import AsyncCrawler
 from services.scraper_service import scraper_service
 from urllib.parse import urlparse
 from services.new_url_extractor import url_extractor
 from services.search_service import search_service
+from typing import AsyncIterator
+import asyncio
 import json
 import logging
 
@@ -12,44 +15,98 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/summarize")
-async def summarize_links(request: Request):
+
+def _event(type: str, status: str, response, **fields) -> str:
+    """One NDJSON line, shaped like the messages of ai_chat_response."""
+    return json.dumps({"type": type, "status": status, "response": response, **fields}) + "\n"
+
+
+async def summarize_events(request: Request, question: str, url: str) -> AsyncIterator[str]:
     """
-    Takes a user question and a URL, extracts all links from the URL, 
-    and streams the most relevant link using AI.
+    Run the summarize pipeline and yield one NDJSON event per stage as soon as it is ready:
+    the compressed search query, the search hits, each scraped page as it finishes, and
+    then the chat tokens. Stops, cancelling any fetches still in flight, once the
+    client has disconnected. An unexpected failure ends the stream with an
+    {"type": "error"} event.
     """
     try:
-        data = await request.json()
-        question = data.get("question")
-        url = data.get("url")
-
-        if not question or not url:
-            raise HTTPException(status_code=400, detail="Both 'question' and 'url' are required.")
-
-        # Extract URLs
-        # extracted_urls = scraper_service.extract_urls(url)
-        # extracted_urls = url_extractor.extract_urls(url)
-        search_query = await ai_chat_service.compress_user_query(question, name=url)
-        search_query = json.loads(search_query)
-        query_text = search_query["response"]
-        query_text = query_text.strip('"\'')  # Remove both single and double quotes
-
-        print(query_text)
-        search_result = search_service.advanced_search(query_text, max_results=5)
+        search_query = json.loads(await ai_chat_service.compress_user_query(question, name=url))
+        if search_query["status"] == "error":
+            yield _event("query", "error", search_query["response"], error=search_query.get("error"))
+            return
+        query_text = search_query["response"].strip('"\'')  # Remove both single and double quotes
+        yield _event("query", "finished", query_text)
+        if await request.is_disconnected():
+            return
+
+        search_result = await search_service.advanced_search_async(query_text, max_results=5)
         logger.info(search_result)
-        print(search_result)
-        # needed_urls = json.loads(needed_urls_str)
-        # print("Needed links Type", type(needed_urls))
-        # print("Needed links:", needed_urls["response"])
-        
-        # if all(bool(urlparse(link).scheme) and bool(urlparse(link).netloc) for link in needed_urls["response"]):
-        # text, links = scraper_service.scrape_page_info(needed_urls["response"])
-        # markdown_output = scraper_service.write_to_markdown(text, links)
-        # result = ai_chat_service.ai_chat_response(question, markdown_output)
-
-        # print(markdown_output)
-        return search_result
-        # return StreamingResponse(result, media_type="text/plain")
-        
+        if "error" in search_result:
+            yield _event("search", "error", "Search failed.", error=search_result["error"])
+            return
+        hits = search_result["results"]
+        yield _event("search", "finished", hits)
+
+        crawler = AsyncCrawler(scraper_service)
+
+        async def fetch(page_url: str):
+            return page_url, await crawler.fetch_page(page_url)
+
+        tasks = [asyncio.create_task(fetch(hit["url"])) for hit in hits if hit["url"]]
+        pages = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    page_url, page = await next_done
+                except Exception as e:
+                    logger.warning(f"Error processing search hit: {e}")
+                    continue
+                if await request.is_disconnected():
+                    return
+                if page is None:
+                    continue
+                pages.append({"url": page_url, "content": page.content, "links": [], "type": page.type})
+                yield _event("page", "finished", page_url, page_type=page.type, chars=len(page.content))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if not pages:
+            yield _event("chat", "error", "None of the search results could be scraped.")
+            return
+
+        markdown_output = scraper_service.write_to_markdown(pages)
+        async for message in ai_chat_service.ai_chat_response(question, markdown_output):
+            if await request.is_disconnected():
+                return
+            yield message + "\n"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # The response has already started streaming, so a failure can only be reported as an event.
+        logger.exception("Summarize failed")
+        yield _event("error", "error", "An error occurred while summarizing.", error=str(e))
+
+
+@router.post("/summarize")
+async def summarize_links(request: Request):
+    """
+    Takes a user question and a URL, searches the web for the question,
+    scrapes the results and streams an AI answer.
+
+    The response is NDJSON: one {"type", "status", "response"} object per line,
+    with type "query", "search", "page" and finally "chat" tokens, or an "error"
+    event if the pipeline fails part-way.
+    """
+    data = await request.json()
+    question = data.get("question")
+    url = data.get("url")
+
+    if not question or not url:
+        raise HTTPException(status_code=400, detail="Both 'question' and 'url' are required.")
+
+    return StreamingResponse(
+        summarize_events(request, question, url),
+        media_type="application/x-ndjson",
+        # Ask reverse proxies not to buffer the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
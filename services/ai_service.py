@@ -1,53 +1,99 @@
 import asyncio
 import json
-from typing import AsyncIterable
+import weakref
+from typing import AsyncIterable, Dict, List, Tuple
+
 from langchain_openai import ChatOpenAI
-from langchain.callbacks import AsyncIteratorCallbackHandler
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 from prompts.summarizer_prompt import SUMMARIZER_PROMPT, CHAT_PROMPT, QUERY_COMPRESS_PROMPT
 from config.settings import settings
+from services.cache import make_key, make_llm_cache
+from services.http_client import http_client
 
 class AIChatService:
     """
     A service class for handling AI chat responses.
+
+    Models and prompt chains are built once per (prompt, model, temperature,
+    streaming) combination and reused, and every model uses the shared
+    pooled http_client.async_client(), so concurrent requests reuse open
+    connections to the API and the connections are closed with their event
+    loop. Models are kept per event loop, like that client.
+
+    Successful non-streaming answers are cached (in memory, plus SQLite when
+    LLM_CACHE_SQLITE_PATH is set) under the normalised prompt inputs and the
+    model name, so repeated questions skip the LLM.
     """
 
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
+        self.base_url = settings.OPENAI_BASE_URL
+        self._per_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = weakref.WeakKeyDictionary()
+        self.cache = make_llm_cache() if settings.LLM_CACHE_ENABLED else None
+
+    def _loop_state(self) -> Dict:
+        loop = asyncio.get_running_loop()
+        client = http_client.async_client()
+        state = self._per_loop.get(loop)
+        # A new client (the previous one was closed) means models built on the old one are stale.
+        if state is None or state['http'] is not client:
+            state = self._per_loop[loop] = {'http': client, 'llms': {}, 'chains': {}}
+        return state
+
+    def _llm(self, model: str, temperature: float = 0.7, streaming: bool = False) -> ChatOpenAI:
+        """Return the shared ChatOpenAI instance for a model configuration on the running loop."""
+        state = self._loop_state()
+        key = (model, temperature, streaming)
+        if key not in state['llms']:
+            state['llms'][key] = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                streaming=streaming,
+                openai_api_key=self.api_key,
+                openai_api_base=self.base_url,
+                timeout=settings.OPENAI_TIMEOUT,
+                http_async_client=state['http']
+            )
+        return state['llms'][key]
+
+    def _chain(self, template: str, input_variables: List[str], model: str, temperature: float = 0.7, streaming: bool = False):
+        """Return the cached prompt | model | parser chain for a template and model configuration."""
+        state = self._loop_state()
+        key: Tuple = (template, model, temperature, streaming)
+        if key not in state['chains']:
+            # Create a prompt
+            prompt = PromptTemplate(template=template, input_variables=input_variables)
+            state['chains'][key] = prompt | self._llm(model, temperature, streaming) | StrOutputParser()
+        return state['chains'][key]
+
+    async def _cached_invoke(self, namespace: str, chain, model: str, inputs: Dict[str, str]) -> str:
+        """
+        Invoke a non-streaming chain, answering from the cache when the same prompt was seen before.
+        Only the free-text question is normalised for the key; URLs must match exactly.
+        """
+        if self.cache is None:
+            return await chain.ainvoke(inputs)
+        key = make_key(namespace, model, free_text=("question",), **inputs)
+        response = await self.cache.aget(key)
+        if response is None:
+            # Only successful answers reach the cache; errors propagate to the caller.
+            response = await chain.ainvoke(inputs)
+            await self.cache.aset(key, response)
+        return response
 
     async def ai_chat_response(self, question: str, info: str) -> AsyncIterable[str]:
         """
-        Asynchronous generator for streaming AI responses using an async callback handler.
+        Asynchronous generator for streaming AI responses token by token.
         """
-        asyncCallback = AsyncIteratorCallbackHandler()
-
-        # Initialize ChatGPT model with callbacks
-        summary_llm = ChatOpenAI(
-            model=settings.OPENAI_CHAT_MODEL,
-            callbacks=[asyncCallback],
-            temperature=0.7,
-            streaming=True,
-            openai_api_key=self.api_key
-        )
-
-        # Create a prompt
-        prompt = PromptTemplate(template=CHAT_PROMPT, input_variables=["question", "info"])
-
-        # Create a LangChain LLMChain instance
-        summarizing_chain = prompt | summary_llm | StrOutputParser()
-
-        # Trigger the AI response
-        response_task = asyncio.create_task(
-            summarizing_chain.ainvoke({"question": question, "info": info})
-        )
+        summarizing_chain = self._chain(CHAT_PROMPT, ["question", "info"], settings.OPENAI_CHAT_MODEL, streaming=True)
 
         streamed_chunks = ""
 
         try:
             # Stream the tokens generated by the model
-            async for token in asyncCallback.aiter():
+            async for token in summarizing_chain.astream({"question": question, "info": info}):
                 streamed_chunks += token
                 yield json.dumps({
                     "response": token,
@@ -61,12 +107,7 @@ class AIChatService:
                 "response": "An error occurred while generating the summary.",
                 "error": str(e),
             })
-        finally:
-            # Mark the callback as done
-            asyncCallback.done.set()
-
-        # Wait for the response task to complete
-        await response_task
+            return
 
         # Return the finished response
         yield json.dumps({
@@ -79,23 +120,12 @@ class AIChatService:
         """
         Generate AI response for the summary as a single string.
         """
-        # Initialize ChatGPT model
-        summary_llm = ChatOpenAI(
-            model=settings.OPENAI_LINK_MODEL,
-            temperature=0.7,
-            streaming=False,
-            openai_api_key=self.api_key
-        )
-
-        # Create a prompt
-        prompt = PromptTemplate(template=SUMMARIZER_PROMPT, input_variables=["question", "urls"])
-
-        # Create a LangChain LLMChain instance
-        summarizing_chain = prompt | summary_llm | StrOutputParser()
+        summarizing_chain = self._chain(SUMMARIZER_PROMPT, ["question", "urls"], settings.OPENAI_LINK_MODEL)
 
         try:
             # Trigger the AI response
-            response = await summarizing_chain.ainvoke({"question": question, "urls": "\n".join(urls)})
+            response = await self._cached_invoke("link_summary", summarizing_chain, settings.OPENAI_LINK_MODEL,
+                                                  {"question": question, "urls": "\n".join(urls)})
             return json.dumps({
                 "type": "agent",
                 "status": "finished",
@@ -113,23 +143,12 @@ class AIChatService:
         """
         Generate AI response for the summary as a single string.
         """
-        # Initialize ChatGPT model
-        summary_llm = ChatOpenAI(
-            model=settings.OPENAI_CHAT_MODEL,
-            temperature=0.7,
-            streaming=False,
-            openai_api_key=self.api_key
-        )
-
-        # Create a prompt
-        prompt = PromptTemplate(template=QUERY_COMPRESS_PROMPT, input_variables=["question", "name"])
-
-        # Create a LangChain LLMChain instance
-        summarizing_chain = prompt | summary_llm | StrOutputParser()
+        summarizing_chain = self._chain(QUERY_COMPRESS_PROMPT, ["question", "name"], settings.OPENAI_CHAT_MODEL)
 
         try:
             # Trigger the AI response
-            response = await summarizing_chain.ainvoke({"question": question, "name": name})
+            response = await self._cached_invoke("compress_query", summarizing_chain, settings.OPENAI_CHAT_MODEL,
+                                                  {"question": question, "name": name})
             return json.dumps({
                 "type": "agent",
                 "status": "finished",
@@ -144,4 +163,3 @@ class AIChatService:
             })
         
 ai_chat_service = AIChatService()
-
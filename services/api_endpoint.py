@@ -1,13 +1,14 @@
-import requests
 from bs4 import BeautifulSoup
 import re
 
+from services.http_client import http_client
+
 def find_api_endpoints(url):
     """
     Scrape a website to find potential API endpoints.
     """
     try:
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, "html.parser")
 
@@ -18,7 +19,7 @@ def find_api_endpoints(url):
         for script in scripts:
             script_url = script["src"]
             if "api" in script_url or script_url.endswith(".js"):
-                script_content = requests.get(script_url).text
+                script_content = http_client.get(script_url).text
                 # Look for common API patterns in the JavaScript file
                 api_endpoints.update(re.findall(r"https?://[^\s'\"<>]+", script_content))
 
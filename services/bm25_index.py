@@ -0,0 +1,341 @@
+import concurrent.futures
+import logging
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from config.settings import settings
+from services.url_canonicalizer import url_key
+from services.vector_index import content_hash, vector_index
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r'\w+')
+# Term frequencies are stored as unsigned shorts.
+MAX_TF = 65535
+
+RETRIEVAL_MODES = ('hybrid', 'vector', 'bm25')
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+class _Postings:
+    """Documents containing a term and how often, as two parallel unsigned arrays (6 bytes per posting)."""
+
+    __slots__ = ('docs', 'tfs')
+
+    def __init__(self):
+        self.docs = array('I')
+        self.tfs = array('H')
+
+
+class BM25Index:
+    """
+    In-memory BM25 index, built incrementally as pages are scraped.
+
+    Documents are grouped by url_key() of their source like VectorIndex:
+    re-adding an unchanged source is a no-op and a changed source replaces
+    its old documents. Postings are append-only arrays of document numbers
+    and term frequencies, scored with numpy; removed documents are masked
+    until they make up half the index, then the postings are rebuilt.
+    Nothing is embedded, so a page can be searched as soon as it is parsed.
+    Beyond max_documents live documents, the sources least recently passed
+    to add_documents are dropped, so a long-running process stays bounded.
+    """
+
+    def __init__(self, k1: float = None, b: float = None, max_documents: int = None):
+        self.k1 = settings.BM25_K1 if k1 is None else k1
+        self.b = settings.BM25_B if b is None else b
+        self.max_documents = max_documents or settings.BM25_MAX_DOCUMENTS
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._postings: Dict[str, _Postings] = {}
+        self._df: Counter = Counter()
+        self._documents: List[Optional[Document]] = []
+        self._lengths = array('I')
+        self._alive = array('B')
+        # url_key -> (content hash, document numbers), least recently added first
+        self._sources: Dict[str, Tuple[str, List[int]]] = {}
+        self._live = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, source: str) -> bool:
+        return url_key(source) in self._sources
+
+    def add_documents(self, documents: Iterable[Document]) -> Dict[str, int]:
+        """
+        Index documents. All documents of a source must be passed in the same call,
+        since a source's documents are replaced as a whole.
+
+        Returns:
+            Dict[str, int]: How many sources were added, replaced or left unchanged by this call,
+                and how many older sources were evicted to stay within max_documents.
+        """
+        by_source: Dict[str, List[Document]] = {}
+        for document in documents:
+            by_source.setdefault(url_key(document.metadata.get("source", "")), []).append(document)
+
+        counts = {'added': 0, 'unchanged': 0, 'replaced': 0, 'evicted': 0}
+        with self._lock:
+            for key, source_documents in by_source.items():
+                digest = content_hash(source_documents)
+                entry = self._sources.pop(key, None)
+                if entry is not None and entry[0] == digest:
+                    self._sources[key] = entry  # Reinserted, so it counts as recently added.
+                    counts['unchanged'] += 1
+                    continue
+                if entry is not None:
+                    self._remove(entry[1])
+                self._sources[key] = (digest, [self._add(document) for document in source_documents])
+                counts['replaced' if entry else 'added'] += 1
+            counts['evicted'] = self._evict(by_source)
+            self._maybe_compact()
+        return counts
+
+    def remove(self, sources: Iterable[str]) -> int:
+        """Drop every document of the given source URLs. Returns how many sources were indexed."""
+        removed = 0
+        with self._lock:
+            for source in sources:
+                entry = self._sources.pop(url_key(source), None)
+                if entry is not None:
+                    self._remove(entry[1])
+                    removed += 1
+            self._maybe_compact()
+        return removed
+
+    def _add(self, document: Document) -> int:
+        number = len(self._documents)
+        terms = Counter(tokenize(document.page_content))
+        index, df = self._postings, self._df
+        for term, tf in terms.items():
+            postings = index.get(term)
+            if postings is None:
+                postings = index[term] = _Postings()
+            postings.docs.append(number)
+            postings.tfs.append(tf if tf < MAX_TF else MAX_TF)
+            df[term] += 1
+        length = sum(terms.values())
+        self._documents.append(document)
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._live += 1
+        self._total_length += length
+        return number
+
+    def _remove(self, numbers: Sequence[int]) -> None:
+        for number in numbers:
+            self._df.subtract(set(tokenize(self._documents[number].page_content)))
+            self._alive[number] = 0
+            self._documents[number] = None
+            self._live -= 1
+            self._total_length -= self._lengths[number]
+
+    def _evict(self, keep: Dict[str, List[Document]]) -> int:
+        evicted = 0
+        for key in list(self._sources):
+            # The sources of the current call come last and are never evicted.
+            if self._live <= self.max_documents or key in keep:
+                break
+            self._remove(self._sources.pop(key)[1])
+            evicted += 1
+        return evicted
+
+    def _maybe_compact(self) -> None:
+        if self._live * 2 >= len(self._documents):
+            return
+        sources = list(self._sources.items())
+        documents = self._documents
+        self._reset()
+        for key, (digest, numbers) in sources:
+            self._sources[key] = (digest, [self._add(documents[number]) for number in numbers])
+
+    def search(self, query: str, k: int = 4, sources: Iterable[str] = None) -> List[Tuple[Document, float]]:
+        """
+        The k best BM25 matches for a query, best first.
+
+        Args:
+            query (str): Free text; it is tokenized like the documents.
+            k (int, optional): Number of results. Defaults to 4.
+            sources (Iterable[str], optional): Only search the documents of these source URLs.
+
+        Returns:
+            List[Tuple[Document, float]]: Matching documents with their BM25 score.
+        """
+        with self._lock:
+            if not self._live:
+                return []
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            norms = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / self._live))
+            scores = np.zeros(len(self._documents), dtype=np.float32)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                df = self._df.get(term, 0)
+                if postings is None or df <= 0:
+                    continue
+                idf = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+                docs = np.frombuffer(postings.docs, dtype=np.uint32)
+                tfs = np.frombuffer(postings.tfs, dtype=np.uint16).astype(np.float32)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+
+            allowed = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            if sources is not None:
+                selected = np.zeros(len(self._documents), dtype=bool)
+                for key in {url_key(source) for source in sources}:
+                    entry = self._sources.get(key)
+                    if entry is not None:
+                        selected[entry[1]] = True
+                allowed &= selected
+            candidates = np.flatnonzero(allowed & (scores > 0))
+            if not len(candidates):
+                return []
+            k = min(k, len(candidates))
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self._documents[number], float(scores[number])) for number in top]
+
+    def as_retriever(self, sources: Iterable[str] = None, k: int = None) -> "BM25Retriever":
+        """Retriever over the index, limited to the documents of sources when given."""
+        return BM25Retriever(index=self, sources=None if sources is None else list(sources), k=k or settings.RETRIEVAL_K)
+
+
+class BM25Retriever(BaseRetriever):
+    index: BM25Index
+    sources: Optional[List[str]] = None
+    k: int = 4
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [document for document, _ in self.index.search(query, self.k, self.sources)]
+
+
+def _fusion_key(document: Document) -> tuple:
+    metadata = document.metadata
+    return metadata.get("source"), metadata.get("page"), metadata.get("start_index"), document.page_content
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Document]], k: int = None, limit: int = None) -> List[Document]:
+    """
+    Merge ranked lists with reciprocal rank fusion: each document scores the sum of
+    1 / (k + rank) over the lists it appears in. The same chunk from different stores is
+    recognised by its source, page, offset and text.
+    """
+    k = settings.RRF_K if k is None else k
+    scores: Dict[tuple, float] = {}
+    documents: Dict[tuple, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = _fusion_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, document)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in fused[:limit]]
+
+
+class FusionRetriever(BaseRetriever):
+    """
+    BM25 results fused with vector results by reciprocal rank fusion.
+
+    The vector retriever is a future, so answers can start from BM25 alone
+    while the session's documents are still being embedded; once the future
+    resolves, its results are fused in. If embedding failed, BM25 keeps answering.
+    """
+
+    lexical: BaseRetriever
+    semantic: concurrent.futures.Future
+    k: int = 4
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        rankings = [self.lexical.invoke(query)]
+        if self.semantic.done():
+            try:
+                rankings.append(self.semantic.result().invoke(query))
+            except Exception as e:
+                logger.warning(f"Answering from BM25 only, vector retrieval failed: {e}")
+        return reciprocal_rank_fusion(rankings, limit=self.k)
+
+
+bm25_index = BM25Index()
+
+_embedder = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+
+
+def session_retriever(documents: List[Document], mode: str = None, wait: bool = False,
+                      skip_index: bool = False, embedded: Optional[concurrent.futures.Future] = None) -> BaseRetriever:
+    """
+    Index a session's documents and return a retriever over just their sources.
+
+    Args:
+        documents (List[Document]): The session's chunks.
+        mode (str, optional): "hybrid" (BM25 fused with vectors), "vector" or "bm25" (no embedding
+            calls at all). Defaults to RAG_RETRIEVAL.
+        wait (bool, optional): In hybrid mode, embed before returning instead of in the background.
+            Defaults to False, so the first question is answered from BM25 without waiting.
+        skip_index (bool, optional): The documents are already indexed (e.g. by RAGPipeline.run with
+            the same mode); only build the retriever. Defaults to False.
+        embedded (Future, optional): With skip_index in hybrid mode, resolves once the documents
+            are embedded (PipelineResult.embedded); vector results are fused in from then on.
+
+    Returns:
+        BaseRetriever: A retriever limited to the documents' sources.
+    """
+    mode = mode or settings.RAG_RETRIEVAL
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {', '.join(RETRIEVAL_MODES)}")
+    sources = {doc.metadata["source"] for doc in documents}
+    if mode == 'vector':
+        if not skip_index:
+            vector_index.add_documents(documents)
+        return vector_index.as_retriever(sources, k=settings.RETRIEVAL_K)
+
+    if not skip_index:
+        bm25_index.add_documents(documents)
+    lexical = bm25_index.as_retriever(sources)
+    if mode == 'bm25':
+        return lexical
+
+    if skip_index:
+        semantic = concurrent.futures.Future()
+
+        def vectors_ready(future: concurrent.futures.Future) -> None:
+            try:
+                future.result()
+                semantic.set_result(vector_index.as_retriever(sources, k=settings.RETRIEVAL_K))
+            except BaseException as e:
+                semantic.set_exception(e)
+
+        if embedded is None:
+            semantic.set_result(vector_index.as_retriever(sources, k=settings.RETRIEVAL_K))
+        else:
+            embedded.add_done_callback(vectors_ready)
+        if wait:
+            concurrent.futures.wait([semantic])
+        return FusionRetriever(lexical=lexical, semantic=semantic, k=settings.RETRIEVAL_K)
+
+    def embed():
+        # Unchanged sources are skipped by the vector index, so this is cheap for pages seen before.
+        vector_index.add_documents(documents)
+        return vector_index.as_retriever(sources, k=settings.RETRIEVAL_K)
+
+    semantic = _embedder.submit(embed)
+    if wait:
+        concurrent.futures.wait([semantic])
+    return FusionRetriever(lexical=lexical, semantic=semantic, k=settings.RETRIEVAL_K)
@@ -0,0 +1,166 @@
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator
+
+from config.settings import settings
+
+# Requests the headless browser never needs for link discovery.
+BLOCKED_RESOURCES = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.ogg', '*.mp3', '*.wav', '*.avi', '*.mov'
+]
+
+
+@lru_cache(maxsize=1)
+def _chromedriver_path() -> str:
+    # Resolving (and possibly downloading) the driver takes seconds; do it once per process.
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def chrome_driver_factory(user_agent: str = None, page_load_timeout: float = None):
+    """
+    Launch a headless Chrome that skips images, fonts and media.
+
+    Returns a selenium WebDriver with its page-load timeout set.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    if user_agent:
+        chrome_options.add_argument(f"--user-agent={user_agent}")
+    # Hand the page over once the DOM is parsed instead of waiting for every subresource.
+    chrome_options.page_load_strategy = 'eager'
+
+    driver = webdriver.Chrome(service=Service(_chromedriver_path()), options=chrome_options)
+    driver.set_page_load_timeout(page_load_timeout or settings.BROWSER_PAGE_LOAD_TIMEOUT)
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_RESOURCES})
+    return driver
+
+
+class PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """
+    Bounded pool of warm headless browser sessions.
+
+    At most `size` browsers exist at once; callers check one out with
+    session() and it goes back to the pool afterwards. A browser is quit and
+    replaced after max_pages checkouts, or straight away if the caller's
+    code raised, since the session may be hung or crashed. driver_factory
+    creates the drivers, so tests can plug in a fake one.
+    """
+
+    def __init__(self, size: int = None, max_pages: int = None, page_load_timeout: float = None,
+                 driver_factory: Callable = None, user_agent: str = None):
+        self.size = size or settings.BROWSER_POOL_SIZE
+        self.max_pages = max_pages or settings.BROWSER_MAX_PAGES
+        self.page_load_timeout = page_load_timeout or settings.BROWSER_PAGE_LOAD_TIMEOUT
+        self.driver_factory = driver_factory or (lambda: chrome_driver_factory(user_agent, self.page_load_timeout))
+
+        self._idle: "queue.LifoQueue[PooledBrowser]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.stats = {'checkouts': 0, 'launches': 0, 'reuses': 0, 'recycled': 0, 'crashed': 0,
+                      'launch_seconds': 0.0, 'reuse_seconds': 0.0, 'wait_seconds': 0.0}
+        atexit.register(self.close)
+
+    def _record(self, **increments) -> None:
+        with self._lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    def _launch(self) -> PooledBrowser:
+        started = time.perf_counter()
+        driver = self.driver_factory()
+        elapsed = time.perf_counter() - started
+        self._record(launches=1, launch_seconds=elapsed)
+        return PooledBrowser(driver)
+
+    @staticmethod
+    def _quit(browser: PooledBrowser) -> None:
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+
+    @contextmanager
+    def session(self, timeout: float = None) -> Iterator:
+        """
+        Check out a browser for the duration of the with block.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a free browser; waits forever if None
+
+        Yields:
+            The driver of a warm browser (a new one is launched if none is idle)
+        """
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No browser became available within {timeout}s")
+        acquired = time.perf_counter()
+        try:
+            try:
+                browser = self._idle.get_nowait()
+                self._record(reuses=1, reuse_seconds=time.perf_counter() - acquired)
+            except queue.Empty:
+                browser = self._launch()
+            self._record(checkouts=1, wait_seconds=acquired - started)
+
+            try:
+                yield browser.driver
+            except BaseException:
+                self._record(crashed=1)
+                self._quit(browser)
+                raise
+
+            browser.pages += 1
+            if browser.pages >= self.max_pages:
+                self._record(recycled=1)
+                self._quit(browser)
+            else:
+                self._idle.put(browser)
+        finally:
+            self._slots.release()
+
+    def report(self) -> Dict[str, float]:
+        """
+        Pool statistics, including the latency each reused checkout saved
+        compared with launching a fresh browser for the call.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        average_launch = stats['launch_seconds'] / stats['launches'] if stats['launches'] else 0.0
+        average_reuse = stats['reuse_seconds'] / stats['reuses'] if stats['reuses'] else 0.0
+        saved = average_launch - average_reuse if stats['reuses'] and stats['launches'] else 0.0
+        stats.update({
+            'reuse_rate': stats['reuses'] / stats['checkouts'] if stats['checkouts'] else 0.0,
+            'average_launch_seconds': average_launch,
+            'saved_seconds_per_call': saved,
+            'saved_seconds_total': saved * stats['reuses'],
+        })
+        return stats
+
+    def close(self) -> None:
+        """Quit every idle browser."""
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
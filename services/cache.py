@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from config.settings import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access);
+"""
+
+
+def _normalise(value):
+    if isinstance(value, str):
+        return ' '.join(value.split()).casefold()
+    if isinstance(value, (list, tuple)):
+        return [_normalise(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalise(item) for key, item in sorted(value.items())}
+    return value
+
+
+def make_key(namespace: str, model: str, free_text: Iterable[str] = (), **inputs) -> str:
+    """
+    Cache key for a prompt: the namespace, the model name and the prompt inputs.
+    Inputs named in free_text (e.g. the user's question) have whitespace collapsed
+    and case folded, so trivially different spellings share an entry; all other
+    inputs, such as URLs, are used exactly as given.
+    """
+    free_text = set(free_text)
+    keyed = {name: _normalise(value) if name in free_text else value for name, value in inputs.items()}
+    payload = json.dumps([namespace, model, keyed], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTLCache:
+    """
+    In-process cache with a per-entry time to live and least-recently-used eviction.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None):
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.ttl = ttl or settings.LLM_CACHE_TTL
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.stats['misses'] += 1
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + (ttl or self.ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cache tier in a SQLite file, shared by every process (e.g. uvicorn workers) that opens it.
+
+    Uses WAL mode so readers don't block the writer. Expired rows are
+    ignored on read and, together with rows beyond max_entries, pruned
+    least recently used first every PRUNE_EVERY writes.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = None, ttl: float = None):
+        self.path = path
+        self.max_entries = max_entries or settings.LLM_CACHE_SQLITE_MAX_ENTRIES
+        self.ttl = ttl or settings.LLM_CACHE_TTL
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._writes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self._db.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.stats['hits'] += 1
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (key, value, now + (ttl or self.ttl), now))
+            self._db.commit()
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        expired = self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+        surplus = self._db.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        self._db.commit()
+        self.stats['evictions'] += expired + surplus
+
+
+class TieredCache:
+    """
+    An in-process TTLCache in front of an optional SQLiteCache.
+
+    Reads try memory first, then SQLite, copying SQLite hits into memory.
+    Writes go to both tiers.
+    """
+
+    def __init__(self, memory: TTLCache = None, shared: SQLiteCache = None):
+        self.memory = memory or TTLCache()
+        self.shared = shared
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str, ttl: float = None) -> None:
+        self.memory.set(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() that only leaves the event loop when it has to query SQLite."""
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            value = await asyncio.to_thread(self.shared.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def aset(self, key: str, value: str, ttl: float = None) -> None:
+        self.memory.set(key, value, ttl)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set, key, value, ttl)
+
+    def metrics(self) -> Dict[str, float]:
+        """Hit counts per tier and the overall hit rate."""
+        memory_hits = self.memory.stats['hits']
+        shared_hits = self.shared.stats['hits'] if self.shared is not None else 0
+        # A memory miss that SQLite answered is a hit overall, not a miss.
+        misses = self.memory.stats['misses'] - shared_hits
+        lookups = memory_hits + shared_hits + misses
+        return {
+            'memory_hits': memory_hits,
+            'shared_hits': shared_hits,
+            'misses': misses,
+            'entries': len(self.memory),
+            'evictions': self.memory.stats['evictions'] + (self.shared.stats['evictions'] if self.shared is not None else 0),
+            'hit_rate': (memory_hits + shared_hits) / lookups if lookups else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical async calls: while a call for a key is in
+    flight, later callers await the same task instead of starting their own.
+
+    The shared task is shielded, so one caller being cancelled doesn't cancel
+    it for the others. Tasks are tracked per event loop.
+    """
+
+    def __init__(self):
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    async def do(self, key: str, call: Callable[[], Awaitable]):
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is None:
+            self.stats['calls'] += 1
+            task = calls[key] = loop.create_task(call())
+            task.add_done_callback(lambda _: calls.pop(key, None))
+        else:
+            self.stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+
+def make_llm_cache() -> TieredCache:
+    """Tiered cache configured from the LLM_CACHE_* settings."""
+    shared = SQLiteCache(settings.LLM_CACHE_SQLITE_PATH) if settings.LLM_CACHE_SQLITE_PATH else None
+    return TieredCache(TTLCache(), shared)
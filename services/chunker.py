@@ -0,0 +1,151 @@
+import re
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+
+from config.settings import settings
+
+HEADING = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t#]*$', re.MULTILINE)
+# Split points, coarsest first: paragraphs, lines, sentences, words. The separator stays with the text before it.
+SEPARATORS = (re.compile(r'\n[ \t]*\n\s*'), re.compile(r'\n'), re.compile(r'(?<=[.!?])\s+'), re.compile(r'\s+'))
+
+Span = Tuple[int, int, int]  # start, end, tokens
+
+
+def token_counter(model: str = None) -> Callable[[str], int]:
+    """
+    Token counter for a chat model: tiktoken's encoding for the model (cl100k_base
+    for models it doesn't know), or about four characters per token when tiktoken
+    or its encoding files are unavailable.
+    """
+    def approximate(text: str) -> int:
+        return (len(text) + 3) // 4
+
+    try:
+        import tiktoken
+    except ImportError:
+        return approximate
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model or settings.OPENAI_CHAT_MODEL)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use, which fails on an offline host.
+        print(f"Counting ~4 characters per token, tiktoken encoding unavailable: {e}")
+        return approximate
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenChunker:
+    """
+    Split documents into overlapping chunks of at most CHUNK_TOKENS tokens.
+
+    Markdown headings start a new section, and a section is cut at the
+    coarsest boundary that fits: paragraphs, then lines, sentences and words.
+    Consecutive chunks of a section share up to CHUNK_OVERLAP_TOKENS tokens of
+    whole pieces. Every chunk is a slice of its document's text and keeps the
+    document's metadata, plus start_index/end_index of the slice, its chunk
+    number, heading path and token count.
+    """
+
+    def __init__(self, chunk_tokens: int = None, overlap_tokens: int = None, count_tokens: Callable[[str], int] = None):
+        self.chunk_tokens = chunk_tokens or settings.CHUNK_TOKENS
+        self.overlap_tokens = min(settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens,
+                                  self.chunk_tokens // 2)
+        self._count_tokens = count_tokens
+
+    def count_tokens(self, text: str) -> int:
+        if self._count_tokens is None:
+            self._count_tokens = token_counter()
+        return self._count_tokens(text)
+
+    @staticmethod
+    def sections(text: str) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, heading path) of each section of a markdown text; text before the first heading has path ''."""
+        path: List[Tuple[int, str]] = []
+        start = 0
+        for match in HEADING.finditer(text):
+            if HEADING.sub('', text[start:match.start()]).strip():
+                yield start, match.start(), ' > '.join(title for _, title in path)
+                start = match.start()
+            # else: a heading with no text of its own stays with the section below it.
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+        yield start, len(text), ' > '.join(title for _, title in path)
+
+    def _pieces(self, text: str, start: int, end: int, level: int = 0) -> List[Span]:
+        """Cut text[start:end] into consecutive spans of at most chunk_tokens, at the coarsest separator possible."""
+        tokens = self.count_tokens(text[start:end])
+        if tokens <= self.chunk_tokens:
+            return [(start, end, tokens)]
+        if level == len(SEPARATORS):
+            # One word longer than a chunk (a URL, base64...): cut it by characters.
+            step = max(1, (end - start) * self.chunk_tokens // tokens)
+            return [piece for cut in range(start, end, step) for piece in self._pieces(text, cut, min(cut + step, end), level)]
+
+        pieces: List[Span] = []
+        cut = start
+        for match in SEPARATORS[level].finditer(text, start, end):
+            if match.end() > cut and match.start() > start:
+                pieces += self._pieces(text, cut, match.end(), level + 1)
+                cut = match.end()
+        if cut < end:
+            pieces += self._pieces(text, cut, end, level + 1)
+        return pieces
+
+    def _pack(self, pieces: List[Span]) -> Iterator[Tuple[int, int]]:
+        """Merge consecutive pieces into chunks, starting each chunk with the tail of the previous one."""
+        chunk: List[Span] = []
+        tokens = 0
+        for piece in pieces:
+            if chunk and tokens + piece[2] > self.chunk_tokens:
+                yield chunk[0][0], chunk[-1][1]
+                overlap: List[Span] = []
+                for previous in reversed(chunk):
+                    if sum(p[2] for p in overlap) + previous[2] > self.overlap_tokens:
+                        break
+                    overlap.insert(0, previous)
+                while overlap and sum(p[2] for p in overlap) + piece[2] > self.chunk_tokens:
+                    overlap.pop(0)
+                chunk, tokens = overlap, sum(p[2] for p in overlap)
+            chunk.append(piece)
+            tokens += piece[2]
+        if chunk:
+            yield chunk[0][0], chunk[-1][1]
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Chunk a stream of documents, yielding each document's chunks as soon as it is split.
+
+        Args:
+            documents (Iterable[Document]): Pages or PDF pages, with their source in metadata.
+
+        Returns:
+            Iterator[Document]: Non-empty chunks in document order.
+        """
+        for document in documents:
+            text = document.page_content or ''
+            number = 0
+            for section_start, section_end, heading in self.sections(text):
+                for start, end in self._pack(self._pieces(text, section_start, section_end)):
+                    chunk = text[start:end]
+                    stripped = chunk.strip()
+                    if not stripped:
+                        continue
+                    start += len(chunk) - len(chunk.lstrip())
+                    yield Document(page_content=stripped, metadata={
+                        **document.metadata,
+                        "start_index": start,
+                        "end_index": start + len(stripped),
+                        "chunk": number,
+                        "section": heading,
+                        "tokens": self.count_tokens(stripped),
+                    })
+                    number += 1
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        return list(self.iter_chunks(documents))
+
+
+chunker = TokenChunker()
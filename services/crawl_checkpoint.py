@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+from config.settings import settings
+
+# Record tags of the append-only log, one JSON array per line.
+QUEUED = 'q'      # ["q", url, depth, key]: url was put on the frontier and key marked visited
+VISITED = 'v'     # ["v", key]: an extra visited key, e.g. a page's rel="canonical" target
+COMPLETED = 'd'   # ["d", url, result]: url was fetched (result is null when it failed or was skipped)
+FINISHED = 'end'  # ["end"]: the crawl ran to completion
+
+
+class CheckpointState(NamedTuple):
+    pending: List[Tuple[str, int]]
+    visited: List[str]
+    results: Dict[str, object]
+    finished: bool
+
+
+class CrawlCheckpoint:
+    """
+    Append-only crawl journal that lets an interrupted crawl resume by job id.
+
+    Every frontier push, visited key and completed page is appended as a
+    small JSON record. Records are buffered, and due() asks the owner to
+    flush() them every CRAWL_CHECKPOINT_RECORDS records or
+    CRAWL_CHECKPOINT_INTERVAL seconds, so a crash loses at most one interval
+    of work. Appending never touches the disk, so an async crawl can run the
+    fsync of flush() off the event loop. Replaying the journal yields
+    the pending frontier (queued but not completed), the visited keys and the
+    per-URL results, without refetching any completed page.
+    """
+
+    def __init__(self, job_id: str, directory: str = None, max_records: int = None, interval: float = None):
+        if not re.fullmatch(r'[\w.-]+', job_id):
+            raise ValueError(f"Invalid crawl job id: {job_id!r}")
+        self.job_id = job_id
+        self.directory = directory or settings.CRAWL_CHECKPOINT_DIR
+        self.max_records = max_records or settings.CRAWL_CHECKPOINT_RECORDS
+        self.interval = interval if interval is not None else settings.CRAWL_CHECKPOINT_INTERVAL
+        self.path = os.path.join(self.directory, f"{job_id}.jsonl")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._file = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> CheckpointState:
+        """
+        Replay the journal. A torn last line from a crash is ignored.
+        """
+        queued: Dict[str, int] = {}
+        visited: List[str] = []
+        results: Dict[str, object] = {}
+        finished = False
+        if not self.exists():
+            return CheckpointState([], visited, results, finished)
+
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                tag = record[0]
+                if tag == QUEUED:
+                    queued.setdefault(record[1], record[2])
+                    if record[3]:
+                        visited.append(record[3])
+                elif tag == VISITED:
+                    visited.append(record[1])
+                elif tag == COMPLETED:
+                    results[record[1]] = record[2]
+                elif tag == FINISHED:
+                    finished = True
+
+        pending = [(url, depth) for url, depth in queued.items() if url not in results]
+        return CheckpointState(pending, visited, results, finished)
+
+    def compact(self, state: CheckpointState) -> None:
+        """Rewrite the journal as the minimal records for state, dropping superseded ones."""
+        self.close()
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for key in dict.fromkeys(state.visited):
+                f.write(json.dumps([VISITED, key]) + '\n')
+            for url, result in state.results.items():
+                f.write(json.dumps([COMPLETED, url, result]) + '\n')
+            for url, depth in state.pending:
+                f.write(json.dumps([QUEUED, url, depth, '']) + '\n')
+            if state.finished:
+                f.write(json.dumps([FINISHED]) + '\n')
+        os.replace(temp_path, self.path)
+
+    def queued(self, url: str, depth: int, key: str) -> None:
+        self._append([QUEUED, url, depth, key])
+
+    def visited(self, key: str) -> None:
+        self._append([VISITED, key])
+
+    def completed(self, url: str, result=None) -> None:
+        self._append([COMPLETED, url, result])
+
+    def finish(self) -> None:
+        self._append([FINISHED])
+
+    def _append(self, record: list) -> None:
+        self._buffer.append(json.dumps(record))
+
+    def due(self) -> bool:
+        """Whether enough records or time have accumulated since the last flush."""
+        return bool(self._buffer) and (len(self._buffer) >= self.max_records
+                                       or time.monotonic() - self._last_flush >= self.interval)
+
+    def flush(self) -> None:
+        """Write buffered records and fsync, so they survive a crash."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write('\n'.join(self._buffer) + '\n')
+        self._buffer.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self) -> None:
+        self._buffer.clear()
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
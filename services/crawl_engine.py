@@ -0,0 +1,333 @@
+import asyncio
+import codecs
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+from config.settings import settings
+from services.http_cache import CacheEntry
+from services.crawl_checkpoint import CrawlCheckpoint
+from services.http_client import http_client, detect_content_type, DEFAULT_HEADERS, SNIFF_BYTES, TYPE_PDF, TYPE_SKIP
+from services.pdf_extractor import pdf_extractor
+from services.scraper_service import PageResult
+from services.url_canonicalizer import canonicalize_url, url_key
+from services.visited_set import FingerprintSet, make_visited_set
+
+
+def _charset(content_type: str) -> str:
+    """Charset named in a Content-Type header, defaulting to UTF-8."""
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            try:
+                return codecs.lookup(value.strip('"\'')).name
+            except LookupError:
+                break
+    return 'utf-8'
+
+
+class AsyncCrawler:
+    """
+    Asyncio crawl engine used by ScraperService.scrape_page_info.
+
+    Pages are fetched concurrently with a bounded global concurrency and a
+    per-host limit. Parsing runs in the default executor so the event loop
+    stays free while BeautifulSoup or PyPDF2 are busy.
+    """
+
+    def __init__(self, scraper, max_concurrency: int = None, per_host_limit: int = None):
+        self.scraper = scraper
+        self.max_concurrency = max_concurrency or settings.CRAWL_MAX_CONCURRENCY
+        self.per_host_limit = per_host_limit or settings.CRAWL_PER_HOST_LIMIT
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def fetch_page(self, url: str) -> Optional[PageResult]:
+        """
+        Fetch a single webpage or PDF through the shared HTTP client and parse it.
+
+        The document type is decided from one streamed GET (Content-Type header
+        plus the first bytes of the body), so there is no separate HEAD probe.
+        Bodies that are neither HTML nor PDF are abandoned after the first chunk.
+        With the HTTP cache enabled, fresh entries are served without a request
+        and a 304 on revalidation reuses the cached parse.
+
+        Returns:
+            PageResult with the detected type, or None if the URL was skipped
+        """
+        url = canonicalize_url(url)
+        cache = http_client.cache
+        request_headers = {**DEFAULT_HEADERS, **self.scraper.headers}
+        entry = await asyncio.to_thread(cache.lookup, url, request_headers) if cache is not None else None
+        if entry is not None and entry.is_fresh():
+            cache.record('hits')
+            return await self._page_from_cache(entry)
+
+        headers = dict(self.scraper.headers)
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+
+        client = http_client.async_client()
+        async with self._global_limit, self._host_limit(url):
+            async with client.stream('GET', url, headers=headers) as response:
+                if response.status_code == 304 and entry is not None:
+                    cache.record('revalidated')
+                    await asyncio.to_thread(cache.revalidated, entry, response.headers)
+                    not_modified = True
+                else:
+                    not_modified = False
+                    response.raise_for_status()
+                    if cache is not None:
+                        cache.record('misses')
+
+                    chunks = []
+                    head = b''
+                    body_iter = response.aiter_bytes()
+                    async for chunk in body_iter:
+                        chunks.append(chunk)
+                        head += chunk
+                        if len(head) >= SNIFF_BYTES:
+                            break
+
+                    content_type = response.headers.get('Content-Type', '')
+                    page_type = detect_content_type(url, content_type, head[:SNIFF_BYTES])
+                    if page_type == TYPE_SKIP:
+                        await body_iter.aclose()
+                        return None
+
+                    if page_type == TYPE_PDF:
+                        # Spool PDFs to disk as they arrive instead of buffering them in memory.
+                        pdf_extractor.check_length(response.headers.get('Content-Length'))
+                        pdf_path = await pdf_extractor.spool_async(self._replay(chunks, body_iter))
+                    else:
+                        async for chunk in body_iter:
+                            chunks.append(chunk)
+                        body = b''.join(chunks)
+                    status, response_headers = response.status_code, dict(response.headers)
+
+        if not_modified:
+            return await self._page_from_cache(entry)
+
+        if page_type == TYPE_PDF:
+            if cache is not None:
+                await asyncio.to_thread(cache.store_file, url, status, response_headers, pdf_path,
+                                        request_headers=request_headers)
+            page = await self._parse(url, page_type, pdf_path=pdf_path)
+            if cache is not None:
+                await asyncio.to_thread(cache.set_parsed, url, self._dump_page(page))
+        else:
+            page = await self._parse(url, page_type, body=body, content_type=content_type)
+            if cache is not None:
+                await asyncio.to_thread(cache.store, url, status, response_headers, body, self._dump_page(page),
+                                        request_headers)
+        return page
+
+    async def _parse(self, url: str, page_type: str, body: bytes = None, pdf_path: str = None, content_type: str = '') -> PageResult:
+        """Parse a downloaded body off the event loop."""
+        loop = asyncio.get_running_loop()
+        if page_type == TYPE_PDF:
+            content, links = await loop.run_in_executor(None, pdf_extractor.extract, pdf_path)
+            return PageResult(content, links, page_type)
+        html = body.decode(_charset(content_type), errors='replace')
+        return await loop.run_in_executor(None, self.scraper.parse_html, html, url)
+
+    async def _page_from_cache(self, entry: CacheEntry) -> Optional[PageResult]:
+        """Build a page from a cache entry, reusing its stored parse when there is one."""
+        if entry.parsed:
+            return self._load_page(json.loads(entry.parsed))
+
+        content_type = {key.lower(): value for key, value in entry.headers.items()}.get('content-type', '')
+        body = await asyncio.to_thread(http_client.cache.read_body, entry)
+        page_type = detect_content_type(entry.url, content_type, body[:SNIFF_BYTES])
+        if page_type == TYPE_SKIP:
+            return None
+        if page_type == TYPE_PDF:
+            # The extractor consumes (and deletes) its input, so give it a copy of the blob.
+            pdf_path = await asyncio.to_thread(pdf_extractor.spool, [body])
+            page = await self._parse(entry.url, page_type, pdf_path=pdf_path)
+        else:
+            page = await self._parse(entry.url, page_type, body=body, content_type=content_type)
+        await asyncio.to_thread(http_client.cache.set_parsed, entry.url, self._dump_page(page))
+        return page
+
+    @staticmethod
+    def _page_dict(page: PageResult) -> dict:
+        return {'content': page.content, 'links': sorted(page.links), 'type': page.type, 'canonical_url': page.canonical_url}
+
+    @classmethod
+    def _dump_page(cls, page: PageResult) -> str:
+        return json.dumps(cls._page_dict(page))
+
+    @staticmethod
+    def _load_page(parsed: dict) -> PageResult:
+        return PageResult(parsed['content'], set(parsed['links']), parsed['type'], parsed.get('canonical_url'))
+
+    @staticmethod
+    async def _replay(head_chunks, body_iter):
+        """Yield the chunks already read for sniffing, then the rest of the body."""
+        for chunk in head_chunks:
+            yield chunk
+        async for chunk in body_iter:
+            yield chunk
+
+    async def fetch_many(self, urls: Iterable[str]) -> Dict[str, object]:
+        """
+        Fetch several URLs concurrently without following their links.
+
+        Returns:
+            A dictionary mapping each URL to its PageResult, None if skipped,
+            or the exception raised while fetching it
+        """
+        urls = list(urls)
+        results = await asyncio.gather(*(self.fetch_page(url) for url in urls), return_exceptions=True)
+        return dict(zip(urls, results))
+
+    async def iter_pages(self, url: str, depth: int = 1, max_depth: int = 2, visited=None,
+                         checkpoint: Optional[CrawlCheckpoint] = None,
+                         on_error: Optional[Callable[[str, Exception], Awaitable[None]]] = None,
+                         max_pages: Optional[int] = None) -> AsyncIterator[Tuple[str, PageResult]]:
+        """
+        Crawl from url and yield (url, PageResult) for each page as soon as it is parsed.
+
+        Links of a page at depth < max_depth are scheduled immediately, so
+        deeper pages are fetched while their siblings are still in flight.
+        Links are canonicalised and visited holds url_key() values, so
+        fragments, tracking parameters and rel="canonical" aliases of a page
+        already seen are never fetched or yielded twice. visited may be any
+        backend from make_visited_set; CRAWL_VISITED_BACKEND is used by default.
+
+        With a checkpoint, the frontier, visited keys and every page are
+        journaled; if the checkpoint already holds a crawl, its pages are
+        yielded again without being refetched and only its pending frontier is crawled.
+
+        A page that fails to fetch or parse is logged and skipped; on_error, if
+        given, is awaited with its URL and the exception. With max_pages, no
+        more than that many pages (checkpointed ones included) are fetched.
+        """
+        if visited is None:
+            visited = make_visited_set()
+        # Exact even when visited is a Bloom filter: a false positive here would drop a page already fetched.
+        emitted = FingerprintSet()
+        pending = {}
+        scheduled = 0
+
+        def schedule(link: str, link_depth: int) -> None:
+            nonlocal scheduled
+            scheduled += 1
+            pending[asyncio.create_task(self.fetch_page(link))] = (link, link_depth)
+
+        def within_budget() -> bool:
+            return max_pages is None or scheduled < max_pages
+
+        async def flush_if_due() -> None:
+            # Journal writes end in an fsync, which mustn't block the event loop.
+            if checkpoint and checkpoint.due():
+                await asyncio.to_thread(checkpoint.flush)
+
+        try:
+            state = await asyncio.to_thread(checkpoint.load) if checkpoint else None
+            if state and (state.results or state.pending):
+                for key in state.visited:
+                    visited.add(key)
+                scheduled = len(state.results)
+                if not state.finished:
+                    await asyncio.to_thread(checkpoint.compact, state)
+                    for link, link_depth in state.pending:
+                        schedule(link, link_depth)
+                for result in state.results.values():
+                    if result:
+                        page = self._load_page(result['page'])
+                        emitted.add(url_key(page.canonical_url or result['url']))
+                        yield result['url'], page
+            else:
+                if url_key(url) in visited:
+                    return
+                visited.add(url_key(url))
+                if checkpoint:
+                    checkpoint.queued(url, depth, url_key(url))
+                schedule(url, depth)
+
+            while pending:
+                await flush_if_due()
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    fetched_url, page_depth = pending.pop(task)
+                    page_url = fetched_url
+                    try:
+                        page = task.result()
+                    except Exception as e:
+                        print(f"Error processing {page_url}: {str(e)}")
+                        page = None
+                        if on_error is not None:
+                            await on_error(page_url, e)
+
+                    # A page reached through an alias of an already yielded document is a duplicate.
+                    document_key = url_key(page.canonical_url or page_url) if page is not None else None
+                    if page is None or document_key in emitted:
+                        if checkpoint:
+                            checkpoint.completed(fetched_url)
+                        continue
+                    emitted.add(document_key)
+                    visited.add(document_key)
+                    # Pages other than the start URL are reported under their declared canonical URL.
+                    if page.canonical_url and page_url != url:
+                        page_url = page.canonical_url
+
+                    # Schedule the next level before handing the page to the consumer.
+                    if page_depth < max_depth:
+                        for link in page.links:
+                            if not within_budget():
+                                break
+                            link = canonicalize_url(link)
+                            key = url_key(link)
+                            if key not in visited:
+                                visited.add(key)
+                                if checkpoint:
+                                    checkpoint.queued(link, page_depth + 1, key)
+                                schedule(link, page_depth + 1)
+
+                    if checkpoint:
+                        checkpoint.visited(document_key)
+                        checkpoint.completed(fetched_url, {'url': page_url, 'page': self._page_dict(page)})
+                        await flush_if_due()
+                    yield page_url, page
+
+            if checkpoint:
+                checkpoint.finish()
+                await asyncio.to_thread(checkpoint.flush)
+        finally:
+            # The consumer may stop early (or be cancelled); don't leave fetches running.
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.close)
+
+    async def crawl(self, url: str, depth: int = 1, max_depth: int = 2, visited=None, keep_links: bool = True,
+                    job_id: Optional[str] = None) -> Dict[str, PageResult]:
+        """
+        Crawl from url up to max_depth levels.
+
+        With keep_links=False the link sets are dropped from the returned pages
+        once they have been scheduled, which is most of a large crawl's result size.
+        With a job_id the crawl is checkpointed, and calling again with the same
+        job_id resumes it without refetching completed pages.
+
+        Returns:
+            A dictionary mapping each URL (str) to a PageResult, which unpacks as
+                (cleaned_text_content: str, links: set)
+        """
+        checkpoint = CrawlCheckpoint(job_id) if job_id else None
+        results = {}
+        async for page_url, page in self.iter_pages(url, depth=depth, max_depth=max_depth, visited=visited, checkpoint=checkpoint):
+            if not keep_links:
+                page = PageResult(page.content, frozenset(), page.type, page.canonical_url)
+            results[page_url] = page
+        return results
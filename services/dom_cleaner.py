@@ -0,0 +1,241 @@
+import re
+from typing import List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urljoin
+
+import soupsieve
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from services.url_canonicalizer import find_canonical_link
+
+# Elements that are navigation, chrome or interactive rather than page content.
+REMOVE_SELECTORS = [
+    # Navigation and structural elements
+    'nav', '.navigation', '#navigation', '.main-nav', '.header-nav',
+    '[class*="nav"]', '[id*="nav"]', 'header', '.header',
+
+    # Footer elements
+    'footer', '.footer', '#footer', '.site-footer',
+    '[class*="footer"]', '[id*="footer"]',
+
+    # Form-related elements
+    'form', 'input', 'textarea', 'select', 'button',
+    '.form', '#form', '[class*="form"]', '[id*="form"]',
+    '[type="text"]', '[type="email"]', '[type="password"]',
+    '[type="submit"]', '[type="button"]',
+
+    # Potentially irrelevant interactive elements
+    '.modal', '#modal', '[class*="modal"]',
+    '.popup', '#popup', '[class*="popup"]',
+    '.sidebar', '#sidebar', '[class*="sidebar"]',
+
+    # Comments and metadata
+    'meta', 'comment', '.comment', '#comment',
+    '[class*="comment"]', '[id*="comment"]'
+]
+
+# Tags that never hold readable content.
+REMOVE_TAGS = ['script', 'style', 'iframe', 'svg', 'canvas']
+
+_SIMPLE_SELECTOR = re.compile(r'''^(?:
+    (?P<tag>[a-zA-Z][\w-]*)
+  | \.(?P<cls>[\w-]+)
+  | \#(?P<id>[\w-]+)
+  | \[(?P<attr>[\w-]+)(?P<op>\*?=)"(?P<value>[^"]*)"\]
+)$''', re.X)
+
+# Attribute values soupsieve compares case-insensitively in HTML documents.
+_CASE_INSENSITIVE_ATTRS = {'type'}
+
+
+class CleanedDocument(NamedTuple):
+    text: str
+    links: Set[str]
+    canonical_url: Optional[str]
+
+
+class DOMCleaner:
+    """
+    Single-pass replacement for running soup.select() once per blacklisted selector.
+
+    The selector blacklist is compiled once into lookup tables (tag names, class
+    tokens, ids, attribute equality and substring tests). A single pre-order walk
+    then drops every matching element without descending into it, and empty
+    elements are pruned from text counts computed bottom-up, so both passes are
+    linear in the size of the tree. Selectors outside the simple forms used here
+    fall back to soupsieve's compiled matcher.
+    """
+
+    def __init__(self, selectors: List[str] = None, tags: List[str] = None):
+        self.tags = set(tags if tags is not None else REMOVE_TAGS)
+        self.classes = set()
+        self.ids = set()
+        self.attr_equals = {}
+        self.attr_contains = {}
+        self.fallback = []
+
+        for selector in (selectors if selectors is not None else REMOVE_SELECTORS):
+            match = _SIMPLE_SELECTOR.match(selector)
+            if not match:
+                self.fallback.append(soupsieve.compile(selector))
+            elif match.group('tag'):
+                self.tags.add(match.group('tag').lower())
+            elif match.group('cls'):
+                self.classes.add(match.group('cls'))
+            elif match.group('id'):
+                self.ids.add(match.group('id'))
+            else:
+                attr, value = match.group('attr').lower(), match.group('value')
+                if attr in _CASE_INSENSITIVE_ATTRS:
+                    value = value.lower()
+                table = self.attr_equals if match.group('op') == '=' else self.attr_contains
+                table.setdefault(attr, []).append(value)
+
+    def is_blacklisted(self, element: Tag) -> bool:
+        """Check a single element against the compiled blacklist."""
+        if element.name in self.tags:
+            return True
+
+        attrs = element.attrs
+        if attrs:
+            for attr, value in attrs.items():
+                if attr == 'class':
+                    tokens = value if isinstance(value, list) else value.split()
+                    if self.classes.intersection(tokens):
+                        return True
+                if isinstance(value, list):
+                    value = ' '.join(value)
+                elif attr == 'id' and value in self.ids:
+                    return True
+
+                if attr in self.attr_equals:
+                    compared = value.lower() if attr in _CASE_INSENSITIVE_ATTRS else value
+                    if compared in self.attr_equals[attr]:
+                        return True
+                if attr in self.attr_contains:
+                    if any(needle and needle in value for needle in self.attr_contains[attr]):
+                        return True
+
+        return any(matcher.match(element) for matcher in self.fallback)
+
+    def remove_blacklisted(self, soup: BeautifulSoup) -> List[Tag]:
+        """
+        Remove blacklisted elements in one tree traversal.
+
+        Returns:
+            list: Surviving <a href> elements in document order
+        """
+        anchors = []
+        stack = [soup]
+        while stack:
+            node = stack.pop()
+            children = []
+            for child in list(node.contents):
+                if not isinstance(child, Tag):
+                    continue
+                if self.is_blacklisted(child):
+                    child.decompose()
+                    continue
+                if child.name == 'a' and child.has_attr('href'):
+                    anchors.append(child)
+                children.append(child)
+            # Reverse so children are visited in document order.
+            stack.extend(reversed(children))
+        return anchors
+
+    def prune_empty(self, soup: BeautifulSoup) -> None:
+        """
+        Remove every element whose subtree has no visible text.
+
+        Equivalent to calling get_text(strip=True) on each element, but the set of
+        non-blank string types in each subtree is computed once, bottom-up.
+        """
+        present = {}
+        order = []
+        stack = [soup]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(child for child in node.contents if isinstance(child, Tag))
+
+        # Children always come after their parent in `order`, so walk it backwards.
+        for node in reversed(order):
+            types = set()
+            for child in node.contents:
+                if isinstance(child, Tag):
+                    types |= present[id(child)]
+                elif isinstance(child, NavigableString) and child.strip():
+                    types.add(type(child))
+            present[id(node)] = types
+
+        stack = [soup]
+        while stack:
+            node = stack.pop()
+            for child in list(node.contents):
+                if not isinstance(child, Tag):
+                    continue
+                if self._has_text(child, present[id(child)]):
+                    stack.append(child)
+                else:
+                    child.decompose()
+
+    @staticmethod
+    def _has_text(element: Tag, types: Set[type]) -> bool:
+        wanted = element.interesting_string_types or Tag.MAIN_CONTENT_STRING_TYPES
+        if isinstance(wanted, type):
+            return wanted in types
+        return not types.isdisjoint(wanted)
+
+    def extract(self, html: str, url: str) -> Tuple[str, Set[str]]:
+        """
+        Clean an HTML page and convert it to text with markdown-styled links.
+
+        Args:
+            html (str): Raw HTML of the page
+            url (str): URL of the page, used to resolve relative links
+
+        Returns:
+            tuple: (cleaned_text_content, set of absolute links)
+        """
+        document = self.extract_document(html, url)
+        return document.text, document.links
+
+    def extract_document(self, html: str, url: str) -> CleanedDocument:
+        """
+        Like extract, but also reports the page's rel="canonical" URL.
+
+        Returns:
+            CleanedDocument: (text, links, canonical_url or None)
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        # <link> elements live in <head> when it exists, so avoid a full-tree search.
+        canonical_url = find_canonical_link(soup.head or soup, url)
+        anchors = self.remove_blacklisted(soup)
+
+        # Map links to their full URL and anchor text.
+        link_map = {}
+        for link in anchors:
+            try:
+                full_url = urljoin(url, link['href'])
+            except ValueError:
+                continue  # a malformed IPv6 host; the anchor stays as plain text
+            if full_url.startswith(('http://', 'https://')):
+                anchor_text = link.get_text(strip=True)
+                if anchor_text:
+                    link_map[link] = (full_url, anchor_text)
+
+        # Replace each <a> tag with a markdown-styled link.
+        for link, (full_url, anchor_text) in link_map.items():
+            link.replace_with(NavigableString(f'[{anchor_text}]({full_url})'))
+
+        self.prune_empty(soup)
+
+        # Extract and clean the text.
+        text_content = soup.get_text(separator='\n', strip=True)
+        text_lines = [line.strip() for line in text_content.split('\n') if line.strip()]
+        cleaned_text_content = '\n'.join(text_lines)
+
+        links = {full_url for full_url, _ in link_map.values()}
+        return CleanedDocument(cleaned_text_content, links, canonical_url)
+
+
+dom_cleaner = DOMCleaner()
@@ -0,0 +1,208 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config.settings import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vectors (
+    key TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+"""
+
+# Rows the vector file starts with; it doubles whenever it fills up.
+INITIAL_ROWS = 1024
+# SQLite's default limit on bound parameters is 999.
+LOOKUP_CHUNK = 500
+
+
+def text_key(model: str, text: str) -> str:
+    """Content address of a chunk: the SHA-256 of the model name and the exact text."""
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Append-only store of float32 vectors of one model and dimension.
+
+    Vectors live in a memory-mapped file (one row per vector) and a SQLite
+    table maps each key to its row. Rows are allocated in a SQLite
+    transaction and a key is only indexed after its vector is written, so
+    several processes can share the directory; a reader remaps the file when
+    another process has grown it.
+    """
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.dim = dim
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, f"vectors-{dim}.f32")
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, f"index-{dim}.sqlite3"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('rows', 0)")
+        self._db.commit()
+        self._vectors: Optional[np.memmap] = None
+
+    def _map(self, rows: int) -> np.memmap:
+        """Map at least `rows` rows, growing the file (by doubling) if it is shorter."""
+        if self._vectors is not None and len(self._vectors) >= rows:
+            return self._vectors
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if size < rows * row_bytes:
+            capacity = max(INITIAL_ROWS, size // row_bytes)
+            while capacity < rows:
+                capacity *= 2
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(capacity * row_bytes)
+            size = capacity * row_bytes
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(size // row_bytes, self.dim))
+        return self._vectors
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Vectors of the keys that are stored; missing keys are left out."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, row FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                if rows:
+                    vectors = self._map(max(row for _, row in rows) + 1)
+                    for key, row in rows:
+                        found[key] = np.array(vectors[row])
+        return found
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                first = self._db.execute("SELECT value FROM meta WHERE name = 'rows'").fetchone()[0]
+                self._db.execute("UPDATE meta SET value = ? WHERE name = 'rows'", (first + len(keys),))
+            mapped = self._map(first + len(keys))
+            mapped[first:first + len(keys)] = vectors
+            mapped.flush()
+            with self._db:
+                self._db.executemany("INSERT OR IGNORE INTO vectors VALUES (?, ?)",
+                                     [(key, first + i) for i, key in enumerate(keys)])
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that embeds each distinct chunk text once per model.
+
+    Vectors are looked up by text_key(model, text) in an EmbeddingStore
+    under EMBEDDING_CACHE_DIR/<model>. Misses are deduplicated and sent to
+    the wrapped model in batches bounded by EMBEDDING_BATCH_SIZE texts and
+    EMBEDDING_BATCH_MAX_CHARS characters, at most EMBEDDING_MAX_CONCURRENCY
+    at a time. Queries are not cached.
+    """
+
+    def __init__(self, underlying: Embeddings, directory: str = None, model: str = None,
+                 batch_size: int = None, batch_max_chars: int = None, max_concurrency: int = None):
+        self.underlying = underlying
+        self.model = model or getattr(underlying, 'model', None) or type(underlying).__name__
+        self.directory = os.path.join(directory or settings.EMBEDDING_CACHE_DIR, re.sub(r'[^\w.-]', '_', self.model))
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.batch_max_chars = batch_max_chars or settings.EMBEDDING_BATCH_MAX_CHARS
+        self.max_concurrency = max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY
+        self._stores: Dict[int, EmbeddingStore] = {}
+        self._store_lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'batches': 0}
+
+    def _store(self, dim: int) -> EmbeddingStore:
+        with self._store_lock:
+            if dim not in self._stores:
+                self._stores[dim] = EmbeddingStore(self.directory, dim)
+            return self._stores[dim]
+
+    def _known_store(self) -> Optional[EmbeddingStore]:
+        """The store of an earlier run, found by its file name, before this process has embedded anything."""
+        if not self._stores and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                match = re.fullmatch(r'vectors-(\d+)\.f32', name)
+                if match:
+                    return self._store(int(match.group(1)))
+        return next(iter(self._stores.values()), None)
+
+    def _batches(self, texts: List[str]) -> Iterator[List[str]]:
+        batch, chars = [], 0
+        for text in texts:
+            if batch and (len(batch) >= self.batch_size or chars + len(text) > self.batch_max_chars):
+                yield batch
+                batch, chars = [], 0
+            batch.append(text)
+            chars += len(text)
+        if batch:
+            yield batch
+
+    def _lookup(self, texts: List[str]):
+        keys = [text_key(self.model, text) for text in texts]
+        store = self._known_store()
+        found = store.get_many(list(set(keys))) if store else {}
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in found))
+        self.stats['hits'] += len(texts) - sum(1 for key in keys if key not in found)
+        self.stats['misses'] += len(missing)
+        return keys, found, missing
+
+    def _save(self, missing: List[str], vectors: List[List[float]], found: Dict[str, np.ndarray]) -> None:
+        array = np.asarray(vectors, dtype=np.float32)
+        new_keys = [text_key(self.model, text) for text in missing]
+        self._store(array.shape[1]).put_many(new_keys, array)
+        found.update(zip(new_keys, array))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        if missing:
+            batches = list(self._batches(missing))
+            self.stats['batches'] += len(batches)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(self.underlying.embed_documents, batches))
+            self._save(missing, [vector for result in results for vector in result], found)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            batches = list(self._batches(missing))
+            self.stats['batches'] += len(batches)
+            limit = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed(batch: List[str]) -> List[List[float]]:
+                async with limit:
+                    return await self.underlying.aembed_documents(batch)
+
+            results = await asyncio.gather(*(embed(batch) for batch in batches))
+            await asyncio.to_thread(self._save, missing, [vector for result in results for vector in result], found)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.underlying.aembed_query(text)
+
+
+def cached(underlying: Embeddings) -> Embeddings:
+    """Wrap an embeddings model in CachedEmbeddings when EMBEDDING_CACHE_ENABLED is set."""
+    return CachedEmbeddings(underlying) if settings.EMBEDDING_CACHE_ENABLED else underlying
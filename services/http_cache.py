@@ -0,0 +1,285 @@
+import email.utils
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from config.settings import settings
+
+# Freshness fraction of (Date - Last-Modified) used when a response has no explicit lifetime.
+HEURISTIC_FRESHNESS_FRACTION = 0.1
+HEURISTIC_FRESHNESS_MAX = 24 * 60 * 60
+# Bodies are stored decoded, so the content coding a response varied on doesn't matter.
+IGNORED_VARY_HEADERS = ('accept-encoding',)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    must_revalidate INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    parsed TEXT,
+    vary TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    status: int
+    headers: Dict[str, str]
+    blob_path: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+    must_revalidate: bool
+    parsed: Optional[str]
+
+    def is_fresh(self, now: float = None) -> bool:
+        """Whether the entry can be served without contacting the origin."""
+        return not self.must_revalidate and (now or time.time()) < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Validators to send so the origin can answer 304 Not Modified."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def vary_values(response_headers: Mapping[str, str], request_headers: Optional[Mapping[str, str]]) -> Dict[str, Optional[str]]:
+    """The request headers named by a response's Vary header, which a later request must match to reuse it."""
+    vary = {key.lower(): value for key, value in dict(response_headers).items()}.get('vary', '')
+    request_headers = {key.lower(): value for key, value in dict(request_headers or {}).items()}
+    names = (name.strip().lower() for name in vary.split(','))
+    return {name: request_headers.get(name) for name in names if name and name not in IGNORED_VARY_HEADERS}
+
+
+def freshness(headers: Dict[str, str], now: float = None):
+    """
+    Work out caching policy from response headers, following Cache-Control first,
+    then Expires, then a Last-Modified heuristic. The lifetime is reduced by the
+    response's current age: its Age header, or the time since its Date if that
+    is longer.
+
+    Returns:
+        tuple: (storable: bool, expires_at: float, must_revalidate: bool)
+    """
+    now = now or time.time()
+    headers = {key.lower(): value for key, value in headers.items()}
+    directives = _parse_cache_control(headers.get('cache-control'))
+
+    if 'no-store' in directives or headers.get('vary', '').strip() == '*':
+        return False, now, True
+    must_revalidate = 'no-cache' in directives
+
+    date = _http_date(headers.get('date')) or now
+    age = headers.get('age', '').strip()
+    current_age = max(int(age) if age.isdigit() else 0, now - date, 0)
+
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name) and directives[name].isdigit():
+            return True, now + int(directives[name]) - current_age, must_revalidate
+
+    expires = _http_date(headers.get('expires'))
+    if expires is not None:
+        return True, now + (expires - date) - current_age, must_revalidate
+
+    last_modified = _http_date(headers.get('last-modified'))
+    if last_modified is not None and last_modified < date:
+        lifetime = min((date - last_modified) * HEURISTIC_FRESHNESS_FRACTION, HEURISTIC_FRESHNESS_MAX)
+        return True, now + lifetime - current_age, must_revalidate
+
+    # No lifetime information: keep the body, but revalidate before every use.
+    return True, now, must_revalidate
+
+
+class HTTPCache:
+    """
+    On-disk HTTP cache: a SQLite index with response bodies stored as blob files.
+
+    Entries honour Cache-Control/Expires; stale entries carry their ETag and
+    Last-Modified validators so a 304 can reuse both the stored body and the
+    parsed result kept alongside it. Total blob size is capped with
+    least-recently-used eviction.
+
+    One variant is kept per URL. A response with a Vary header is only
+    reused by requests sending the same values of the headers it names;
+    a request that doesn't match misses and replaces the stored variant.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or settings.HTTP_CACHE_DIR
+        self.max_bytes = max_bytes or settings.HTTP_CACHE_MAX_BYTES
+        self.blob_directory = os.path.join(self.directory, 'blobs')
+        os.makedirs(self.blob_directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        # Indexes created before Vary was recorded
+        if 'vary' not in {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}:
+            self._db.execute("ALTER TABLE entries ADD COLUMN vary TEXT")
+            self._db.commit()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'evictions': 0}
+
+    def record(self, outcome: str) -> None:
+        """Count a 'hits', 'revalidated' or 'misses' outcome."""
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def hit_rate(self) -> float:
+        served = self.stats['hits'] + self.stats['revalidated']
+        total = served + self.stats['misses']
+        return served / total if total else 0.0
+
+    def _blob_path(self, url: str) -> str:
+        return os.path.join(self.blob_directory, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def lookup(self, url: str, request_headers: Mapping[str, str] = None) -> Optional[CacheEntry]:
+        """Return the stored entry for url (fresh or stale), or None if there is none for these request headers."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, headers, blob, size, etag, last_modified, expires_at, must_revalidate, parsed, vary "
+                "FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[10] and json.loads(row[10]) != vary_values(json.loads(row[2]), request_headers):
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+        entry = CacheEntry(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6], row[7], bool(row[8]), row[9])
+        if not os.path.exists(entry.blob_path):
+            self.delete(url)
+            return None
+        return entry
+
+    def read_body(self, entry: CacheEntry) -> bytes:
+        with open(entry.blob_path, 'rb') as f:
+            return f.read()
+
+    def store(self, url: str, status: int, headers, body: bytes, parsed: str = None, request_headers: Mapping[str, str] = None) -> bool:
+        """Store a response body. Returns False if the response isn't cacheable."""
+        return self._store(url, status, headers, parsed, request_headers, lambda path: self._write_blob(path, body))
+
+    def store_file(self, url: str, status: int, headers, source_path: str, parsed: str = None,
+                   request_headers: Mapping[str, str] = None) -> bool:
+        """Store a response whose body was already spooled to source_path (the file is copied)."""
+        return self._store(url, status, headers, parsed, request_headers, lambda path: shutil.copyfile(source_path, path))
+
+    @staticmethod
+    def _write_blob(path: str, body: bytes) -> None:
+        with open(path, 'wb') as f:
+            f.write(body)
+
+    def _store(self, url, status, headers, parsed, request_headers, write) -> bool:
+        headers = dict(headers)
+        storable, expires_at, must_revalidate = freshness(headers)
+        if status != 200 or not storable:
+            return False
+
+        lowered = {key.lower(): value for key, value in headers.items()}
+        blob_path = self._blob_path(url)
+        temp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+        write(temp_path)
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            os.unlink(temp_path)
+            return False
+        os.replace(temp_path, blob_path)
+
+        vary = vary_values(headers, request_headers)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(headers), blob_path, size, lowered.get('etag'),
+                 lowered.get('last-modified'), expires_at, int(must_revalidate), now, now, parsed,
+                 json.dumps(vary, sort_keys=True) if vary else None)
+            )
+            self._db.commit()
+        self.evict()
+        return True
+
+    def revalidated(self, entry: CacheEntry, headers) -> None:
+        """Refresh an entry's lifetime (and any updated headers) after a 304 response."""
+        merged = {**entry.headers, **dict(headers)}
+        _, expires_at, must_revalidate = freshness(merged)
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET headers = ?, expires_at = ?, must_revalidate = ?, last_access = ? WHERE url = ?",
+                (json.dumps(merged), expires_at, int(must_revalidate), time.time(), entry.url)
+            )
+            self._db.commit()
+
+    def set_parsed(self, url: str, parsed: str) -> None:
+        """Attach a parsed representation of the body so revalidated hits skip parsing."""
+        with self._lock:
+            self._db.execute("UPDATE entries SET parsed = ? WHERE url = ?", (parsed, url))
+            self._db.commit()
+
+    def delete(self, url: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+        try:
+            os.unlink(self._blob_path(url))
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the blobs fit within max_bytes."""
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for url, blob_path, size in self._db.execute("SELECT url, blob, size FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((url, blob_path))
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE url = ?", [(url,) for url, _ in victims])
+            self._db.commit()
+            self.stats['evictions'] += len(victims)
+
+        for _, blob_path in victims:
+            try:
+                os.unlink(blob_path)
+            except FileNotFoundError:
+                pass
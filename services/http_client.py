@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from config.settings import settings
+from services.http_cache import HTTPCache, CacheEntry
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Detected document types, matching the 'type' field of ScraperService results.
+TYPE_WEBPAGE = 'webpage'
+TYPE_PDF = 'pdf'
+TYPE_SKIP = 'skip'
+
+# Number of leading body bytes inspected by detect_content_type.
+SNIFF_BYTES = 1024
+
+_HTML_MARKERS = (b'<!doctype html', b'<html', b'<head', b'<body', b'<!--', b'<div', b'<p', b'<title', b'<meta')
+_HTML_CONTENT_TYPES = ('text/', 'application/xhtml+xml')
+
+
+def detect_content_type(url: str, content_type: str, head: bytes) -> str:
+    """
+    Decide how a response should be processed from its Content-Type header and first bytes.
+
+    Args:
+        url (str): URL the response came from
+        content_type (str): Value of the Content-Type header, may be empty
+        head (bytes): First bytes of the body (up to SNIFF_BYTES)
+
+    Returns:
+        str: TYPE_WEBPAGE, TYPE_PDF or TYPE_SKIP
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    start = head.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+
+    if start.startswith(b'%pdf-'):
+        return TYPE_PDF
+    looks_like_html = start.startswith(_HTML_MARKERS)
+    if content_type == 'application/pdf' and not looks_like_html:
+        return TYPE_PDF
+    if content_type.startswith(_HTML_CONTENT_TYPES) or looks_like_html:
+        return TYPE_WEBPAGE
+    if not content_type and not url.lower().endswith('.pdf'):
+        # No header to go on; let the HTML parser have a go at textual bodies.
+        return TYPE_WEBPAGE if b'\x00' not in start else TYPE_SKIP
+    return TYPE_SKIP
+
+
+async def _close_at_loop_end(client: httpx.AsyncClient):
+    """
+    Suspended async generator that closes client when it is finalised. The loop
+    finalises its unfinished async generators in shutdown_asyncgens(), which
+    asyncio.run() and uvicorn call before closing it, so the client's
+    connections are closed on the loop they belong to.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies a default timeout when the caller doesn't pass one.
+    """
+
+    def __init__(self, timeout: float, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class HTTPClient:
+    """
+    Shared HTTP client layer with keep-alive connection pools per host.
+
+    Synchronous callers go through one requests.Session, whose adapter keeps
+    up to pool_connections host pools of pool_maxsize connections each. Async
+    callers get an httpx.AsyncClient (optionally speaking HTTP/2) that is
+    created once per event loop, since httpx connections can't cross loops,
+    and closed when that loop shuts down.
+
+    GET responses go through the persistent HTTP cache when it is enabled:
+    fresh entries are served from disk and stale ones are revalidated with
+    If-None-Match/If-Modified-Since. The cache is opened on first use, so
+    importing this module doesn't create HTTP_CACHE_DIR.
+    """
+
+    def __init__(self, pool_connections: int = None, pool_maxsize: int = None, timeout: float = None, http2: bool = None, cache: HTTPCache = None):
+        self.pool_connections = pool_connections or settings.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or settings.HTTP_POOL_MAXSIZE
+        self.timeout = timeout or settings.HTTP_TIMEOUT
+        self.http2 = settings.HTTP2_ENABLED if http2 is None else http2
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = TimeoutHTTPAdapter(
+            self.timeout,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._cache = cache
+        self._cache_enabled = cache is not None or settings.HTTP_CACHE_ENABLED
+        self._cache_lock = threading.Lock()
+
+    @property
+    def cache(self) -> Optional[HTTPCache]:
+        """The HTTP cache, or None when HTTP_CACHE_ENABLED is off."""
+        if self._cache is None and self._cache_enabled:
+            with self._cache_lock:
+                if self._cache is None:
+                    self._cache = HTTPCache()
+        return self._cache
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a GET request through the shared session and the HTTP cache.
+        Streamed requests bypass the cache.
+        """
+        if self.cache is None or kwargs.get('stream'):
+            return self.session.get(url, **kwargs)
+
+        request_headers = {**self.session.headers, **(kwargs.get('headers') or {})}
+        entry = self.cache.lookup(url, request_headers)
+        if entry is not None and entry.is_fresh():
+            self.cache.record('hits')
+            return self._cached_response(entry)
+
+        if entry is not None:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **entry.conditional_headers()}
+        response = self.session.get(url, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.record('revalidated')
+            self.cache.revalidated(entry, response.headers)
+            return self._cached_response(entry)
+
+        self.cache.record('misses')
+        self.cache.store(url, response.status_code, response.headers, response.content, request_headers=request_headers)
+        return response
+
+    def _cached_response(self, entry: CacheEntry) -> requests.Response:
+        """Rebuild a requests.Response from a cache entry. The reason phrase isn't stored and is left as None."""
+        response = requests.Response()
+        response.status_code = entry.status
+        response.url = entry.url
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.cache.read_body(entry)
+        response.from_cache = True
+        return response
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        """Send a HEAD request through the shared session."""
+        return self.session.head(url, **kwargs)
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Return the pooled httpx.AsyncClient for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client, _ = self._async_clients.get(loop, (None, None))
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                follow_redirects=True,
+                timeout=self.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.pool_connections * self.pool_maxsize,
+                    max_keepalive_connections=self.pool_connections * self.pool_maxsize
+                )
+            )
+            # Start the closer on this loop so the loop tracks it; it is kept with the
+            # client, since dropping it would finalise it (and close the client) early.
+            closer = _close_at_loop_end(client)
+            try:
+                closer.asend(None).send(None)
+            except StopIteration:
+                pass
+            self._async_clients[loop] = (client, closer)
+        return client
+
+    async def aclose(self) -> None:
+        """Close the running loop's AsyncClient now rather than at loop shutdown."""
+        _, closer = self._async_clients.pop(asyncio.get_running_loop(), (None, None))
+        if closer is not None:
+            await closer.aclose()
+
+
+http_client = HTTPClient()
@@ -0,0 +1,401 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+from config.settings import settings
+from services.crawl_checkpoint import CrawlCheckpoint
+from services.crawl_engine import AsyncCrawler
+from services.scraper_service import scraper_service
+from services.sharded_crawler import CRAWL_MODES, CRAWL_MODE_SHARDED, sharded_crawler
+
+KIND_CRAWL = 'crawl'    # follow links from params['url'] up to params['max_depth'] and params['max_pages'], in params['mode']
+KIND_SCRAPE = 'scrape'  # fetch each of params['urls'] without following links
+KINDS = (KIND_CRAWL, KIND_SCRAPE)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    pages INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    owner TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    links TEXT NOT NULL,
+    UNIQUE (job_id, url)
+);
+"""
+
+
+def _bounded_int(params: Dict, name: str, default: int, low: int, high: int) -> int:
+    value = params.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"'{name}' must be a whole number from {low} to {high}.")
+    return value
+
+
+class JobService:
+    """
+    Background crawl and scrape jobs on a bounded pool of asyncio workers.
+
+    Jobs and their pages are kept in a SQLite table, so status, progress
+    and results survive restarts. Crawl jobs are checkpointed under their
+    job id; a retried or interrupted crawl resumes from its checkpoint
+    instead of starting over. Pages are stored as they are parsed and can be
+    read while the job is still running.
+
+    Several processes (e.g. uvicorn workers) can share the table: a worker
+    claims a queued job atomically and holds it under a lease it renews
+    every JOBS_LEASE_SECONDS / 3. A job whose lease has expired belonged to a
+    process that died and is queued again; a job cancelled by another process
+    loses its lease and its owner stops it.
+    """
+
+    def __init__(self, path: str = None, workers: int = None):
+        self.path = path or settings.JOBS_DB_PATH
+        self.workers = workers or settings.JOBS_MAX_WORKERS
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_lock = threading.Lock()
+
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._leased: Set[str] = set()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """The jobs database, opened (and created) on first use rather than at import."""
+        if self._connection is None:
+            with self._connection_lock:
+                if self._connection is None:
+                    self._connection = self._open()
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+        # Tables created before leases existed
+        columns = {row['name'] for row in db.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (('owner', 'TEXT'), ('lease_until', 'REAL')):
+            if column not in columns:
+                db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        db.commit()
+        return db
+
+    def _execute(self, sql: str, args: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+            self._db.commit()
+            return rows
+
+    def _update(self, sql: str, args: tuple = ()) -> int:
+        """Run a write and return the number of rows it changed."""
+        with self._lock:
+            changed = self._db.execute(sql, args).rowcount
+            self._db.commit()
+            return changed
+
+    @staticmethod
+    def _job_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._job_dict(rows[0]) if rows else None
+
+    def results(self, job_id: str, after: int = 0, limit: int = None) -> List[Dict]:
+        """
+        Stored pages of a job in the order they were parsed.
+
+        Args:
+            job_id (str): The job.
+            after (int, optional): Only pages with a seq greater than this cursor. Defaults to 0.
+            limit (int, optional): Maximum number of pages. Defaults to JOBS_RESULTS_PAGE_SIZE.
+
+        Returns:
+            List[Dict]: Pages with seq, url, type, content and links.
+        """
+        rows = self._execute(
+            "SELECT seq, url, type, content, links FROM job_results WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit or settings.JOBS_RESULTS_PAGE_SIZE)
+        )
+        return [{**dict(row), 'links': json.loads(row['links'])} for row in rows]
+
+    async def start(self) -> None:
+        """Start the workers and queue the jobs left queued, or running under an expired lease, by other processes."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        await asyncio.to_thread(self._requeue_expired)
+        rows = await asyncio.to_thread(self._execute, "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,))
+        for row in rows:
+            self._queue.put_nowait(row['id'])
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._workers.append(asyncio.create_task(self._keep_leases()))
+
+    async def stop(self) -> None:
+        """Stop the workers. Interrupted jobs go back to 'queued' and are resumed by the next start() of any process."""
+        tasks = self._workers + list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(
+            self._update,
+            "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL WHERE owner = ? AND status = ?",
+            (QUEUED, self.owner, RUNNING)
+        )
+        self._workers = []
+        self._running = {}
+        self._queue = None
+
+    def _requeue_expired(self) -> List[str]:
+        """Queue again the running jobs whose owner stopped renewing its lease, and return their ids."""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)", (RUNNING, now)
+            ).fetchall()
+            self._db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL "
+                "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (QUEUED, RUNNING, now)
+            )
+            self._db.commit()
+        return [row['id'] for row in rows]
+
+    def _renew_leases(self, job_ids: List[str]) -> List[str]:
+        """Extend the leases of this process's jobs; returns the ones it no longer holds (cancelled elsewhere)."""
+        lease_until = time.time() + settings.JOBS_LEASE_SECONDS
+        return [
+            job_id for job_id in job_ids
+            if not self._update("UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = ?",
+                                (lease_until, job_id, self.owner, RUNNING))
+        ]
+
+    async def _keep_leases(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JOBS_LEASE_SECONDS / 3)
+            try:
+                for job_id in await asyncio.to_thread(self._renew_leases, list(self._leased)):
+                    task = self._running.get(job_id)
+                    if task is not None:
+                        task.cancel()
+                for job_id in await asyncio.to_thread(self._requeue_expired):
+                    self._queue.put_nowait(job_id)
+            except sqlite3.Error as e:
+                print(f"Error renewing job leases: {e}")
+
+    async def submit(self, kind: str, params: Dict) -> Dict:
+        """Store a new job and queue it. Raises ValueError for an unknown kind or missing parameters."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(KINDS)}")
+        if kind == KIND_CRAWL and not params.get('url'):
+            raise ValueError("A crawl job needs a 'url'.")
+        if kind == KIND_SCRAPE and not params.get('urls'):
+            raise ValueError("A scrape job needs a non-empty 'urls' list.")
+        if kind == KIND_CRAWL:
+            # The mode may come from CRAWL_MODE, so it is resolved before it is checked or reported.
+            mode = params.get('mode', settings.CRAWL_MODE)
+            if mode not in CRAWL_MODES:
+                raise ValueError(f"Unknown crawl mode {mode!r}; expected one of {', '.join(CRAWL_MODES)}")
+            params = {
+                **params,
+                'mode': mode,
+                'max_depth': _bounded_int(params, 'max_depth', 2, 0, settings.JOBS_MAX_DEPTH),
+                'max_pages': _bounded_int(params, 'max_pages', settings.CRAWL_MAX_PAGES, 1, settings.CRAWL_MAX_PAGES),
+            }
+
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params), QUEUED, time.time())
+        )
+        await self.start()
+        self._queue.put_nowait(job_id)
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def retry(self, job_id: str) -> Optional[Dict]:
+        """Queue a failed or cancelled job again. Returns None if there is no such job."""
+        job = await asyncio.to_thread(self.get, job_id)
+        if job is None:
+            return None
+        requeued = await asyncio.to_thread(
+            self._update,
+            "UPDATE jobs SET status = ?, error = NULL, finished_at = NULL WHERE id = ? AND status IN (?, ?)",
+            (QUEUED, job_id, FAILED, CANCELLED)
+        )
+        if not requeued:
+            raise ValueError(f"Only failed or cancelled jobs can be retried; job is {job['status']}.")
+        await self.start()
+        self._queue.put_nowait(job_id)
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued or running job. Returns None if there is no such job."""
+        job = await asyncio.to_thread(self.get, job_id)
+        if job is None:
+            return None
+        if job['status'] in FINISHED_STATUSES:
+            return job
+        # Mark it cancelled first: the owning process, this one or another, then loses the
+        # lease and stops the job, and the job's own outcome can no longer overwrite it.
+        await asyncio.to_thread(
+            self._update,
+            "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+            (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+        )
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return await asyncio.to_thread(self.get, job_id)
+
+    def _finish(self, job_id: str, status: str, error: Optional[str]) -> None:
+        """Record the outcome of a job this process still holds; a cancelled or taken-over job is left alone."""
+        self._update(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ?, owner = NULL, lease_until = NULL "
+            "WHERE id = ? AND owner = ? AND status = ?",
+            (status, error, time.time(), job_id, self.owner, RUNNING)
+        )
+
+    def _store_page(self, job_id: str, url: str, page) -> None:
+        with self._lock:
+            # A resumed crawl yields its checkpointed pages again; they are stored once.
+            stored = self._db.execute(
+                "INSERT OR IGNORE INTO job_results (job_id, url, type, content, links) VALUES (?, ?, ?, ?, ?)",
+                (job_id, url, page.type, page.content, json.dumps(sorted(page.links)))
+            ).rowcount
+            if stored:
+                self._db.execute("UPDATE jobs SET pages = pages + 1 WHERE id = ?", (job_id,))
+            self._db.commit()
+
+    def _count_error(self, job_id: str) -> None:
+        self._execute("UPDATE jobs SET errors = errors + 1 WHERE id = ?", (job_id,))
+
+    async def _run_crawl(self, job_id: str, params: Dict) -> None:
+        if params.get('mode', settings.CRAWL_MODE) == CRAWL_MODE_SHARDED:
+            await self._run_sharded_crawl(job_id, params)
+            return
+        crawler = AsyncCrawler(scraper_service)
+        checkpoint = CrawlCheckpoint(job_id)
+
+        async def count_error(url: str, error: Exception) -> None:
+            await asyncio.to_thread(self._count_error, job_id)
+
+        pages = crawler.iter_pages(params['url'], max_depth=params.get('max_depth', 2), checkpoint=checkpoint,
+                                   on_error=count_error, max_pages=params.get('max_pages', settings.CRAWL_MAX_PAGES))
+        try:
+            async for page_url, page in pages:
+                await asyncio.to_thread(self._store_page, job_id, page_url, page)
+        finally:
+            await pages.aclose()
+        # Every page is in job_results now; the journal is only needed to resume an unfinished crawl.
+        await asyncio.to_thread(checkpoint.delete)
+
+    async def _run_sharded_crawl(self, job_id: str, params: Dict) -> None:
+        # The worker processes return the crawl at the end, so pages are stored once it is
+        # done, and it isn't checkpointed: a retried sharded crawl starts over.
+        pages = await asyncio.to_thread(sharded_crawler.crawl, params['url'], max_depth=params.get('max_depth', 2),
+                                        max_pages=params.get('max_pages', settings.CRAWL_MAX_PAGES))
+        for page_url, page in pages.items():
+            await asyncio.to_thread(self._store_page, job_id, page_url, page)
+
+    async def _run_scrape(self, job_id: str, params: Dict) -> None:
+        crawler = AsyncCrawler(scraper_service)
+
+        async def fetch(url: str):
+            return url, await crawler.fetch_page(url)
+
+        tasks = [asyncio.create_task(fetch(url)) for url in params['urls']]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    url, page = await next_done
+                except Exception as e:
+                    print(f"Error processing scrape job {job_id}: {e}")
+                    await asyncio.to_thread(self._count_error, job_id)
+                    continue
+                if page is not None:
+                    await asyncio.to_thread(self._store_page, job_id, url, page)
+        finally:
+            # A cancelled or failed job doesn't leave fetches running.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.get, job_id)
+        if job is None:
+            return
+        # The same job may be queued by several processes; only the one whose claim succeeds runs it.
+        now = time.time()
+        claimed = await asyncio.to_thread(
+            self._update,
+            "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1, started_at = ? "
+            "WHERE id = ? AND status = ?",
+            (RUNNING, self.owner, now + settings.JOBS_LEASE_SECONDS, now, job_id, QUEUED)
+        )
+        if not claimed:
+            return
+        self._leased.add(job_id)
+        runner = self._run_crawl if job['kind'] == KIND_CRAWL else self._run_scrape
+        try:
+            await runner(job_id, job['params'])
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            await asyncio.to_thread(self._finish, job_id, FAILED, str(e))
+        else:
+            await asyncio.to_thread(self._finish, job_id, SUCCEEDED, None)
+        finally:
+            self._leased.discard(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            if job_id in self._running:
+                continue
+            task = self._running[job_id] = asyncio.create_task(self._run(job_id))
+            try:
+                await asyncio.gather(task, return_exceptions=True)
+            finally:
+                self._running.pop(job_id, None)
+
+
+job_service = JobService()
@@ -1,36 +1,65 @@
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import re
+import time
+import concurrent.futures
 import cloudscraper
 import urllib3
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 from urllib.parse import urljoin
-from webdriver_manager.chrome import ChromeDriverManager
 import traceback
 
+from config.settings import settings
+from services.browser_pool import BrowserPool
+from services.http_client import http_client
+from services.sitemap_discovery import SitemapDiscovery
+from services.strategy_memory import domain_of, strategy_memory
+from services.url_canonicalizer import canonicalize_url, url_key
+
 class URLExtractor:
-    def __init__(self, user_agent=None):
+    # Strategies costing one or a few plain HTTP requests; safe to race against each other
+    CHEAP_STRATEGIES = ('_extract_with_requests', '_extract_with_cloudscraper', '_extract_with_regex')
+
+    def __init__(self, user_agent=None, browser_pool=None, memory=None):
         """
         Initialize URL extractor with optional custom user agent
         
         Args:
             user_agent (str, optional): Custom user agent to use in requests
+            browser_pool (BrowserPool, optional): Pool of headless browsers for the Selenium strategy
+            memory (StrategyMemory, optional): Per-domain record of which strategies work
         """
         self.headers = {
             'User-Agent': user_agent or 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self._cloudscraper = None
+        self.browser_pool = browser_pool or BrowserPool(user_agent=self.headers['User-Agent'])
+        self.memory = memory or strategy_memory
+        self.sitemap_discovery = SitemapDiscovery(user_agent=self.headers['User-Agent'])
+        # lastmod of every URL found in the last extract_urls call's sitemaps
+        self.sitemap_lastmod = {}
+
+    @property
+    def cloudscraper_session(self):
+        """
+        Lazily created cloudscraper session, reused so its Cloudflare cookies and
+        connections survive between calls
+        """
+        if self._cloudscraper is None:
+            self._cloudscraper = cloudscraper.create_scraper()
+        return self._cloudscraper
 
-    def extract_urls(self, base_url, max_depth=2):
+    def extract_urls(self, base_url, max_depth=2, parallel=None):
         """
-        Comprehensive URL extraction method with multiple fallback strategies
+        Comprehensive URL extraction method with multiple fallback strategies.
+        robots.txt and sitemaps are tried first; their lastmod values are kept
+        in self.sitemap_lastmod. Strategies are then tried starting with the
+        one that has worked best for this domain before
         
         Args:
             base_url (str): Base URL to extract links from
             max_depth (int, optional): Maximum depth of link extraction. Defaults to 2.
+            parallel (bool, optional): Race the cheap strategies and keep the first
+                non-empty result. Defaults to URL_EXTRACTOR_PARALLEL.
         
         Returns:
             set: Unique URLs extracted from the webpage
@@ -38,32 +67,87 @@ class URLExtractor:
         # Ensure base_url has a scheme
         if not urlparse(base_url).scheme:
             base_url = f'https://{base_url}'
+
+        # Sitemaps list the whole site in one or two requests; only crawl HTML
+        # when they are missing or too sparse to trust
+        self.sitemap_lastmod = self.sitemap_discovery.discover(base_url)
+        sitemap_urls = self._filter_urls(base_url, self.sitemap_lastmod, max_depth)
+        if len(sitemap_urls) >= settings.SITEMAP_MIN_URLS:
+            print(f"Found {len(sitemap_urls)} URLs in sitemaps")
+            return sitemap_urls
         
-        # List of extraction methods to try
-        extraction_methods = [
-            self._extract_with_requests,
-            self._extract_with_cloudscraper,
-            self._extract_with_selenium,
-            self._extract_with_regex
-        ]
-        
-        # Try each method until we find URLs
+        # List of extraction methods to try, best first for this domain
+        domain = domain_of(base_url)
+        names = self.memory.rank(domain, [
+            '_extract_with_requests',
+            '_extract_with_cloudscraper',
+            '_extract_with_selenium',
+            '_extract_with_regex'
+        ])
+        if parallel is None:
+            parallel = settings.URL_EXTRACTOR_PARALLEL
+
         urls = set()
-        for method in extraction_methods:
-            try:
-                print(f"Trying method: {method.__name__}")
-                urls = method(base_url)
-                if urls:
-                    print(f"Method {method.__name__} succeeded")
-                    break
-            except Exception as e:
-                print(f"Method {method.__name__} failed: {e}")
-                continue
+        best = self.memory.best(domain)
+        if best in names:
+            # Whatever worked here last time gets a solo attempt before anything else
+            urls = self._run_strategy(domain, best, base_url)
+            names.remove(best)
+        if not urls and parallel:
+            cheap = [name for name in names if name in self.CHEAP_STRATEGIES]
+            urls = self._race_strategies(domain, cheap, base_url)
+            names = [name for name in names if name not in cheap]
+
+        # Try each remaining method until we find URLs
+        for name in names:
+            if urls:
+                break
+            urls = self._run_strategy(domain, name, base_url)
         
-        # Filter and clean URLs
-        filtered_urls = self._filter_urls(base_url, urls, max_depth)
+        # Filter and clean URLs, keeping whatever a partial sitemap listed
+        filtered_urls = self._filter_urls(base_url, set(urls) | sitemap_urls, max_depth)
         return filtered_urls
 
+    def _run_strategy(self, domain, name, base_url):
+        """
+        Run one extraction strategy and record its outcome and duration for the domain
+        
+        Returns:
+            set: Extracted URLs, empty if the strategy failed
+        """
+        print(f"Trying method: {name}")
+        started = time.perf_counter()
+        try:
+            urls = getattr(self, name)(base_url)
+        except Exception as e:
+            print(f"Method {name} failed: {e}")
+            urls = set()
+        self.memory.record(domain, name, bool(urls), time.perf_counter() - started)
+        if urls:
+            print(f"Method {name} succeeded")
+        return urls
+
+    def _race_strategies(self, domain, names, base_url):
+        """
+        Run several strategies at once and return the first non-empty result
+        
+        Returns:
+            set: Extracted URLs, empty if every strategy failed
+        """
+        if not names:
+            return set()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(names))
+        futures = [executor.submit(self._run_strategy, domain, name, base_url) for name in names]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                urls = future.result()
+                if urls:
+                    return urls
+            return set()
+        finally:
+            # Losers finish in the background; their outcomes are still recorded
+            executor.shutdown(wait=False)
+
     def _extract_with_requests(self, base_url):
         """
         Extract URLs using requests library with various headers and SSL verification
@@ -83,7 +167,7 @@ class URLExtractor:
         
         for headers in header_variations:
             try:
-                response = requests.get(
+                response = http_client.get(
                     base_url, 
                     headers=headers, 
                     verify=False,  # Disable SSL verification
@@ -113,8 +197,7 @@ class URLExtractor:
             set: Extracted URLs
         """
         try:
-            scraper = cloudscraper.create_scraper()
-            response = scraper.get(base_url, timeout=10)
+            response = self.cloudscraper_session.get(base_url, timeout=10)
             
             soup = BeautifulSoup(response.text, 'html.parser')
             links = soup.find_all('a', href=True)
@@ -135,21 +218,15 @@ class URLExtractor:
             set: Extracted URLs
         """
         try:
-            # Set up Selenium WebDriver
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            
-            # Use a context manager for the WebDriver
-            with webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options) as driver:
+            # Warm browsers are reused across calls instead of launching Chrome every time
+            with self.browser_pool.session() as driver:
                 driver.get(base_url)
                 
-                # Extract URLs
-                links = driver.find_elements(By.TAG_NAME, 'a')
-                urls = {urljoin(base_url, link.get_attribute('href')) 
-                        for link in links 
-                        if link.get_attribute('href') and link.get_attribute('href').startswith(('http', 'https'))}
+                # Collect every href in one round trip instead of one WebDriver call per attribute
+                hrefs = driver.execute_script("return Array.from(document.querySelectorAll('a[href]'), a => a.href);")
+                urls = {urljoin(base_url, href) 
+                        for href in hrefs or []
+                        if href and href.startswith(('http', 'https'))}
                 return urls
         except Exception as e:
             print(f"Selenium method failed: {e}")
@@ -167,7 +244,7 @@ class URLExtractor:
             set: Extracted URLs
         """
         try:
-            response = requests.get(base_url, headers=self.headers, verify=False)
+            response = http_client.get(base_url, headers=self.headers, verify=False)
             url_pattern = r'https?://[^\s<>"]+|/[^\s<>"]+\.[^\s<>"]+'
             urls = set(re.findall(url_pattern, response.text))
             return {urljoin(base_url, url) for url in urls if url.startswith(('http', '/'))}
@@ -192,8 +269,13 @@ class URLExtractor:
                                 '.webm', '.webp', '.pdf', '.doc', '.docx', '.zip')
         
         filtered_urls = set()
+        seen_keys = set()
         for url in urls:
             try:
+                # Collapse fragments, tracking parameters and other spellings of the same page
+                url = canonicalize_url(url)
+                if url_key(url) in seen_keys:
+                    continue
                 parsed_url = urlparse(url)
                 # Check base domain
                 if parsed_url.netloc.replace('www.', '') == urlparse(base_url).netloc.replace('www.', ''):
@@ -203,6 +285,7 @@ class URLExtractor:
                         # Check file extensions
                         if not url.lower().endswith(excluded_extensions):
                             filtered_urls.add(url)
+                            seen_keys.add(url_key(url))
             except Exception as e:
                 print(f"URL filtering error: {e}")
         
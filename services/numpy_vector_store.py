@@ -0,0 +1,337 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    row INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+"""
+
+# Rows the matrix starts with; it doubles whenever it fills up.
+INITIAL_ROWS = 1024
+
+Filter = Union[Dict[str, Any], Callable[[Document], bool]]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Vector store over one contiguous float32 matrix of unit-length rows.
+
+    Search is a single matrix-vector product (cosine similarity) and an
+    argpartition for the top k. Documents can be filtered with a callable,
+    like InMemoryVectorStore, or with a Chroma-style dict such as
+    {"url_key": {"$in": [...]}}; dict filters are answered from a cached
+    value -> rows index per metadata field, and only the matching rows are
+    scored when they are a small part of the matrix. Deleted rows are masked and compacted once they
+    make up half the matrix.
+
+    Without a directory everything lives in memory. With one, the matrix is a
+    memory-mapped file and documents are kept in a SQLite table next to it,
+    so the store reopens without re-embedding anything. Compaction writes a
+    new file and switches to it in the same transaction that renumbers the
+    rows, so a crash never pairs rows with the wrong vectors.
+    """
+
+    def __init__(self, embedding: Embeddings, directory: str = None):
+        self.embedding = embedding
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._rows: Dict[str, int] = {}
+        self._postings_cache: Dict[str, Dict[Any, np.ndarray]] = {}
+        self._db = None
+        self._dim = 0
+        self._generation = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(directory, "documents.sqlite3"), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"vectors-{generation}.f32")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load(self) -> None:
+        meta = dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+        self._generation = meta.get('generation', 0)
+        rows = self._db.execute("SELECT id, row, text, metadata FROM documents ORDER BY row").fetchall()
+        if not rows:
+            return
+        self._dim = meta['dim']
+        path = self._vectors_path(self._generation)
+        self._matrix = np.memmap(path, dtype=np.float32, mode='r+', shape=(os.path.getsize(path) // (self._dim * 4), self._dim))
+        self._size = rows[-1][1] + 1
+        self._alive = np.zeros(len(self._matrix), dtype=bool)
+        self._ids = [None] * self._size
+        self._texts = [''] * self._size
+        self._metadatas = [{}] * self._size
+        for doc_id, row, text, metadata in rows:
+            self._ids[row], self._texts[row], self._metadatas[row] = doc_id, text, json.loads(metadata)
+            self._rows[doc_id] = row
+            self._alive[row] = True
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """Make room for at least `rows` rows, doubling the matrix (or its file) as needed."""
+        if self._matrix is not None and len(self._matrix) >= rows:
+            return
+        capacity = max(INITIAL_ROWS, len(self._matrix) if self._matrix is not None else 0)
+        while capacity < rows:
+            capacity *= 2
+        if self.directory:
+            if self._matrix is not None:
+                self._matrix.flush()
+            else:
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [('dim', dim), ('generation', self._generation)])
+                # Vectors of documents that were all deleted before this store was opened.
+                if os.path.exists(self._vectors_path(self._generation)):
+                    os.remove(self._vectors_path(self._generation))
+            path = self._vectors_path(self._generation)
+            with open(path, 'ab') as f:
+                f.truncate(capacity * dim * 4)
+            self._matrix = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, dim))
+        else:
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            if self._matrix is not None:
+                matrix[:self._size] = self._matrix[:self._size]
+            self._matrix = matrix
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+
+    @staticmethod
+    def _normalise(vectors) -> np.ndarray:
+        array = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(array, axis=-1, keepdims=True)
+        return array / np.where(norms == 0, 1, norms)
+
+    def add_embeddings(self, texts: Sequence[str], embeddings, metadatas: Sequence[dict] = None,
+                       ids: Sequence[str] = None) -> List[str]:
+        """Add texts with precomputed embeddings. Existing ids are overwritten in place."""
+        vectors = self._normalise(embeddings)
+        if self._dim and vectors.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} doesn't match the store's {self._dim}")
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = [doc_id or uuid.uuid4().hex for doc_id in ids] if ids is not None else [uuid.uuid4().hex for _ in texts]
+        with self._lock:
+            new = [doc_id for doc_id in dict.fromkeys(ids) if doc_id not in self._rows]
+            self._reserve(self._size + len(new), vectors.shape[1])
+            self._dim = vectors.shape[1]
+            for doc_id in new:
+                self._rows[doc_id] = self._size
+                self._ids.append(doc_id)
+                self._texts.append('')
+                self._metadatas.append({})
+                self._size += 1
+            rows = np.fromiter((self._rows[doc_id] for doc_id in ids), dtype=np.int64, count=len(ids))
+            self._matrix[rows] = vectors
+            self._alive[rows] = True
+            for row, text, metadata in zip(rows.tolist(), texts, metadatas):
+                self._texts[row] = text
+                self._metadatas[row] = metadata
+            self._postings_cache.clear()
+            if self._db is not None:
+                self._matrix.flush()
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                        [(doc_id, row, text, json.dumps(metadata, default=str))
+                         for doc_id, row, text, metadata in zip(ids, rows.tolist(), texts, metadatas)]
+                    )
+        return list(ids)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    async def aadd_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                         ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(texts, await self.embedding.aembed_documents(texts), metadatas, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            rows = [self._rows.pop(doc_id) for doc_id in ids or [] if doc_id in self._rows]
+            if not rows:
+                return True
+            self._alive[rows] = False
+            for row in rows:
+                self._ids[row], self._texts[row], self._metadatas[row] = None, '', {}
+            if self._db is not None:
+                with self._db:
+                    self._db.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids])
+            if len(self._rows) * 2 < self._size:
+                self._compact()
+        return True
+
+    def _compact(self) -> None:
+        """Move live rows to the front of the matrix, in order."""
+        keep = np.flatnonzero(self._alive[:self._size])
+        capacity = len(self._matrix)
+        if self._db is None:
+            self._matrix[:len(keep)] = self._matrix[keep]
+        else:
+            path = self._vectors_path(self._generation + 1)
+            with open(path, 'wb') as f:
+                f.truncate(capacity * self._dim * 4)
+            matrix = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, self._dim))
+            matrix[:len(keep)] = self._matrix[keep]
+            matrix.flush()
+            with self._db:
+                self._db.executemany("UPDATE documents SET row = ? WHERE id = ?",
+                                     [(row, self._ids[old]) for row, old in enumerate(keep.tolist())])
+                self._db.execute("UPDATE meta SET value = ? WHERE name = 'generation'", (self._generation + 1,))
+            old_path = self._vectors_path(self._generation)
+            self._matrix, self._generation = matrix, self._generation + 1
+            os.remove(old_path)
+        self._alive[:] = False
+        self._alive[:len(keep)] = True
+        self._ids = [self._ids[row] for row in keep]
+        self._texts = [self._texts[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._size = len(keep)
+        self._postings_cache.clear()
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            return [self._document(self._rows[doc_id]) for doc_id in ids if doc_id in self._rows]
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    @staticmethod
+    def _hashable(value):
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            return json.dumps(value, sort_keys=True, default=str)
+
+    def _postings(self, field: str) -> Dict[Any, np.ndarray]:
+        """Rows of each value of one metadata field, cached until the store changes."""
+        if field not in self._postings_cache:
+            rows: Dict[Any, List[int]] = {}
+            for row, metadata in enumerate(self._metadatas):
+                rows.setdefault(self._hashable(metadata.get(field)), []).append(row)
+            self._postings_cache[field] = {value: np.array(value_rows, dtype=np.int64) for value, value_rows in rows.items()}
+        return self._postings_cache[field]
+
+    def _matching(self, field: str, values: Iterable) -> np.ndarray:
+        postings = self._postings(field)
+        selected = np.zeros(self._size, dtype=bool)
+        for value in values:
+            rows = postings.get(self._hashable(value))
+            if rows is not None:
+                selected[rows] = True
+        return selected
+
+    def _mask(self, filter: Optional[Filter]) -> np.ndarray:
+        mask = self._alive[:self._size].copy()
+        if filter is None:
+            return mask
+        if callable(filter):
+            rows = np.flatnonzero(mask)
+            mask[rows] = [filter(self._document(row)) for row in rows]
+            return mask
+        for field, condition in filter.items():
+            if field == "$and":
+                for clause in condition:
+                    mask &= self._mask(clause)
+                continue
+            if field == "$or":
+                mask &= np.logical_or.reduce([self._mask(clause) for clause in condition])
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                if operator == "$eq":
+                    mask &= self._matching(field, [value])
+                elif operator == "$ne":
+                    mask &= ~self._matching(field, [value])
+                elif operator == "$in":
+                    mask &= self._matching(field, value)
+                elif operator == "$nin":
+                    mask &= ~self._matching(field, value)
+                else:
+                    raise ValueError(f"Unsupported filter operator {operator!r}")
+        return mask
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Filter] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """The k most similar documents to a vector, with their cosine similarity, best first."""
+        with self._lock:
+            if not self._size:
+                return []
+            query = self._normalise(embedding)
+            rows = np.flatnonzero(self._mask(filter))
+            k = min(k, len(rows))
+            if k <= 0:
+                return []
+            if len(rows) * 4 < self._size:
+                # A session's sources are usually a small part of the index: only score their rows.
+                scores = self._matrix[rows] @ query
+            else:
+                scores = (self._matrix[:self._size] @ query)[rows]
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._document(rows[i]), float(scores[i])) for i in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(await self.embedding.aembed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._cosine_relevance_score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *,
+                   ids: Optional[List[str]] = None, directory: str = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, directory=directory)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -0,0 +1,225 @@
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import os
+import tempfile
+from typing import AsyncIterable, Iterable, Iterator, List, NamedTuple, Set, Tuple
+
+import PyPDF2
+
+from config.settings import settings
+
+
+class PDFTooLargeError(ValueError):
+    """Raised when a PDF exceeds the configured byte budget."""
+
+
+class PDFPage(NamedTuple):
+    number: int
+    text: str
+    links: Set[str]
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[Tuple[str, Set[str]]]:
+    """
+    Extract text and annotation links from pages [start, stop) of a PDF on disk.
+    Runs inside a worker process, so it must stay a module-level function.
+    """
+    pdf_reader = PyPDF2.PdfReader(path)
+    pages = []
+    for page in pdf_reader.pages[start:stop]:
+        text = page.extract_text()
+        links = set()
+
+        # Try to extract links from PDF
+        if '/Annots' in page:
+            annotations = page['/Annots']
+            for annotation in annotations:
+                if isinstance(annotation, dict) and '/A' in annotation and '/URI' in annotation['/A']:
+                    links.add(annotation['/A']['/URI'])
+
+        pages.append((text.strip() if text else '', links))
+    return pages
+
+
+class PDFExtractor:
+    """
+    Streaming PDF extraction with byte and page budgets.
+
+    Downloads are spooled chunk by chunk to a temporary file instead of being
+    held in memory, and abort as soon as they exceed max_bytes. Page text is
+    extracted in batches on a process pool and yielded in page order as each
+    batch finishes, so consumers can start on the first pages of a large
+    report while later pages are still being parsed.
+    """
+
+    def __init__(self, max_bytes: int = None, max_pages: int = None, workers: int = None, pages_per_task: int = None):
+        self.max_bytes = max_bytes or settings.PDF_MAX_BYTES
+        self.max_pages = max_pages or settings.PDF_MAX_PAGES
+        self.workers = workers or settings.PDF_WORKERS
+        self.pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+        self._pool = None
+
+    @property
+    def pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """Lazily started process pool (spawned, so it is safe alongside event-loop threads)."""
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
+
+    def check_length(self, content_length) -> None:
+        """Reject a download up front when its Content-Length is over budget."""
+        if content_length and int(content_length) > self.max_bytes:
+            raise PDFTooLargeError(f"PDF is {int(content_length)} bytes, limit is {self.max_bytes}")
+
+    def _open_spool(self):
+        return tempfile.NamedTemporaryFile(prefix='scraper-', suffix='.pdf', delete=False)
+
+    def _write_chunk(self, spool, chunk: bytes, written: int) -> int:
+        written += len(chunk)
+        if written > self.max_bytes:
+            raise PDFTooLargeError(f"PDF exceeds the {self.max_bytes} byte limit")
+        spool.write(chunk)
+        return written
+
+    def spool(self, chunks: Iterable[bytes]) -> str:
+        """
+        Write a stream of byte chunks to a temporary file.
+
+        Returns:
+            str: Path of the temporary file; iter_pages/extract remove it when done
+        """
+        spool = self._open_spool()
+        try:
+            written = 0
+            with spool:
+                for chunk in chunks:
+                    written = self._write_chunk(spool, chunk, written)
+        except BaseException:
+            os.unlink(spool.name)
+            raise
+        return spool.name
+
+    async def spool_async(self, chunks: AsyncIterable[bytes]) -> str:
+        """Async variant of spool for httpx streaming responses."""
+        spool = self._open_spool()
+        try:
+            written = 0
+            with spool:
+                async for chunk in chunks:
+                    written = self._write_chunk(spool, chunk, written)
+        except BaseException:
+            os.unlink(spool.name)
+            raise
+        return spool.name
+
+    def iter_pages(self, path: str) -> "PDFPages":
+        """
+        Pages of a spooled PDF in order, up to max_pages.
+
+        The returned iterator owns the temporary file from the moment it is
+        created: the file is deleted once iteration finishes or the iterator
+        is closed (or used as a context manager), even if it was never started.
+        """
+        return PDFPages(self._iter_pages(path), path)
+
+    def _reset_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _batch(self, future: concurrent.futures.Future, path: str, start: int, stop: int) -> List[Tuple[str, Set[str]]]:
+        try:
+            return future.result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            # e.g. a worker died, or the main script has no __main__ guard and every spawned
+            # worker re-ran it; extract in this process instead of losing the document.
+            if self._pool is not None:
+                print(f"PDF worker pool broke ({e}); extracting the remaining pages in-process")
+                self._reset_pool()
+            return _extract_page_range(path, start, stop)
+
+    def _iter_pages(self, path: str) -> Iterator[PDFPage]:
+        page_count = min(len(PyPDF2.PdfReader(path).pages), self.max_pages)
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+
+        futures = []
+        if len(ranges) > 1 and self.workers > 1:
+            try:
+                futures = [self.pool.submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+            except concurrent.futures.process.BrokenProcessPool as e:
+                print(f"PDF worker pool broke ({e}); extracting in-process")
+                self._reset_pool()
+                futures = []
+        if futures:
+            batches = (self._batch(future, path, start, stop) for future, (start, stop) in zip(futures, ranges))
+        else:
+            # Small documents aren't worth the inter-process round trip.
+            batches = (_extract_page_range(path, start, stop) for start, stop in ranges)
+
+        number = 0
+        try:
+            for batch in batches:
+                for text, links in batch:
+                    number += 1
+                    yield PDFPage(number, text, links)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def extract(self, path: str) -> Tuple[str, Set[str]]:
+        """
+        Extract a spooled PDF in one go.
+        Returns tuple of (text_content, set of links found in PDF)
+        """
+        text_content = []
+        links = set()
+        with self.iter_pages(path) as pages:
+            for page in pages:
+                if page.text:
+                    text_content.append(page.text)
+                links.update(page.links)
+        return '\n'.join(text_content), links
+
+
+class PDFPages:
+    """Iterator over the pages of a spooled PDF that deletes the file when exhausted or closed."""
+
+    def __init__(self, pages: Iterator[PDFPage], path: str):
+        self._pages = pages
+        self.path = path
+
+    def __iter__(self) -> "PDFPages":
+        return self
+
+    def __next__(self) -> PDFPage:
+        try:
+            return next(self._pages)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        self._pages.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __enter__(self) -> "PDFPages":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+pdf_extractor = PDFExtractor()
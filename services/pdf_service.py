@@ -2,11 +2,12 @@ import os
 from langchain.chains import RetrievalQA
 from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
 from search_service import search_service
 import json
 import logging
 from ai_service import ai_chat_service
+from bm25_index import session_retriever
+from chunker import chunker
 logger = logging.getLogger(__name__)
 
 os.environ['OPENAI_API_KEY'] = os.getenv("OPENAI_API_KEY")
@@ -28,15 +29,12 @@ def load_documents(sources):
 
 # Initialize LangChain components
 def setup_qa_system(sources):
-    # Load documents
-    documents = load_documents(sources)
+    # Load documents and split them into overlapping, token-sized chunks
+    documents = chunker.split_documents(load_documents(sources))
 
-    # Create an index using OpenAI embeddings and Chroma vector store
-    embeddings = OpenAIEmbeddings()
-    vectorstore = Chroma.from_documents(documents, embeddings)
-
-    # Set up the retrieval-based QA chain
-    retriever = vectorstore.as_retriever()
+    # Set up the retrieval-based QA chain over this session's sources: BM25 straight away,
+    # fused with the vector index once the documents are embedded in the background
+    retriever = session_retriever(documents)
     qa_chain = RetrievalQA.from_chain_type(
         llm=ChatOpenAI(temperature=0),
         chain_type="stuff",
@@ -79,5 +77,6 @@ async def main():
         except Exception as e:
             print(f"Error during query: {e}")
 
-import asyncio
-asyncio.run(main())
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take one token, going into debt if none is available.
+
+        Returns:
+            float: Seconds the caller must wait before using the token
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, so a politeness delay only throttles requests to
+    the same host while other hosts keep being fetched.
+
+    Args:
+        delay (float): Minimum average spacing between requests to one host, in seconds
+        burst (int): Requests a host may receive back to back before the delay applies
+    """
+
+    def __init__(self, delay: float, burst: int = 1):
+        self.delay = delay
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str) -> None:
+        """Block until a request to the host of url is allowed."""
+        if self.delay <= 0:
+            return
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(1 / self.delay, self.burst)
+        bucket.acquire()
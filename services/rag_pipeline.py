@@ -0,0 +1,232 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import queue
+import time
+from typing import Dict, List, NamedTuple, Optional, Union
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from config.settings import settings
+from services.ai_service import ai_chat_service
+from services.bm25_index import bm25_index
+from services.chunker import chunker
+from services.crawl_engine import AsyncCrawler
+from services.scraper_service import scraper_service
+from services.search_service import search_service
+from services.url_canonicalizer import url_key
+from services.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+_embed_executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="rag-embed")
+
+
+class PipelineResult(NamedTuple):
+    query: str
+    hits: List[Dict]
+    documents: List[Document]
+    vectorstore: Union[VectorStore, VectorIndex]
+    # Seconds from the start of run() until each stage finished.
+    timings: Dict[str, float]
+    # Resolves once every document is in the vector store (already done unless retrieval is "hybrid").
+    embedded: concurrent.futures.Future
+
+
+class _Embedder:
+    """
+    Adds documents to a vector store on a worker thread, batching whatever has
+    arrived since the last call. The thread doesn't depend on the event loop,
+    so embedding can carry on after RAGPipeline.run has returned.
+    Queue items are the documents of one source, so a source is never split across batches.
+    """
+
+    def __init__(self, vectorstore, batch_size: int, timings: Dict[str, float], started: float):
+        self.vectorstore = vectorstore
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue()
+        self._cancelled = False
+        self.future = _embed_executor.submit(self._run, timings, started)
+
+    def put(self, source_documents: List[Document]) -> None:
+        self._queue.put(source_documents)
+
+    def close(self) -> None:
+        """No more documents; the future resolves once the waiting ones are embedded."""
+        self._queue.put(None)
+
+    def cancel(self) -> None:
+        self._cancelled = True
+        self._queue.put(None)
+
+    def _run(self, timings: Dict[str, float], started: float) -> None:
+        finished = False
+        while not finished:
+            source_documents = self._queue.get()
+            if source_documents is None:
+                break
+            batch = list(source_documents)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                source_documents = self._queue.get_nowait()
+                if source_documents is None:
+                    finished = True
+                    break
+                batch += source_documents
+            if self._cancelled:
+                return
+            self.vectorstore.add_documents(batch)
+            timings.setdefault('first_embedded', time.perf_counter() - started)
+        timings['embed'] = time.perf_counter() - started
+
+
+class RAGPipeline:
+    """
+    Pipelined compress -> search -> scrape -> chunk -> embed, as used by index.py and style.py.
+
+    Every search hit starts downloading and parsing as soon as the hits
+    arrive, and documents are handed to the vector store in batches as they
+    finish, so embedding overlaps the remaining downloads. With prefetch on,
+    the raw question is searched while the query is still being compressed
+    and its top hits start downloading straight away; hits that the final
+    search also returns reuse those downloads, the rest are cancelled.
+    Unless retrieval is "vector", each source is also added to bm25_index
+    as it loads; with "bm25" nothing is embedded at all. With "hybrid", run()
+    returns as soon as every hit has loaded, since BM25 can already answer;
+    embedding finishes in the background and PipelineResult.embedded tells
+    session_retriever when to fuse the vectors in.
+    """
+
+    def __init__(self, max_results: int = None, embed_batch_size: int = None,
+                 prefetch: Optional[bool] = None, prefetch_results: int = None, retrieval: str = None):
+        self.max_results = max_results or settings.RAG_MAX_RESULTS
+        self.embed_batch_size = embed_batch_size or settings.RAG_EMBED_BATCH_SIZE
+        self.prefetch = settings.RAG_PREFETCH if prefetch is None else prefetch
+        self.prefetch_results = prefetch_results or settings.RAG_PREFETCH_RESULTS
+        self.retrieval = retrieval or settings.RAG_RETRIEVAL
+
+    @staticmethod
+    async def compress(question: str, url: str) -> str:
+        search_query = json.loads(await ai_chat_service.compress_user_query(question, name=url))
+        if search_query["status"] == "error":
+            raise RuntimeError(f"Query compression failed: {search_query.get('error')}")
+        return search_query["response"].strip('"\'')  # Remove both single and double quotes
+
+    async def search(self, query: str, max_results: int) -> List[Dict]:
+        search_result = await search_service.advanced_search_async(query, max_results=max_results)
+        logger.info(search_result)
+        if "error" in search_result:
+            raise RuntimeError(f"Search failed: {search_result['error']}")
+        return [hit for hit in search_result["results"] if hit["url"]]
+
+    @staticmethod
+    async def load(crawler: AsyncCrawler, source: str) -> List[Document]:
+        """
+        Fetch and parse one source into token-sized chunks (see services.chunker), from one
+        document per PDF page or one for a webpage. Errors are logged and yield no documents,
+        like load_documents in index.py.
+        """
+        try:
+            if source.lower().endswith('.pdf'):
+                return await asyncio.to_thread(lambda: chunker.split_documents(
+                    Document(page_content=page.text, metadata={"source": source, "page": page.number - 1})
+                    for page in scraper_service.iter_pdf_pages(source)
+                ))
+            page = await crawler.fetch_page(source)
+            if page is None or not page.content:
+                return []
+            return chunker.split_documents([Document(page_content=page.content, metadata={"source": page.canonical_url or source})])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Skipping {source} due to error: {e}")
+            return []
+
+    async def _prefetch(self, question: str, start_fetch) -> None:
+        try:
+            for hit in await self.search(question, self.prefetch_results):
+                start_fetch(hit["url"])
+        except Exception as e:
+            logger.warning(f"Prefetch skipped: {e}")
+
+    async def run(self, question: str, url: str, vectorstore: Union[VectorStore, VectorIndex]) -> PipelineResult:
+        """
+        Compress the question, search, and load every hit into vectorstore, overlapping the stages.
+
+        Args:
+            question (str): The user's question.
+            url (str): A URL the question is about, passed to query compression.
+            vectorstore (VectorStore or VectorIndex): Where documents are added. A VectorIndex
+                only embeds new or changed pages and drops hits that no longer load.
+
+        Returns:
+            PipelineResult: The compressed query, the search hits, the loaded documents,
+                the vector store, per-stage timings and the embedding future. In hybrid
+                mode the documents may still be being embedded when this returns.
+        """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        crawler = AsyncCrawler(scraper_service)
+        fetches: Dict[str, asyncio.Task] = {}
+        documents: List[Document] = []
+
+        def start_fetch(source: str) -> asyncio.Task:
+            key = url_key(source)
+            if key not in fetches:
+                fetches[key] = asyncio.create_task(self.load(crawler, source))
+            return fetches[key]
+
+        prefetch = asyncio.create_task(self._prefetch(question, start_fetch)) if self.prefetch else None
+        embedder = _Embedder(vectorstore, self.embed_batch_size, timings, started) if self.retrieval != 'bm25' else None
+        try:
+            query = await self.compress(question, url)
+            timings['compress'] = time.perf_counter() - started
+
+            hits = await self.search(query, self.max_results)
+            timings['search'] = time.perf_counter() - started
+            if prefetch is not None and not prefetch.done():
+                # The real hits are in; speculative ones would only start downloads nobody needs.
+                prefetch.cancel()
+            wanted = [start_fetch(hit["url"]) for hit in hits]
+            for task in fetches.values():
+                if task not in wanted:
+                    task.cancel()
+
+            for next_done in asyncio.as_completed(wanted):
+                source_documents = await next_done
+                if source_documents:
+                    timings.setdefault('first_document', time.perf_counter() - started)
+                    documents += source_documents
+                    if self.retrieval != 'vector':
+                        await asyncio.to_thread(bm25_index.add_documents, source_documents)
+                    if embedder is not None:
+                        embedder.put(source_documents)
+            timings['fetch'] = time.perf_counter() - started
+            vanished = [hit["url"] for hit, task in zip(hits, wanted) if not task.result()]
+            if vanished:
+                # A hit that no longer loads shouldn't keep answering from its old content.
+                await asyncio.to_thread(bm25_index.remove, vanished)
+                if isinstance(vectorstore, VectorIndex):
+                    await asyncio.to_thread(vectorstore.remove, vanished)
+
+            if embedder is None:
+                embedded = concurrent.futures.Future()
+                embedded.set_result(None)
+            else:
+                embedder.close()
+                embedded = embedder.future
+                if self.retrieval == 'vector':
+                    await asyncio.wrap_future(embedded)
+            return PipelineResult(query, hits, documents, vectorstore, timings, embedded)
+        except BaseException:
+            if embedder is not None:
+                embedder.cancel()
+            raise
+        finally:
+            for task in [prefetch, *fetches.values()]:
+                if task is not None and not task.done():
+                    task.cancel()
+
+
+rag_pipeline = RAGPipeline()
@@ -1,11 +1,47 @@
-import requests
-from bs4 import BeautifulSoup, NavigableString
-from urllib.parse import urljoin
-import PyPDF2
-import io
+import asyncio
 import concurrent.futures
 import re
-from typing import Dict, Tuple, Set, Optional, List
+from typing import Dict, Iterator, Tuple, Set, Optional, List
+
+from config.settings import settings
+from services.dom_cleaner import dom_cleaner
+from services.http_client import http_client, TYPE_WEBPAGE
+from services.pdf_extractor import pdf_extractor, PDFPage
+
+
+class PageResult(tuple):
+    """
+    A scraped page as a (content, links) pair that also carries the detected
+    document type ('webpage' or 'pdf'), so callers never need to probe the URL again,
+    and the page's rel="canonical" URL when it declares one.
+    """
+
+    def __new__(cls, content: str, links: Set[str], type: str = TYPE_WEBPAGE, canonical_url: Optional[str] = None):
+        page = super().__new__(cls, (content, links))
+        page.type = type
+        page.canonical_url = canonical_url
+        return page
+
+    @property
+    def content(self) -> str:
+        return self[0]
+
+    @property
+    def links(self) -> Set[str]:
+        return self[1]
+
+
+def _run_sync(coro):
+    """Run a coroutine to completion from synchronous code, even inside a running event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # A loop is already running in this thread (e.g. a sync helper called from async code),
+    # so drive the coroutine on a fresh loop in a worker thread instead.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
 
 class ScraperService:
     """
@@ -18,8 +54,27 @@ class ScraperService:
         }
 
     def is_pdf_link(self, url: str) -> bool:
-        """Check if the URL points to a PDF file."""
-        return url.lower().endswith('.pdf') or 'application/pdf' in requests.head(url, headers=self.headers).headers.get('Content-Type', '')
+        """
+        Check if the URL points to a PDF file.
+
+        This costs a HEAD request; results from scrape_page_info already carry
+        the detected type on PageResult.type.
+        """
+        return url.lower().endswith('.pdf') or 'application/pdf' in http_client.head(url, headers=self.headers).headers.get('Content-Type', '')
+
+    def iter_pdf_pages(self, url: str) -> Iterator[PDFPage]:
+        """
+        Stream a PDF to a temporary file and yield its pages as they are extracted.
+
+        The download is capped at PDF_MAX_BYTES and extraction at PDF_MAX_PAGES;
+        page text is extracted on a process pool.
+        """
+        with http_client.get(url, headers=self.headers, stream=True) as response:
+            response.raise_for_status()
+            pdf_extractor.check_length(response.headers.get('Content-Length'))
+            path = pdf_extractor.spool(response.iter_content(chunk_size=64 * 1024))
+        with pdf_extractor.iter_pages(path) as pages:
+            yield from pages
 
     def extract_pdf_content(self, url: str) -> Tuple[str, set]:
         """
@@ -27,161 +82,108 @@ class ScraperService:
         Returns tuple of (text_content, set of links found in PDF)
         """
         try:
-            # Download PDF content
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            # Read PDF content
-            pdf_file = io.BytesIO(response.content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            # Extract text from all pages
             text_content = []
             links = set()
-            
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text.strip())
-                
-                # Try to extract links from PDF
-                if '/Annots' in page:
-                    annotations = page['/Annots']
-                    for annotation in annotations:
-                        if isinstance(annotation, dict) and '/A' in annotation and '/URI' in annotation['/A']:
-                            links.add(annotation['/A']['/URI'])
-            
+            for page in self.iter_pdf_pages(url):
+                if page.text:
+                    text_content.append(page.text)
+                links.update(page.links)
             return '\n'.join(text_content), links
-            
+
         except Exception as e:
             print(f"Error extracting PDF content from {url}: {str(e)}")
             return f"Error processing PDF: {str(e)}", set()
 
+    def parse_html(self, html: str, url: str) -> PageResult:
+        """
+        Clean an HTML page and convert it to text with markdown-styled links.
+        Blacklisted elements and empty nodes are removed in single tree passes by the DOM cleaner.
+        Returns PageResult of (cleaned_text_content, set of absolute links), with canonical_url set
+        """
+        document = dom_cleaner.extract_document(html, url)
+        return PageResult(document.text, document.links, TYPE_WEBPAGE, document.canonical_url)
 
-    def scrape_page_info(self, url: str, depth: int = 1, max_depth: int = 2, visited: Optional[Set[str]] = None) -> Dict[str, Tuple[str, Set[str]]]:
+    def scrape_page_info(self, url: str, depth: int = 1, max_depth: int = 2, visited=None, keep_links: bool = True, job_id: Optional[str] = None) -> Dict[str, PageResult]:
         """
-        Recursively scrape content from a webpage or PDF up to max_depth levels.
-        
-        For a given URL, this function scrapes the content and extracts links.
-        If depth < max_depth, it then follows each extracted link and scrapes them too.
+        Scrape content from a webpage or PDF and follow its links up to max_depth levels.
+
+        Blocking wrapper around scrape_page_info_async for synchronous callers.
         
         Returns:
-            A dictionary mapping each URL (str) to a tuple:
+            A dictionary mapping each URL (str) to a PageResult, which unpacks as
                 (cleaned_text_content: str, links: set)
         """
-        if visited is None:
-            visited = set()
-            
-        # Avoid scraping the same URL multiple times.
-        if url in visited:
-            return {}
-        visited.add(url)
-        
-        try:
-            # If the URL is a PDF, handle it using the dedicated PDF extraction method.
-            if self.is_pdf_link(url):
-                content, links = self.extract_pdf_content(url)
-            else:
-                # Fetch the webpage
-                response = requests.get(url, headers=self.headers)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Remove unwanted elements using a list of selectors.
-                remove_selectors = [
-                    'nav', '.navigation', '#navigation', '.main-nav', '.header-nav',
-                    '[class*="nav"]', '[id*="nav"]', 'header', '.header',
-                    'footer', '.footer', '#footer', '.site-footer', 
-                    '[class*="footer"]', '[id*="footer"]',
-                    'form', 'input', 'textarea', 'select', 'button',
-                    '.form', '#form', '[class*="form"]', '[id*="form"]',
-                    '[type="text"]', '[type="email"]', '[type="password"]',
-                    '[type="submit"]', '[type="button"]',
-                    '.modal', '#modal', '[class*="modal"]',
-                    '.popup', '#popup', '[class*="popup"]',
-                    '.sidebar', '#sidebar', '[class*="sidebar"]',
-                    'meta', 'comment', '.comment', '#comment',
-                    '[class*="comment"]', '[id*="comment"]'
-                ]
-                
-                for selector in remove_selectors:
-                    for element in soup.select(selector):
-                        element.decompose()
-                
-                # Also remove specific tags that are typically not content.
-                for element in soup(['script', 'style', 'iframe', 'svg', 'canvas']):
-                    element.decompose()
-                
-                # Find all links and map them to their full URL and anchor text.
-                link_map = {}
-                for link in soup.find_all('a', href=True):
-                    full_url = urljoin(url, link['href'])
-                    if full_url.startswith(('http://', 'https://')):
-                        anchor_text = link.get_text(strip=True)
-                        if anchor_text:
-                            link_map[link] = (full_url, anchor_text)
-                
-                # Replace each <a> tag with a markdown-styled link.
-                for link, (full_url, anchor_text) in link_map.items():
-                    md_link_str = NavigableString(f'[{anchor_text}]({full_url})')
-                    link.replace_with(md_link_str)
-                
-                # Remove any remaining empty elements.
-                for element in soup.find_all():
-                    if not element.get_text(strip=True):
-                        element.decompose()
-                
-                # Extract and clean the text.
-                text_content = soup.get_text(separator='\n', strip=True)
-                text_lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-                cleaned_text_content = '\n'.join(text_lines)
-                
-                # Gather a set of the full URLs extracted from the link map.
-                links = {full_url for full_url, _ in link_map.values()}
-                content = cleaned_text_content
-            
-            # Store the scraped content and links for the current URL.
-            result = {url: (content, links)}
-            
-            # If we haven't reached the maximum depth, recursively scrape each linked URL.
-            if depth < max_depth:
-                for link in links:
-                    # Recursively update the results. The visited set prevents duplicate work.
-                    result.update(self.scrape_page_info(link, depth=depth + 1, max_depth=max_depth, visited=visited))
-            
-            return result
+        return _run_sync(self.scrape_page_info_async(url, depth=depth, max_depth=max_depth, visited=visited, keep_links=keep_links, job_id=job_id))
 
-        except Exception as e:
-            print(f"Error processing {url}: {str(e)}")
-            return f"Error processing URL: {str(e)}", set()
+    async def scrape_page_info_async(self, url: str, depth: int = 1, max_depth: int = 2, visited=None, keep_links: bool = True, job_id: Optional[str] = None) -> Dict[str, PageResult]:
+        """
+        Concurrently scrape content from a webpage or PDF up to max_depth levels.
+
+        Pages are fetched by the asyncio crawl engine with bounded global and
+        per-host concurrency, so this can be awaited directly from a FastAPI handler.
+        visited may be a set or a compact backend from services.visited_set;
+        keep_links=False drops each page's link set from the result, and a
+        job_id checkpoints the crawl so a rerun with the same id resumes it.
+
+        With CRAWL_MODE=sharded, crawls without a visited set or job_id run
+        on the multi-process ShardedCrawler instead.
+
+        Returns:
+            A dictionary mapping each URL (str) to a PageResult, which unpacks as
+                (cleaned_text_content: str, links: set)
+        """
+        # Imported lazily because the crawl engines depend on this module.
+        from services.crawl_engine import AsyncCrawler
+        from services.sharded_crawler import CRAWL_MODE_SHARDED, sharded_crawler
+
+        if settings.CRAWL_MODE == CRAWL_MODE_SHARDED and visited is None and job_id is None:
+            pages = await asyncio.to_thread(sharded_crawler.crawl, url, depth=depth, max_depth=max_depth)
+            if not keep_links:
+                pages = {page_url: PageResult(page.content, frozenset(), page.type, page.canonical_url)
+                         for page_url, page in pages.items()}
+            return pages
+
+        crawler = AsyncCrawler(self)
+        return await crawler.crawl(url, depth=depth, max_depth=max_depth, visited=visited, keep_links=keep_links, job_id=job_id)
 
     def process_multiple_links(self, urls: List[str]) -> List[Dict]:
         """
         Process multiple URLs concurrently and return their content and links.
         """
+        return _run_sync(self.process_multiple_links_async(urls))
+
+    async def process_multiple_links_async(self, urls: List[str]) -> List[Dict]:
+        """
+        Fetch multiple URLs concurrently (without following their links) and
+        return their content, links and detected type.
+        """
+        from services.crawl_engine import AsyncCrawler
+
+        pages = await AsyncCrawler(self).fetch_many(urls)
+
         results = []
-        
-        # Use ThreadPoolExecutor for concurrent processing
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_url = {executor.submit(self.scrape_page_info, url): url for url in urls}
-            
-            for future in concurrent.futures.as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    content, links = future.result()
-                    results.append({
-                        'url': url,
-                        'content': content,
-                        'links': list(links),
-                        'type': 'pdf' if self.is_pdf_link(url) else 'webpage'
-                    })
-                except Exception as e:
-                    results.append({
-                        'url': url,
-                        'content': f"Error processing {url}: {str(e)}",
-                        'links': [],
-                        'type': 'error'
-                    })
+        for url, page in pages.items():
+            if isinstance(page, Exception):
+                results.append({
+                    'url': url,
+                    'content': f"Error processing {url}: {str(page)}",
+                    'links': [],
+                    'type': 'error'
+                })
+            elif page is None:
+                results.append({
+                    'url': url,
+                    'content': '',
+                    'links': [],
+                    'type': 'skip'
+                })
+            else:
+                results.append({
+                    'url': url,
+                    'content': page.content,
+                    'links': list(page.links),
+                    'type': page.type
+                })
         
         return results
 
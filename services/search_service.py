@@ -1,118 +1,134 @@
+import json
 import os
 from typing import Dict, Any
 from serpapi import GoogleSearch
 
+from config.settings import settings
+from services.cache import SingleFlight, TTLCache, make_key
+from services.http_client import http_client
+
 
 
 class AISearchTools:
     def __init__(self):
         """
         Initialize search tools with Google Search via SerpAPI.
-        
+
         Requires the SERPAPI_API_KEY environment variable to be set.
+        The async methods call SERPAPI_BASE_URL directly; results are cached
+        for SEARCH_CACHE_TTL seconds and concurrent identical queries share
+        one upstream request.
         """
         self.api_key = os.getenv("SERPAPI_API_KEY")
         if not self.api_key:
             raise ValueError("SERPAPI_API_KEY not set in environment variables.")
-    
+        self.cache = TTLCache(max_entries=settings.SEARCH_CACHE_MAX_ENTRIES, ttl=settings.SEARCH_CACHE_TTL)
+        self.single_flight = SingleFlight()
+
+    def _params(self, query: str, num: int) -> Dict[str, Any]:
+        return {
+            "engine": "google",
+            "q": query,
+            "num": num,
+            "api_key": self.api_key
+        }
+
+    @staticmethod
+    def _format_results(query: str, results: Dict[str, Any]) -> Dict[str, Any]:
+        organic_results = results.get("organic_results", [])
+        formatted_results = [
+            {
+                "title": result.get("title", ""),
+                "url": result.get("link", ""),
+                "snippet": result.get("snippet", "")
+            }
+            for result in organic_results
+        ]
+        return {"query": query, "results": formatted_results}
+
+    def _search(self, query: str, num: int) -> Dict[str, Any]:
+        try:
+            search = GoogleSearch(self._params(query, num))
+            return self._format_results(query, search.get_dict())
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _fetch_async(self, query: str, num: int) -> str:
+        response = await http_client.async_client().get(settings.SERPAPI_BASE_URL, params=self._params(query, num))
+        response.raise_for_status()
+        results = response.json()
+        if "error" in results:
+            raise ValueError(results["error"])
+        return json.dumps(self._format_results(query, results))
+
+    async def _search_async(self, query: str, num: int) -> Dict[str, Any]:
+        # The API key is left out of the key on purpose: it doesn't change the results.
+        key = make_key("serpapi", "google", free_text=("q",), q=query, num=num)
+        try:
+            cached = self.cache.get(key)
+            if cached is None:
+                cached = await self.single_flight.do(key, lambda: self._fetch_async(query, num))
+                self.cache.set(key, cached)
+            # Cached as JSON so every caller gets its own copy to modify; the query is the
+            # caller's own spelling, not that of whoever filled the cache.
+            return {**json.loads(cached), "query": query}
+        except Exception as e:
+            return {"error": str(e)}
+
     def get_organization_website(self, organization_name: str) -> Dict[str, Any]:
         """
         Find the website for a given organization using Google Search.
-        
+
         Args:
             organization_name (str): Name of the company or school.
-        
+
         Returns:
             Dict[str, Any]: Search results for the organization.
         """
-        try:
-            search_query = f"{organization_name} official website"
-            params = {
-                "engine": "google",
-                "q": search_query,
-                "num": 3,
-                "api_key": self.api_key
-            }
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            organic_results = results.get("organic_results", [])
-            formatted_results = [
-                {
-                    "title": result.get("title", ""),
-                    "url": result.get("link", ""),
-                    "snippet": result.get("snippet", "")
-                }
-                for result in organic_results
-            ]
-            return {"query": search_query, "results": formatted_results}
-        except Exception as e:
-            return {"error": str(e)}
-    
+        return self._search(f"{organization_name} official website", 3)
+
     def get_person_details(self, full_name: str) -> Dict[str, Any]:
         """
         Retrieve professional details for a given person using Google Search.
-        
+
         Args:
             full_name (str): Full name of the person.
-        
+
         Returns:
             Dict[str, Any]: Professional information search results.
         """
-        try:
-            search_query = f"{full_name} professional profile LinkedIn"
-            params = {
-                "engine": "google",
-                "q": search_query,
-                "num": 3,
-                "api_key": self.api_key
-            }
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            organic_results = results.get("organic_results", [])
-            formatted_results = [
-                {
-                    "title": result.get("title", ""),
-                    "url": result.get("link", ""),
-                    "snippet": result.get("snippet", "")
-                }
-                for result in organic_results
-            ]
-            return {"query": search_query, "results": formatted_results}
-        except Exception as e:
-            return {"error": str(e)}
-    
+        return self._search(f"{full_name} professional profile LinkedIn", 3)
+
     def advanced_search(self, query: str, max_results: int = 5) -> Dict[str, Any]:
         """
         Perform an advanced search with additional context using Google Search.
-        
+
         Args:
             query (str): Search query.
             max_results (int, optional): Maximum number of results. Defaults to 5.
-        
+
         Returns:
             Dict[str, Any]: Comprehensive search results.
         """
-        try:
-            params = {
-                "engine": "google",
-                "q": query,
-                "num": max_results,
-                "api_key": self.api_key
-            }
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            organic_results = results.get("organic_results", [])
-            formatted_results = [
-                {
-                    "title": result.get("title", ""),
-                    "url": result.get("link", ""),
-                    "snippet": result.get("snippet", "")
-                }
-                for result in organic_results
-            ]
-            return {"query": query, "results": formatted_results}
-        except Exception as e:
-            return {"error": str(e)}
+        return self._search(query, max_results)
+
+    async def get_organization_website_async(self, organization_name: str) -> Dict[str, Any]:
+        """
+        Non-blocking, cached variant of get_organization_website.
+        """
+        return await self._search_async(f"{organization_name} official website", 3)
+
+    async def get_person_details_async(self, full_name: str) -> Dict[str, Any]:
+        """
+        Non-blocking, cached variant of get_person_details.
+        """
+        return await self._search_async(f"{full_name} professional profile LinkedIn", 3)
+
+    async def advanced_search_async(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        """
+        Non-blocking, cached variant of advanced_search for use from async handlers.
+        """
+        return await self._search_async(query, max_results)
 
 # Create an instance of the service.
 search_service = AISearchTools()
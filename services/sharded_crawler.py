@@ -0,0 +1,254 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import secrets
+import threading
+import zlib
+from collections import deque
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from config.settings import settings
+from services.scraper_service import PageResult
+from services.url_canonicalizer import canonicalize_url, url_key
+
+CRAWL_MODE_ASYNC = 'async'
+CRAWL_MODE_SHARDED = 'sharded'
+CRAWL_MODES = (CRAWL_MODE_ASYNC, CRAWL_MODE_SHARDED)
+
+# How long an idle worker waits on its queue before checking whether the crawl is over.
+POLL_SECONDS = 0.05
+
+
+def shard_for(url: str, shards: int) -> int:
+    """Stable shard index of url's host, so every page of a host lands on the same worker."""
+    return zlib.crc32(urlparse(url).netloc.lower().encode('utf-8')) % shards
+
+
+class CrawlBroker:
+    """
+    Shared crawl frontier served to the worker processes by a multiprocessing manager.
+
+    Holds one FIFO queue per shard, deduplicates URLs by url_key() on push,
+    and tracks outstanding work: a URL counts from the moment it is pushed
+    until a worker reports it complete, and workers push a page's links
+    before completing it, so the crawl is over exactly when nothing is
+    outstanding.
+    """
+
+    def __init__(self, shards: int, max_pages: int):
+        self.shards = shards
+        self.max_pages = max_pages
+        self._queues = [deque() for _ in range(shards)]
+        self._seen = set()
+        self._documents = set()
+        self._accepted = 0
+        self._outstanding = 0
+        self._aborted = False
+        self._changed = threading.Condition()
+
+    def push_many(self, items: List[Tuple[str, int]]) -> int:
+        """Queue (url, depth) pairs that haven't been seen yet. Returns how many were queued."""
+        queued = 0
+        with self._changed:
+            if self._aborted:
+                return 0
+            for url, depth in items:
+                key = url_key(url)
+                if key in self._seen or self._accepted >= self.max_pages:
+                    continue
+                try:
+                    shard = shard_for(url, self.shards)
+                except ValueError:
+                    continue  # a malformed host can't be fetched anyway
+                self._seen.add(key)
+                self._accepted += 1
+                self._outstanding += 1
+                self._queues[shard].append((url, depth))
+                queued += 1
+            if queued:
+                self._changed.notify_all()
+        return queued
+
+    def pop(self, shard: int, timeout: float) -> Optional[Tuple[str, int]]:
+        """Take the next (url, depth) of a shard, waiting up to timeout seconds. None if empty."""
+        with self._changed:
+            queue = self._queues[shard]
+            if not queue and self._outstanding and timeout > 0:
+                self._changed.wait(timeout)
+            return queue.popleft() if queue else None
+
+    def claim(self, document_key: str) -> bool:
+        """Claim a document for output; False if another page already produced it."""
+        with self._changed:
+            if document_key in self._documents:
+                return False
+            self._documents.add(document_key)
+            self._seen.add(document_key)
+            return True
+
+    def complete(self) -> None:
+        with self._changed:
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._changed.notify_all()
+
+    def finished(self) -> bool:
+        with self._changed:
+            return self._aborted or self._outstanding == 0
+
+    def abort(self) -> None:
+        """End the crawl early: queued URLs are dropped and the workers stop once their fetches in flight are done."""
+        with self._changed:
+            self._aborted = True
+            self._queues = [deque() for _ in range(self.shards)]
+            self._changed.notify_all()
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+BrokerManager.register('get_broker')
+
+
+async def _crawl_shard(broker, shard: int, root_url: str, max_depth: int, concurrency: int) -> Dict[str, tuple]:
+    # Imported here so spawned workers load the crawl engine (and its HTTP client) on their own.
+    from services.crawl_engine import AsyncCrawler
+    from services.scraper_service import scraper_service
+
+    crawler = AsyncCrawler(scraper_service, max_concurrency=concurrency, per_host_limit=concurrency)
+    results = {}
+    tasks = {}
+    while True:
+        # Fill free fetch slots; only block on the broker when nothing is in flight.
+        while len(tasks) < concurrency:
+            item = await asyncio.to_thread(broker.pop, shard, 0 if tasks else POLL_SECONDS)
+            if item is None:
+                break
+            url, depth = item
+            tasks[asyncio.create_task(crawler.fetch_page(url))] = (url, depth)
+
+        if not tasks:
+            if await asyncio.to_thread(broker.finished):
+                return results
+            continue
+
+        done, _ = await asyncio.wait(tasks, timeout=POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            page_url, depth = tasks.pop(task)
+            try:
+                page = task.result()
+            except Exception as e:
+                print(f"Error processing {page_url}: {str(e)}")
+                page = None
+
+            if page is not None and await asyncio.to_thread(broker.claim, url_key(page.canonical_url or page_url)):
+                if page.canonical_url and page_url != root_url:
+                    page_url = page.canonical_url
+                results[page_url] = (page.content, page.links, page.type, page.canonical_url)
+                if depth < max_depth:
+                    links = [(canonicalize_url(link), depth + 1) for link in page.links]
+                    await asyncio.to_thread(broker.push_many, links)
+            await asyncio.to_thread(broker.complete)
+
+
+def _serve(server) -> None:
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass  # serve_forever() ends with sys.exit(), meant for a manager running in its own process
+
+
+def _run_shard(address, authkey: bytes, shard: int, root_url: str, max_depth: int, concurrency: int) -> Dict[str, tuple]:
+    """Worker process entry point: crawl one shard until the whole crawl is done."""
+    manager = BrokerManager(address=address, authkey=authkey)
+    manager.connect()
+    return asyncio.run(_crawl_shard(manager.get_broker(), shard, root_url, max_depth, concurrency))
+
+
+class ShardedCrawler:
+    """
+    Crawl mode that spreads HTML parsing over several processes, used when
+    CRAWL_MODE is "sharded" (or a crawl job asks for mode "sharded").
+
+    The frontier is sharded by host hash across `workers` processes, each
+    running the asyncio crawl engine for its hosts. A CrawlBroker served from
+    this process deduplicates URLs across all workers and detects when the
+    crawl is finished. Output is the same url -> PageResult mapping as
+    ScraperService.scrape_page_info.
+
+    Since every page of a host is crawled by one worker, a single-host site
+    is not sped up; the gain comes from crawls spanning several hosts.
+    """
+
+    def __init__(self, workers: int = None, concurrency: int = None, max_pages: int = None):
+        self.workers = workers or settings.CRAWL_WORKERS
+        self.concurrency = concurrency or settings.CRAWL_PER_HOST_LIMIT
+        self.max_pages = max_pages or settings.CRAWL_MAX_PAGES
+        self._pool = None
+
+    @property
+    def pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """Lazily started worker processes, reused across crawls."""
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
+
+    def crawl(self, url: str, depth: int = 1, max_depth: int = 2, max_pages: int = None) -> Dict[str, PageResult]:
+        """
+        Crawl from url up to max_depth levels across the worker processes,
+        fetching at most max_pages pages (defaults to the crawler's max_pages).
+
+        Returns:
+            A dictionary mapping each URL (str) to a PageResult, which unpacks as
+                (cleaned_text_content: str, links: set)
+        """
+        url = canonicalize_url(url)
+        broker = CrawlBroker(self.workers, max_pages or self.max_pages)
+        authkey = secrets.token_bytes(16)
+
+        # A per-crawl subclass gets its own registry, so the server side can hand out this broker.
+        class BrokerServer(BrokerManager):
+            pass
+
+        BrokerServer.register('get_broker', callable=lambda: broker)
+        server = BrokerServer(address=('127.0.0.1', 0), authkey=authkey).get_server()
+        threading.Thread(target=_serve, args=(server,), daemon=True).start()
+
+        try:
+            broker.push_many([(url, depth)])
+            futures = [
+                self.pool.submit(_run_shard, server.address, authkey, shard, url, max_depth, self.concurrency)
+                for shard in range(self.workers)
+            ]
+            done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+            if any(future.exception() is not None for future in done):
+                # The failed worker's URLs will never be completed, so the others would wait forever.
+                broker.abort()
+                concurrent.futures.wait(futures)
+            results = {}
+            for future in futures:
+                for page_url, (content, links, page_type, canonical_url) in future.result().items():
+                    results[page_url] = PageResult(content, links, page_type, canonical_url)
+            return results
+        except concurrent.futures.BrokenExecutor:
+            # A worker process died and took the pool with it; the next crawl starts a new one.
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            raise
+        finally:
+            server.stop_event.set()
+            server.listener.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+sharded_crawler = ShardedCrawler()
@@ -0,0 +1,138 @@
+import xml.etree.ElementTree as ET
+import zlib
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from config.settings import settings
+from services.http_client import http_client
+from services.url_canonicalizer import canonicalize_url
+
+# Locations tried when robots.txt doesn't list any sitemap.
+FALLBACK_SITEMAPS = ('/sitemap.xml', '/sitemap_index.xml')
+
+GZIP_MAGIC = b'\x1f\x8b'
+CHUNK_SIZE = 64 * 1024
+
+
+def _sitemap_name(tag: str) -> Optional[str]:
+    """
+    Local name of a sitemap protocol element, or None for extension elements
+    such as <image:loc> that must not be mistaken for the page's <loc>.
+    """
+    if tag.startswith('{'):
+        namespace, _, name = tag[1:].partition('}')
+        return name if 'sitemaps.org' in namespace else None
+    return tag
+
+
+class SitemapDiscovery:
+    """
+    Discover a site's URLs from robots.txt and its sitemaps instead of crawling HTML.
+
+    Sitemaps are streamed and parsed incrementally with a pull parser, so large
+    (optionally gzipped) files never sit in memory as a whole. Nested sitemap
+    indexes are followed breadth first, and URLs disallowed by robots.txt
+    are dropped.
+    """
+
+    def __init__(self, user_agent: str = None, max_sitemaps: int = None, max_urls: int = None):
+        self.user_agent = user_agent or http_client.session.headers['User-Agent']
+        self.max_sitemaps = max_sitemaps or settings.SITEMAP_MAX_FILES
+        self.max_urls = max_urls or settings.SITEMAP_MAX_URLS
+
+    def read_robots(self, base_url: str) -> Tuple[Optional[RobotFileParser], List[str]]:
+        """
+        Fetch and parse robots.txt for the site of base_url.
+
+        Returns:
+            tuple: (RobotFileParser or None if unavailable, list of sitemap URLs it declares)
+        """
+        robots_url = urljoin(base_url, '/robots.txt')
+        try:
+            response = http_client.get(robots_url, headers={'User-Agent': self.user_agent}, timeout=10)
+            if response.status_code != 200:
+                return None, []
+        except requests.exceptions.RequestException as e:
+            print(f"robots.txt unavailable for {base_url}: {e}")
+            return None, []
+
+        parser = RobotFileParser(robots_url)
+        parser.parse(response.text.splitlines())
+        return parser, list(parser.site_maps() or [])
+
+    def iter_sitemap(self, sitemap_url: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """
+        Stream one sitemap file.
+
+        Yields:
+            tuple: (kind, loc, lastmod) where kind is 'url' for a page or
+                   'sitemap' for a nested sitemap listed by a sitemap index
+        """
+        with http_client.get(sitemap_url, headers={'User-Agent': self.user_agent}, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            parser = ET.XMLPullParser(events=('end',))
+            decompressor = None
+            loc = lastmod = None
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                # .xml.gz files are usually served as application/octet-stream without Content-Encoding.
+                if decompressor is None:
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if chunk[:2] == GZIP_MAGIC else False
+                parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+
+                for _, element in parser.read_events():
+                    name = _sitemap_name(element.tag)
+                    if name == 'loc' and loc is None:
+                        loc = (element.text or '').strip()
+                    elif name == 'lastmod':
+                        lastmod = (element.text or '').strip() or None
+                    elif name in ('url', 'sitemap'):
+                        if loc:
+                            yield ('url' if name == 'url' else 'sitemap'), loc, lastmod
+                        loc = lastmod = None
+                        element.clear()
+            parser.close()
+
+    def discover(self, base_url: str) -> Dict[str, Optional[str]]:
+        """
+        Collect page URLs from every sitemap reachable from robots.txt.
+
+        Args:
+            base_url (str): Any URL on the site
+
+        Returns:
+            dict: Canonical page URL -> lastmod string (or None); empty if the site has no sitemap
+        """
+        robots, sitemaps = self.read_robots(base_url)
+        if not sitemaps:
+            sitemaps = [urljoin(base_url, path) for path in FALLBACK_SITEMAPS]
+
+        queue = deque(sitemaps)
+        seen_sitemaps = set()
+        urls = {}
+        while queue and len(seen_sitemaps) < self.max_sitemaps and len(urls) < self.max_urls:
+            sitemap_url = queue.popleft()
+            if sitemap_url in seen_sitemaps:
+                continue
+            seen_sitemaps.add(sitemap_url)
+            try:
+                for kind, loc, lastmod in self.iter_sitemap(sitemap_url):
+                    if kind == 'sitemap':
+                        queue.append(urljoin(sitemap_url, loc))
+                        continue
+                    url = canonicalize_url(loc, base=sitemap_url)
+                    if robots is not None and not robots.can_fetch(self.user_agent, url):
+                        continue
+                    urls[url] = lastmod
+                    if len(urls) >= self.max_urls:
+                        break
+            except (requests.exceptions.RequestException, ET.ParseError, zlib.error) as e:
+                print(f"Sitemap {sitemap_url} failed: {e}")
+
+        return urls
+
+
+sitemap_discovery = SitemapDiscovery()
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from config.settings import settings
+
+# Prior belief about a strategy never tried on a domain: one half success in one attempt.
+PRIOR_SUCCESSES = 0.5
+PRIOR_ATTEMPTS = 1.0
+
+
+def domain_of(url: str) -> str:
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+class StrategyMemory:
+    """
+    Per-domain record of which URL extraction strategies work and how long they take.
+
+    Each (domain, strategy) pair keeps exponentially decayed success and
+    attempt counts plus a moving average of its duration. Old observations
+    lose half their weight every half_life seconds, so a site that drops its
+    Cloudflare protection is eventually tried the cheap way again. The table
+    is persisted as JSON after every update.
+    """
+
+    def __init__(self, path: str = None, half_life: float = None):
+        self.path = path or settings.STRATEGY_MEMORY_PATH
+        self.half_life = half_life or settings.STRATEGY_MEMORY_HALF_LIFE
+        self._lock = threading.Lock()
+        self._domains: Dict[str, Dict[str, dict]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, dict]]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable strategy memory {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._domains, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _decayed(self, stats: dict, now: float) -> dict:
+        weight = 0.5 ** (max(now - stats['updated'], 0) / self.half_life)
+        return {**stats, 'successes': stats['successes'] * weight, 'attempts': stats['attempts'] * weight, 'updated': now}
+
+    def record(self, domain: str, strategy: str, success: bool, seconds: float) -> None:
+        """Add one observation of a strategy on a domain and persist the table (best effort)."""
+        now = time.time()
+        with self._lock:
+            strategies = self._domains.setdefault(domain, {})
+            stats = strategies.get(strategy)
+            if stats is None:
+                stats = {'successes': 0.0, 'attempts': 0.0, 'seconds': seconds, 'updated': now}
+            stats = self._decayed(stats, now)
+            stats['successes'] += 1.0 if success else 0.0
+            stats['attempts'] += 1.0
+            stats['seconds'] = 0.7 * stats['seconds'] + 0.3 * seconds
+            strategies[strategy] = stats
+            try:
+                self._save()
+            except OSError as e:
+                # The observation is kept in memory; a full or read-only disk mustn't fail the extraction.
+                print(f"Could not save strategy memory {self.path}: {e}")
+
+    def success_rate(self, domain: str, strategy: str) -> float:
+        stats = self._domains.get(domain, {}).get(strategy)
+        if stats is None:
+            return PRIOR_SUCCESSES / PRIOR_ATTEMPTS
+        stats = self._decayed(stats, time.time())
+        return (stats['successes'] + PRIOR_SUCCESSES) / (stats['attempts'] + PRIOR_ATTEMPTS)
+
+    def best(self, domain: str) -> Optional[str]:
+        """The strategy most likely to succeed on domain, if any has ever succeeded there."""
+        strategies = self._domains.get(domain, {})
+        worked = [name for name, stats in strategies.items() if stats['successes'] > 0]
+        return max(worked, key=lambda name: (self.success_rate(domain, name), -strategies[name]['seconds']), default=None)
+
+    def rank(self, domain: str, strategies: List[str]) -> List[str]:
+        """
+        Order strategies for a domain: likeliest to succeed first, then fastest.
+        Strategies without history keep their given order among equals.
+        """
+        known = self._domains.get(domain, {})
+        return sorted(strategies, key=lambda name: (
+            -self.success_rate(domain, name),
+            known[name]['seconds'] if name in known else 0.0,
+        ))
+
+
+strategy_memory = StrategyMemory()
@@ -0,0 +1,134 @@
+from typing import Optional
+from urllib.parse import quote_plus, unquote_plus, urljoin, urlsplit, urlunsplit
+
+# Query parameters that only carry analytics or session state, never page identity.
+TRACKING_PARAMS = {
+    'gclid', 'dclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok',
+    'phpsessid', 'jsessionid', 'sessionid'
+}
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _remove_dot_segments(path: str) -> str:
+    """Resolve '.' and '..' segments as described in RFC 3986 section 5.2.4."""
+    if '/.' not in path and not path.startswith('.'):
+        return path
+    output = []
+    segments = path.split('/')
+    for segment in segments:
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    if segments[-1] in ('.', '..'):
+        output.append('')
+    return '/'.join(output) or '/'
+
+
+def _is_tracking(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _canonical_query(query: str) -> str:
+    """Sort the query parameters and drop tracking ones; 'flag' and 'flag=' stay as written."""
+    fields = []
+    for field in query.split('&'):
+        if not field:
+            continue
+        name, equals, value = field.partition('=')
+        name, value = unquote_plus(name), unquote_plus(value)
+        if not _is_tracking(name):
+            fields.append((name, equals, value))
+    return '&'.join(quote_plus(name) + equals + quote_plus(value) for name, equals, value in sorted(fields))
+
+
+def canonicalize_url(url: str, base: str = None) -> str:
+    """
+    Normalise a URL so that equivalent spellings of the same document compare equal.
+
+    Resolves it against base, lower-cases the scheme and host, drops default
+    ports, the fragment and tracking parameters, sorts the query string and
+    resolves dot segments. The result is still the URL to fetch.
+
+    A URL that can't be parsed (an invalid port or IPv6 literal) is returned
+    unchanged, so one broken href doesn't break the page or crawl it's on.
+
+    Args:
+        url (str): Absolute or relative URL
+        base (str, optional): URL to resolve relative links against
+
+    Returns:
+        str: Canonical URL
+    """
+    try:
+        if base:
+            url = urljoin(base, url)
+        return _canonicalize(url)
+    except ValueError:
+        return url
+
+
+def _canonicalize(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        # mailto:, javascript:, tel: and friends are returned without their fragment only.
+        return urlunsplit(parts._replace(fragment=''))
+
+    host = (parts.hostname or '').rstrip('.')
+    if ':' in host:
+        # hostname drops the brackets of an IPv6 literal; the URL needs them back.
+        host = f"[{host}]"
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS[scheme]:
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else '')
+        netloc = f"{userinfo}@{netloc}"
+
+    path = _remove_dot_segments(parts.path or '/')
+    return urlunsplit((scheme, netloc, path, _canonical_query(parts.query), ''))
+
+
+def url_key(url: str) -> str:
+    """
+    Deduplication key for the visited checks of the crawlers.
+
+    On top of canonicalize_url it ignores the http/https distinction, a leading
+    'www.' and a trailing slash, which corporate sites serve interchangeably.
+    A URL that can't be parsed is its own key.
+    """
+    url = canonicalize_url(url)
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if parts.scheme not in DEFAULT_PORTS:
+        return urlunsplit(parts)
+    netloc = parts.netloc[4:] if parts.netloc.startswith('www.') else parts.netloc
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('', netloc, path, parts.query, ''))
+
+
+def find_canonical_link(soup, url: str) -> Optional[str]:
+    """
+    Return the canonicalised target of <link rel="canonical"> in a parsed page, if any.
+
+    Args:
+        soup: BeautifulSoup document (or any Tag) to search
+        url (str): URL of the page, used to resolve a relative href
+    """
+    for link in soup.find_all('link', href=True):
+        rel = link.get('rel') or []
+        if isinstance(rel, str):
+            rel = rel.split()
+        if 'canonical' in (value.lower() for value in rel):
+            canonical = canonicalize_url(link['href'], base=url)
+            if canonical.startswith(('http://', 'https://')):
+                return canonical
+    return None
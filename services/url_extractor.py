@@ -1,53 +1,141 @@
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import time
+from urllib.parse import urlparse
+from collections import deque
+import concurrent.futures
 import json
 
-def extract_all_urls(base_url, max_depth=2, delay=1):
+from config.settings import settings
+from services.crawl_checkpoint import CrawlCheckpoint
+from services.http_client import http_client
+from services.politeness import HostRateLimiter
+from services.url_canonicalizer import canonicalize_url, find_canonical_link, url_key
+from services.visited_set import make_visited_set
+
+def _fetch_links(url):
+    """
+    Fetch a page and return its rel="canonical" URL (or None) and the canonical form of every link on it.
+    """
+    response = http_client.get(url, timeout=10)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, 'html.parser')
+    canonical = find_canonical_link(soup, url)
+    links = [canonicalize_url(link['href'], base=url) for link in soup.find_all('a', href=True)]
+    return canonical, links
+
+
+def extract_all_urls(base_url, max_depth=2, delay=1, max_pages=None, max_workers=None, visited_backend=None, job_id=None):
     """
-    Extracts all unique URLs from a given website recursively.
+    Extracts all unique URLs from a given website, breadth first.
+
+    Pages are taken from a FIFO frontier and fetched by a small thread pool.
+    The politeness delay is enforced per host with a token bucket, so it
+    overlaps with fetching and parsing instead of being slept after every page.
 
     :param base_url: The starting URL to scrape.
     :param max_depth: Maximum depth to traverse links.
-    :param delay: Delay (in seconds) between requests to avoid server overload.
+    :param delay: Minimum delay (in seconds) between requests to the same host.
+    :param max_pages: Maximum number of pages to fetch (defaults to CRAWL_MAX_PAGES).
+    :param max_workers: Number of concurrent fetches (defaults to CRAWL_PER_HOST_LIMIT).
+    :param visited_backend: 'set', 'fingerprint' or 'bloom' (defaults to CRAWL_VISITED_BACKEND).
+    :param job_id: Checkpoint the crawl under this id; calling again with the same id
+                   resumes an interrupted crawl without refetching completed pages.
     :return: A set of all unique URLs within the same domain.
     """
-    visited = set()
+    base_url = canonicalize_url(base_url)
+    max_pages = max_pages or settings.CRAWL_MAX_PAGES
+    max_workers = max_workers or settings.CRAWL_PER_HOST_LIMIT
+    limiter = HostRateLimiter(delay)
+
+    visited = make_visited_set(visited_backend)
     all_urls = set()
+    found_keys = make_visited_set(visited_backend)
+    found_keys.add(url_key(base_url))
     excluded_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.pdf', '.svg', '.zip', '.rar', '.mp3', '.PDF', '.docx', '.xlsx', '.pptx', '.doc', '.xls', '.ppt', '.mp4', '.avi', '.wmv', '.flv', '.webm', '.webp'}
 
-    def crawl(url, depth):
-        # Base case: stop if max depth is reached
-        if depth > max_depth or url in visited:
-            return
-        try:
-            # Mark the URL as visited
-            visited.add(url)
-            # Fetch and parse the page
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Extract all links on the page
-            links = soup.find_all('a', href=True)
-            for link in links:
-                full_url = urljoin(url, link['href'])
-                # Ensure the URL is within the same domain and not excluded
-                if full_url.startswith(base_url) and full_url not in visited:
-                    parsed_url = urlparse(full_url)
-                    if not any(parsed_url.path.endswith(ext) for ext in excluded_extensions):
-                        all_urls.add(full_url)
-                        crawl(full_url, depth + 1)  # Recursive crawl
-
-            # Optional: Delay to avoid server overload
-            time.sleep(delay)
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error accessing {url}: {e}")
-
-    # Start crawling from the base URL
-    crawl(base_url, 0)
+    def fetch(url):
+        limiter.acquire(url)
+        return _fetch_links(url)
+
+    checkpoint = CrawlCheckpoint(job_id) if job_id else None
+    state = checkpoint.load() if checkpoint else None
+    if state and (state.results or state.pending):
+        # Resume: completed pages contribute the URLs they found, everything else is refetched.
+        for key in state.visited:
+            visited.add(key)
+        for found in state.results.values():
+            for full_url in found or ():
+                found_keys.add(url_key(full_url))
+                all_urls.add(full_url)
+        if state.finished:
+            return all_urls
+        checkpoint.compact(state)
+        frontier = deque(state.pending)
+        fetched = len(state.results)
+    else:
+        visited.add(url_key(base_url))
+        frontier = deque([(base_url, 0)])
+        fetched = 0
+        if checkpoint:
+            checkpoint.queued(base_url, 0, url_key(base_url))
+
+    in_flight = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while frontier or in_flight:
+                # Keep the pool busy without exceeding the page budget
+                while frontier and len(in_flight) < max_workers and fetched < max_pages:
+                    url, depth = frontier.popleft()
+                    in_flight[executor.submit(fetch, url)] = (url, depth)
+                    fetched += 1
+                if not in_flight:
+                    break
+
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    url, depth = in_flight.pop(future)
+                    try:
+                        canonical, links = future.result()
+                    except (requests.exceptions.RequestException, ValueError) as e:
+                        print(f"Error accessing {url}: {e}")
+                        if checkpoint:
+                            checkpoint.completed(url)
+                        continue
+
+                    # Treat the page's rel="canonical" target as visited too
+                    if canonical:
+                        visited.add(url_key(canonical))
+                        if checkpoint:
+                            checkpoint.visited(url_key(canonical))
+
+                    new_urls = []
+                    for full_url in links:
+                        # Ensure the URL is within the same domain and not excluded
+                        if not full_url.startswith(base_url):
+                            continue
+                        if any(urlparse(full_url).path.endswith(ext) for ext in excluded_extensions):
+                            continue
+                        key = url_key(full_url)
+                        if key not in found_keys:
+                            found_keys.add(key)
+                            all_urls.add(full_url)
+                            new_urls.append(full_url)
+                        if depth < max_depth and key not in visited:
+                            visited.add(key)
+                            frontier.append((full_url, depth + 1))
+                            if checkpoint:
+                                checkpoint.queued(full_url, depth + 1, key)
+                    if checkpoint:
+                        checkpoint.completed(url, new_urls)
+                if checkpoint and checkpoint.due():
+                    checkpoint.flush()
+        # A crawl cut short by max_pages stays resumable with a larger budget.
+        if checkpoint and not frontier:
+            checkpoint.finish()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
     return all_urls
 
 
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+
+from config.settings import settings
+from services.url_canonicalizer import url_key
+
+
+def _key_id(key: str) -> str:
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def content_hash(documents: List[Document], model: str = '') -> str:
+    """
+    Hash of a source's documents (text and metadata) and the embedding model that indexes them.
+    The url_key tag added by VectorIndex is left out, so tagged and untagged copies hash the same.
+    """
+    payload = json.dumps([model, [(doc.page_content, {k: v for k, v in doc.metadata.items() if k != "url_key"})
+                                  for doc in documents]], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def chroma_factory(embeddings, directory: str, collection_name: str) -> VectorStore:
+    from langchain_chroma import Chroma
+    return Chroma(collection_name=collection_name, embedding_function=embeddings, persist_directory=directory)
+
+
+def numpy_factory(embeddings, directory: str, collection_name: str) -> VectorStore:
+    from services.numpy_vector_store import NumpyVectorStore
+    return NumpyVectorStore(embeddings, os.path.join(directory, f"{collection_name}.numpy"))
+
+
+BACKENDS = {'chroma': chroma_factory, 'numpy': numpy_factory}
+
+
+class VectorIndex:
+    """
+    Persistent vector index that only embeds new or changed sources.
+
+    Documents are grouped by source and keyed by url_key() of their
+    canonical URL. A JSON manifest next to the store records each source's
+    content hash and document ids, so re-adding an unchanged page makes no
+    embedding call, a changed page has its old documents replaced, and
+    remove() drops pages that vanished. The vector store and manifest are
+    only opened on first use. VECTOR_INDEX_BACKEND picks the store: Chroma,
+    or the lighter NumpyVectorStore (each keeps its own manifest).
+    """
+
+    def __init__(self, directory: str = None, collection_name: str = None, embeddings=None,
+                 vectorstore_factory: Callable = None, backend: str = None):
+        self.directory = directory or settings.VECTOR_INDEX_DIR
+        self.collection_name = collection_name or settings.VECTOR_INDEX_COLLECTION
+        backend = backend or settings.VECTOR_INDEX_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown vector index backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+        suffix = '' if backend == 'chroma' else f".{backend}"
+        self.manifest_path = os.path.join(self.directory, f"{self.collection_name}{suffix}.manifest.json")
+        self._embeddings = embeddings
+        self._vectorstore_factory = vectorstore_factory or BACKENDS[backend]
+        self._vectorstore = None
+        self._manifest = None
+        self._lock = threading.Lock()
+        self.stats = {'added': 0, 'unchanged': 0, 'replaced': 0, 'removed': 0}
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+            from services.embedding_cache import cached
+            self._embeddings = cached(OpenAIEmbeddings())
+        return self._embeddings
+
+    @property
+    def vectorstore(self) -> VectorStore:
+        if self._vectorstore is None:
+            self._vectorstore = self._vectorstore_factory(self.embeddings, self.directory, self.collection_name)
+        return self._vectorstore
+
+    @property
+    def manifest(self) -> Dict[str, dict]:
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+            except FileNotFoundError:
+                self._manifest = {}
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Ignoring unreadable vector index manifest {self.manifest_path}: {e}")
+                self._manifest = {}
+        return self._manifest
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.manifest_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def add_documents(self, documents: Iterable[Document]) -> Dict[str, int]:
+        """
+        Index documents, skipping sources whose content hasn't changed.
+
+        All documents of a source must be passed in the same call, since a
+        source's documents are replaced as a whole.
+
+        Returns:
+            Dict[str, int]: How many sources were added, replaced or left unchanged by this call.
+        """
+        by_source: Dict[str, List[Document]] = {}
+        for document in documents:
+            key = url_key(document.metadata.get("source", ""))
+            by_source.setdefault(key, []).append(document)
+
+        model = getattr(self.embeddings, 'model', '')
+        counts = {'added': 0, 'unchanged': 0, 'replaced': 0}
+        with self._lock:
+            changed: Dict[str, dict] = {}
+            stale: List[str] = []
+            to_add: List[Document] = []
+            ids: List[str] = []
+            for key, source_documents in by_source.items():
+                digest = content_hash(source_documents, model)
+                entry = self.manifest.get(key)
+                if entry is not None and entry['hash'] == digest:
+                    counts['unchanged'] += 1
+                    continue
+
+                # Deterministic ids: re-adding after a crash between the two writes overwrites instead of duplicating.
+                source_ids = [f"{_key_id(key)}-{i}" for i in range(len(source_documents))]
+                stale += [doc_id for doc_id in (entry['ids'] if entry else []) if doc_id not in source_ids]
+                # Tag copies: the caller's documents are left as they were, so adding them again is a no-op.
+                to_add += [Document(page_content=doc.page_content, metadata={**doc.metadata, "url_key": key})
+                           for doc in source_documents]
+                ids += source_ids
+                changed[key] = {'hash': digest, 'ids': source_ids}
+                counts['replaced' if entry else 'added'] += 1
+
+            if stale:
+                self.vectorstore.delete(ids=stale)
+            if to_add:
+                # One call, so the embeddings of every new or changed source are batched together.
+                self.vectorstore.add_documents(to_add, ids=ids)
+                self.manifest.update(changed)
+                self._save()
+
+        for name, value in counts.items():
+            self.stats[name] += value
+        return counts
+
+    async def aadd_documents(self, documents: Iterable[Document]) -> Dict[str, int]:
+        return await asyncio.to_thread(self.add_documents, list(documents))
+
+    def remove(self, sources: Iterable[str]) -> int:
+        """Delete every document of the given source URLs. Returns how many sources were indexed."""
+        removed = 0
+        with self._lock:
+            for source in sources:
+                entry = self.manifest.pop(url_key(source), None)
+                if entry is not None:
+                    self.vectorstore.delete(ids=entry['ids'])
+                    removed += 1
+            if removed:
+                self._save()
+        self.stats['removed'] += removed
+        return removed
+
+    def __contains__(self, source: str) -> bool:
+        return url_key(source) in self.manifest
+
+    def as_retriever(self, sources: Iterable[str] = None, **search_kwargs):
+        """
+        Retriever over the index, limited to the documents of sources when given,
+        so a session only retrieves from its own search results.
+        """
+        if sources is not None:
+            keys = sorted({url_key(source) for source in sources})
+            if isinstance(self.vectorstore, InMemoryVectorStore):
+                search_kwargs["filter"] = lambda doc: doc.metadata.get("url_key") in keys
+            else:
+                # Chroma rejects an empty $in; no indexed page has an empty key, so [""] matches nothing.
+                search_kwargs["filter"] = {"url_key": {"$in": keys or [""]}}
+        return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+
+
+vector_index = VectorIndex()
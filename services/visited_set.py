@@ -0,0 +1,193 @@
+import hashlib
+import math
+import sys
+from array import array
+from typing import List
+
+from config.settings import settings
+
+BACKEND_SET = 'set'
+BACKEND_FINGERPRINT = 'fingerprint'
+BACKEND_BLOOM = 'bloom'
+
+
+def _digest(item: str, size: int) -> int:
+    return int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=size).digest(), 'little')
+
+
+class FingerprintSet:
+    """
+    Exact visited set holding a 64-bit blake2b fingerprint per item instead of the string.
+
+    Fingerprints live in an array-backed open-addressing table with linear
+    probing, so each entry costs 8 bytes times the table's slack rather than
+    the ~100+ bytes of a str plus its set slot. Two different URLs colliding
+    on 64 bits is vanishingly unlikely below billions of entries.
+    """
+
+    MAX_LOAD = 0.7
+
+    def __init__(self, capacity: int = None):
+        capacity = capacity or settings.CRAWL_VISITED_CAPACITY
+        size = 8
+        while size * self.MAX_LOAD < capacity:
+            size *= 2
+        self._table = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    @staticmethod
+    def _fingerprint(item: str) -> int:
+        # 0 marks an empty slot, so it can't be a fingerprint.
+        return _digest(item, 8) or 1
+
+    def _slot(self, fingerprint: int) -> int:
+        table, mask = self._table, self._mask
+        index = fingerprint & mask
+        while table[index] and table[index] != fingerprint:
+            index = (index + 1) & mask
+        return index
+
+    def add(self, item: str) -> None:
+        fingerprint = self._fingerprint(item)
+        index = self._slot(fingerprint)
+        if self._table[index]:
+            return
+        self._table[index] = fingerprint
+        self._count += 1
+        if self._count > len(self._table) * self.MAX_LOAD:
+            self._grow()
+
+    def _grow(self) -> None:
+        old = self._table
+        self._table = array('Q', bytes(16 * len(old)))
+        self._mask = len(self._table) - 1
+        for fingerprint in old:
+            if fingerprint:
+                self._table[self._slot(fingerprint)] = fingerprint
+
+    def __contains__(self, item: str) -> bool:
+        return bool(self._table[self._slot(self._fingerprint(item))])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def memory_usage(self) -> int:
+        """Approximate size in bytes."""
+        return sys.getsizeof(self._table)
+
+
+def _hash_pair(item: str):
+    # Kirsch-Mitzenmacher double hashing: all k bit indexes come from one 128-bit digest.
+    digest = _digest(item, 16)
+    return digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for capacity items at error_rate false positives."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def add_hashed(self, h1: int, h2: int) -> None:
+        """Set the bits of an item given its two base hashes (see _hash_pair)."""
+        bits, array_ = self.bits, self._array
+        for i in range(self.hashes):
+            index = (h1 + i * h2) % bits
+            array_[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def contains_hashed(self, h1: int, h2: int) -> bool:
+        bits, array_ = self.bits, self._array
+        for i in range(self.hashes):
+            index = (h1 + i * h2) % bits
+            if not array_[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
+
+    def add(self, item: str) -> None:
+        self.add_hashed(*_hash_pair(item))
+
+    def __contains__(self, item: str) -> bool:
+        return self.contains_hashed(*_hash_pair(item))
+
+
+class ScalableBloomFilter:
+    """
+    Probabilistic visited set that grows without a known upper bound (Almeida et al.).
+
+    Whenever the current filter reaches its capacity a new one twice as large
+    is added with a tighter error rate, so the compound false-positive rate
+    stays below error_rate. A false positive means a URL is wrongly treated
+    as visited and skipped; items are never reported missing once added.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity: int = None, error_rate: float = None):
+        self.initial_capacity = capacity or settings.CRAWL_VISITED_CAPACITY
+        self.error_rate = error_rate or settings.CRAWL_BLOOM_ERROR_RATE
+        self.filters: List[BloomFilter] = []
+        self._count = 0
+
+    def add(self, item: str) -> None:
+        h1, h2 = _hash_pair(item)
+        if self._contains_hashed(h1, h2):
+            return
+        if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+            level = len(self.filters)
+            self.filters.append(BloomFilter(
+                self.initial_capacity * self.GROWTH ** level,
+                self.error_rate * (1 - self.TIGHTENING) * self.TIGHTENING ** level
+            ))
+        self.filters[-1].add_hashed(h1, h2)
+        self._count += 1
+
+    def _contains_hashed(self, h1: int, h2: int) -> bool:
+        # The newest filter holds the most items, so check it first.
+        for bloom in reversed(self.filters):
+            if bloom.contains_hashed(h1, h2):
+                return True
+        return False
+
+    def __contains__(self, item: str) -> bool:
+        return self._contains_hashed(*_hash_pair(item))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def memory_usage(self) -> int:
+        """Approximate size in bytes."""
+        return sum(sys.getsizeof(bloom._array) for bloom in self.filters)
+
+
+def set_memory_usage(items: set) -> int:
+    """Approximate size in bytes of a plain set of strings, including the strings."""
+    return sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+
+
+def make_visited_set(backend: str = None):
+    """
+    Create an empty visited set for a crawl.
+
+    Args:
+        backend (str, optional): 'set' (exact, stores strings), 'fingerprint'
+            (exact, 64-bit hashes) or 'bloom' (probabilistic). Defaults to CRAWL_VISITED_BACKEND.
+
+    Returns:
+        An object supporting add() and the in operator
+    """
+    backend = (backend or settings.CRAWL_VISITED_BACKEND).lower()
+    if backend == BACKEND_SET:
+        return set()
+    if backend == BACKEND_FINGERPRINT:
+        return FingerprintSet()
+    if backend == BACKEND_BLOOM:
+        return ScalableBloomFilter()
+    raise ValueError(f"Unknown visited-set backend: {backend}")
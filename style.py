@@ -11,10 +11,13 @@ from langchain_core.runnables import RunnablePassthrough
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores.chroma import Chroma
 
 from services.search_service import search_service
 from services.ai_service import ai_chat_service
+from services.bm25_index import session_retriever
+from services.chunker import chunker
+from services.rag_pipeline import rag_pipeline
+from services.vector_index import vector_index
 from config.settings import settings
 
 # ----------------------------
@@ -50,29 +53,24 @@ def load_documents(sources):
 
 def setup_qa_system(sources):
     """Set up the QA system (RAG chain) based on the provided sources."""
-    # Load documents
+    # Load documents and split them into overlapping, token-sized chunks
     with st.spinner("Loading documents from sources..."):
-        documents = load_documents(sources)
-
-    # Create embeddings and vector store
-    with st.spinner("Creating embeddings and building the vector store..."):
-        embeddings = OpenAIEmbeddings()
-        vectorstore = Chroma.from_documents(
-            documents,
-            embeddings,
-            persist_directory="./chroma_db"
-            )
-        vectorstore.persist() 
+        documents = chunker.split_documents(load_documents(sources))
 
+    # BM25 answers straight away; the vector index (which skips unchanged pages) is
+    # filled in the background and fused in once it is ready (see RAG_RETRIEVAL)
+    with st.spinner("Indexing documents..."):
+        retriever = session_retriever(documents)
+    return build_rag_chain(retriever), retriever
+
+def build_rag_chain(retriever):
+    """Build the RAG chain over a retriever of the vector index."""
     # Initialize GPT-4 model
     llm = ChatOpenAI(
         model="gpt-4o", 
         temperature=0
     )
 
-    # Create the retriever from the vector store
-    retriever = vectorstore.as_retriever()
-
     # Create prompt template
     prompt = ChatPromptTemplate.from_template("""
     Answer the following question based on the provided context:
@@ -93,130 +91,133 @@ def setup_qa_system(sources):
         | StrOutputParser()
     )
 
-    return rag_chain, vectorstore
+    return rag_chain
 
 # ----------------------------
 # Streamlit UI Setup
 # ----------------------------
-st.set_page_config(page_title="Advanced Search & QA System", layout="wide")
-
-# Optionally, inject some custom CSS for a modern look.
-st.markdown(
-    """
-    <style>
-    .reportview-container {
-        background: #f5f5f5;
-    }
-    .sidebar .sidebar-content {
-        background: #e0e0e0;
-    }
-    .stButton>button {
-        background-color: #4CAF50;
-        color: white;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-st.title("🔍 Advanced Search & QA System")
-st.markdown("""
+def main():
+    st.set_page_config(page_title="Advanced Search & QA System", layout="wide")
+
+    # Optionally, inject some custom CSS for a modern look.
+    st.markdown(
+        """
+        <style>
+        .reportview-container {
+            background: #f5f5f5;
+        }
+        .sidebar .sidebar-content {
+            background: #e0e0e0;
+        }
+        .stButton>button {
+            background-color: #4CAF50;
+            color: white;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
+
+    st.title("🔍 Advanced Search & QA System")
+    st.markdown("""
 This application uses LangChain, GPT-4, and vector search to answer questions based on a curated set of documents.
 Use the sidebar to start the process.
 """)
 
-# ----------------------------
-# Sidebar: Initial Setup Form
-# ----------------------------
-with st.sidebar:
-    st.header("Initial Setup")
-    initial_question = st.text_area(
-        "Enter your initial question", 
-        height=100, 
-        help="This question will be compressed and used to search for relevant documents."
-    )
-    input_url = st.text_input(
-        "Enter a URL", 
-        help="Provide a URL relevant to your query (e.g., an article or a PDF link)."
-    )
-    start_process = st.button("Start Search & Setup QA System")
-
-# ----------------------------
-# Process: Compress, Search, and Setup QA
-# ----------------------------
-if start_process:
-    if not initial_question or not input_url:
-        st.error("Please provide both a question and a URL to proceed.")
-    else:
-        try:
-            # Compress the query using the AI chat service (async function)
-            with st.spinner("Compressing your query..."):
-                compressed_query = asyncio.run(
-                    ai_chat_service.compress_user_query(initial_question, name=input_url)
-                )
-                search_query = json.loads(compressed_query)
-                query_text = search_query.get("response", "").strip('"\'')
-
-            st.success("Query compressed!")
-            st.markdown(f"**Compressed Query:** `{query_text}`")
-
-            # Perform an advanced search with the compressed query
-            with st.spinner("Performing advanced search..."):
-                search_result = search_service.advanced_search(query_text, max_results=5)
-            st.success("Search completed!")
-
-            st.markdown("#### Search Results:")
-            st.json(search_result)
-
-            # Extract source URLs from search results
-            sources = [result['url'] for result in search_result.get('results', [])]
-            if sources:
-                st.markdown("**Extracted Sources:**")
-                for src in sources:
-                    st.markdown(f"- {src}")
-            else:
-                st.warning("No sources were found from the search.")
-
-            # Set up the QA system using the extracted sources
-            with st.spinner("Setting up the QA system..."):
-                qa_system, vectorstore = setup_qa_system(sources)
-                st.session_state['qa_system'] = qa_system
-                st.session_state['vectorstore'] = vectorstore
-            st.success("QA system is ready!")
-
-            # Store the QA system and vectorstore in session state for later use.
-
-        except Exception as e:
-            st.error(f"An error occurred during setup: {e}")
-            logger.exception("Error in initial setup:")
-
-# ----------------------------
-# Main Area: Ask Questions to the QA System
-# ----------------------------
-if 'qa_system' in st.session_state and 'vectorstore' in st.session_state:
-    st.header("Ask a Question")
-    user_query = st.text_input("Enter your question for the QA system", key="qa_input")
-    if st.button("Get Answer"):
-        if not user_query:
-            st.error("Please enter a question.")
+    # ----------------------------
+    # Sidebar: Initial Setup Form
+    # ----------------------------
+    with st.sidebar:
+        st.header("Initial Setup")
+        initial_question = st.text_area(
+            "Enter your initial question", 
+            height=100, 
+            help="This question will be compressed and used to search for relevant documents."
+        )
+        input_url = st.text_input(
+            "Enter a URL", 
+            help="Provide a URL relevant to your query (e.g., an article or a PDF link)."
+        )
+        start_process = st.button("Start Search & Setup QA System")
+
+    # ----------------------------
+    # Process: Compress, Search, and Setup QA
+    # ----------------------------
+    if start_process:
+        if not initial_question or not input_url:
+            st.error("Please provide both a question and a URL to proceed.")
         else:
             try:
-                with st.spinner("Processing your question..."):
-                    # Invoke the QA system (RAG chain)
-                    response = st.session_state['qa_system'].invoke(user_query)
-                st.markdown("### Answer:")
-                st.write(response)
-
-                # Retrieve and display source documents for transparency
-                relevant_docs = st.session_state['vectorstore'].similarity_search(user_query)
-                st.markdown("### Sources:")
-                if relevant_docs:
-                    for doc in relevant_docs:
-                        source_info = doc.metadata.get("source", "Unknown")
-                        st.markdown(f"- {source_info}")
+                # Compress, search, scrape and embed in one pipeline: each search hit is
+                # scraped as soon as it arrives and embedded while the others download.
+                with st.spinner("Searching, loading and embedding documents..."):
+                    result = asyncio.run(rag_pipeline.run(initial_question, input_url, vector_index))
+
+                st.success("Query compressed!")
+                st.markdown(f"**Compressed Query:** `{result.query}`")
+
+                st.success("Search completed!")
+                st.markdown("#### Search Results:")
+                st.json(result.hits)
+
+                # Source URLs from the search results
+                sources = [hit['url'] for hit in result.hits]
+                if sources:
+                    st.markdown("**Extracted Sources:**")
+                    for src in sources:
+                        st.markdown(f"- {src}")
                 else:
-                    st.info("No source documents were found.")
+                    st.warning("No sources were found from the search.")
+                st.caption(f"Loaded {len(result.documents)} documents; stage timings (s): {result.timings}; "
+                           f"vector index: {vector_index.stats}")
+
+                with st.spinner("Setting up the QA system..."):
+                    # Only retrieve from this session's sources, not everything in the persistent index
+                    retriever = session_retriever(result.documents, rag_pipeline.retrieval, skip_index=True,
+                                                  embedded=result.embedded)
+                    st.session_state['qa_system'] = build_rag_chain(retriever)
+                    st.session_state['retriever'] = retriever
+                st.success("QA system is ready!")
+
+                # Store the QA system and retriever in session state for later use.
 
             except Exception as e:
-                st.error(f"Error during query processing: {e}")
-                logger.exception("Error processing QA query:")
+                st.error(f"An error occurred during setup: {e}")
+                logger.exception("Error in initial setup:")
+
+    # ----------------------------
+    # Main Area: Ask Questions to the QA System
+    # ----------------------------
+    if 'qa_system' in st.session_state and 'retriever' in st.session_state:
+        st.header("Ask a Question")
+        user_query = st.text_input("Enter your question for the QA system", key="qa_input")
+        if st.button("Get Answer"):
+            if not user_query:
+                st.error("Please enter a question.")
+            else:
+                try:
+                    with st.spinner("Processing your question..."):
+                        # Invoke the QA system (RAG chain)
+                        response = st.session_state['qa_system'].invoke(user_query)
+                    st.markdown("### Answer:")
+                    st.write(response)
+
+                    # Retrieve and display source documents for transparency
+                    relevant_docs = st.session_state['retriever'].invoke(user_query)
+                    st.markdown("### Sources:")
+                    if relevant_docs:
+                        for doc in relevant_docs:
+                            source_info = doc.metadata.get("source", "Unknown")
+                            st.markdown(f"- {source_info}")
+                    else:
+                        st.info("No source documents were found.")
+
+                except Exception as e:
+                    st.error(f"Error during query processing: {e}")
+                    logger.exception("Error processing QA query:")
+
+
+# Streamlit runs the script as __main__; the guard keeps spawned worker processes
+# (PDF extraction) from re-running the UI when they import it.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, NamedTuple, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# The services read their settings at import time and some refuse to load without API keys;
+# the tests never reach the real APIs, and the on-disk HTTP cache stays off.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("SERPAPI_API_KEY", "test")
+os.environ.setdefault("HTTP_CACHE_ENABLED", "0")
+os.environ.setdefault("LLM_CACHE_SQLITE_PATH", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubRequest(NamedTuple):
+    method: str
+    path: str
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def query(self) -> Dict[str, str]:
+        return {name: values[0] for name, values in parse_qs(urlsplit(self.path).query).items()}
+
+
+StubResponse = Tuple[int, Dict[str, str], Union[bytes, str]]
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Start local HTTP servers for a test: stub_server(respond) returns the base URL
+    of a server that answers every request with respond(StubRequest), a
+    (status, headers, body) tuple. The servers are shut down after the test.
+    """
+    servers = []
+
+    def start(respond: Callable[[StubRequest], StubResponse]) -> str:
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = StubRequest(self.command, self.path, dict(self.headers), self.rfile.read(length))
+                status, headers, body = respond(request)
+                body = body.encode() if isinstance(body, str) else body
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _reply
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
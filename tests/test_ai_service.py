@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import pytest
+
+from config.settings import settings
+from prompts.summarizer_prompt import SUMMARIZER_PROMPT
+from services.ai_service import AIChatService
+from services.http_client import http_client
+
+
+def chat_completion(request):
+    model = json.loads(request.body)["model"]
+    return 200, {"Content-Type": "application/json"}, json.dumps({
+        "id": "stub", "object": "chat.completion", "created": 0, "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Stub answer."}}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    })
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def service(stub_server, calls):
+    def respond(request):
+        calls.append(request)
+        return chat_completion(request)
+
+    service = AIChatService()
+    service.api_key, service.base_url, service.cache = "stub", f"{stub_server(respond)}/v1", None
+    return service
+
+
+def test_models_and_chains_are_reused_within_a_loop(service):
+    async def build():
+        chain = service._chain(SUMMARIZER_PROMPT, ["question", "urls"], settings.OPENAI_LINK_MODEL)
+        assert service._chain(SUMMARIZER_PROMPT, ["question", "urls"], settings.OPENAI_LINK_MODEL) is chain
+        assert service._llm(settings.OPENAI_LINK_MODEL) is service._llm(settings.OPENAI_LINK_MODEL)
+        assert service._llm(settings.OPENAI_LINK_MODEL, temperature=0) is not service._llm(settings.OPENAI_LINK_MODEL)
+        return chain
+
+    first = asyncio.run(build())
+    # A new loop needs new connections, so it gets its own models and chains.
+    assert asyncio.run(build()) is not first
+
+
+def test_every_model_uses_the_shared_client_which_closes_with_its_loop(service, calls):
+    clients = []
+
+    async def call():
+        client = http_client.async_client()
+        assert service._llm(settings.OPENAI_LINK_MODEL).http_async_client is client
+        assert service._llm(settings.OPENAI_CHAT_MODEL, streaming=True).http_async_client is client
+        responses = await asyncio.gather(*(service.get_relevant_link_summary("q", ["https://example.com"]) for _ in range(5)))
+        assert all(json.loads(response)["response"] == "Stub answer." for response in responses)
+        clients.append(client)
+
+    asyncio.run(call())
+    assert len(calls) == 5
+    assert clients[0].is_closed
+
+
+def test_closed_client_is_replaced(service):
+    async def call():
+        llm = service._llm(settings.OPENAI_LINK_MODEL)
+        await http_client.aclose()
+        replacement = service._llm(settings.OPENAI_LINK_MODEL)
+        assert replacement is not llm
+        assert replacement.http_async_client is http_client.async_client()
+        assert not replacement.http_async_client.is_closed
+
+    asyncio.run(call())
@@ -0,0 +1,40 @@
+from langchain_core.documents import Document
+
+from services.bm25_index import BM25Index
+
+
+def page(source, text, chunks=1):
+    return [Document(page_content=f"{text} part{i}", metadata={"source": source}) for i in range(chunks)]
+
+
+def test_oldest_sources_are_evicted_beyond_the_cap():
+    index = BM25Index(max_documents=4)
+    index.add_documents(page("https://a.example/", "apples", 2))
+    index.add_documents(page("https://b.example/", "bananas", 2))
+    # Re-adding an unchanged source makes it the most recent one.
+    assert index.add_documents(page("https://a.example/", "apples", 2))["unchanged"] == 1
+
+    counts = index.add_documents(page("https://c.example/", "cherries", 2))
+    assert counts == {'added': 1, 'unchanged': 0, 'replaced': 0, 'evicted': 1}
+    assert len(index) == 4
+    assert "https://b.example/" not in index
+    assert not index.search("bananas")
+    assert index.search("apples") and index.search("cherries")
+
+
+def test_sources_of_the_current_call_are_kept_over_the_cap():
+    index = BM25Index(max_documents=2)
+    index.add_documents(page("https://a.example/", "apples"))
+    counts = index.add_documents(page("https://b.example/", "bananas", 3))
+    assert counts['evicted'] == 1
+    assert len(index) == 3
+    assert [document.page_content for document, _ in index.search("bananas part1")][0] == "bananas part1"
+
+
+def test_evicted_space_is_reclaimed():
+    index = BM25Index(max_documents=3)
+    for number in range(20):
+        index.add_documents(page(f"https://{number}.example/", f"word{number}"))
+    assert len(index) == 3
+    assert len(index._documents) < 8
+    assert index.search("word19")
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from services.browser_pool import BrowserPool
+
+
+class FakeDriver:
+    """Stands in for a selenium WebDriver; only quit() is called by the pool."""
+
+    def __init__(self):
+        self.quit_calls = 0
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.fixture
+def drivers():
+    return []
+
+
+def make_pool(drivers, **kwargs):
+    def factory():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+    return BrowserPool(driver_factory=factory, **kwargs)
+
+
+def test_sequential_sessions_reuse_one_browser(drivers):
+    pool = make_pool(drivers, size=2, max_pages=100)
+    for _ in range(5):
+        with pool.session() as driver:
+            assert driver is drivers[0]
+
+    assert len(drivers) == 1
+    assert drivers[0].quit_calls == 0
+    assert pool.stats['launches'] == 1
+    assert pool.stats['reuses'] == 4
+    assert pool.report()['reuse_rate'] == pytest.approx(4 / 5)
+
+
+def test_browser_is_recycled_after_max_pages(drivers):
+    pool = make_pool(drivers, size=1, max_pages=2)
+    for _ in range(4):
+        with pool.session():
+            pass
+
+    assert len(drivers) == 2
+    assert [driver.quit_calls for driver in drivers] == [1, 1]
+    assert pool.stats['recycled'] == 2
+
+
+def test_browser_is_replaced_when_the_caller_raises(drivers):
+    pool = make_pool(drivers, size=1, max_pages=100)
+    with pytest.raises(RuntimeError):
+        with pool.session():
+            raise RuntimeError("page crashed")
+    with pool.session() as driver:
+        assert driver is drivers[1]
+
+    assert drivers[0].quit_calls == 1
+    assert pool.stats['crashed'] == 1
+
+
+def test_concurrent_sessions_never_exceed_pool_size(drivers):
+    pool = make_pool(drivers, size=2, max_pages=100)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def browse():
+        with pool.session():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=browse) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) <= 2
+    assert len(drivers) <= 2
+    assert pool.stats['checkouts'] == 8
+
+
+def test_close_quits_idle_browsers(drivers):
+    pool = make_pool(drivers, size=2, max_pages=100)
+    with pool.session():
+        pass
+    pool.close()
+
+    assert drivers[0].quit_calls == 1
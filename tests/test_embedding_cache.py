@@ -0,0 +1,71 @@
+import asyncio
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from services.embedding_cache import CachedEmbeddings
+
+
+class CountingFakeEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+    texts: int = 0
+    model: str = "fake-embedding"
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+@pytest.fixture
+def fake():
+    return CountingFakeEmbeddings(size=16)
+
+
+CHUNKS = [f"Chunk {i} of the annual report." for i in range(50)] + ["Accept cookies", "Contact us"] * 10
+
+
+def test_duplicate_texts_are_embedded_once_in_batches(fake, tmp_path):
+    embeddings = CachedEmbeddings(fake, directory=str(tmp_path), batch_size=16)
+
+    vectors = embeddings.embed_documents(CHUNKS)
+
+    assert fake.texts == 52
+    assert fake.calls == 4
+    assert np.allclose(vectors, fake.embed_documents(CHUNKS), atol=1e-6)
+
+
+def test_warm_cache_makes_no_embedding_calls(fake, tmp_path):
+    first = CachedEmbeddings(fake, directory=str(tmp_path)).embed_documents(CHUNKS)
+    fake.calls = fake.texts = 0
+
+    # A fresh wrapper, as in a new process, reopens the stored vectors.
+    warm = CachedEmbeddings(fake, directory=str(tmp_path))
+    assert warm.embed_documents(CHUNKS) == first
+    assert asyncio.run(warm.aembed_documents(CHUNKS)) == first
+
+    assert fake.calls == 0
+    assert warm.stats['misses'] == 0
+
+
+def test_only_new_texts_are_embedded(fake, tmp_path):
+    CachedEmbeddings(fake, directory=str(tmp_path)).embed_documents(CHUNKS)
+    fake.calls = fake.texts = 0
+
+    warm = CachedEmbeddings(fake, directory=str(tmp_path))
+    asyncio.run(warm.aembed_documents(CHUNKS + ["A new chunk."]))
+
+    assert (fake.calls, fake.texts) == (1, 1)
+
+
+def test_models_do_not_share_vectors(fake, tmp_path):
+    CachedEmbeddings(fake, directory=str(tmp_path)).embed_documents(CHUNKS)
+    fake.calls = 0
+
+    CachedEmbeddings(fake, directory=str(tmp_path), model="other-model").embed_documents(CHUNKS)
+
+    assert fake.calls == 1
@@ -0,0 +1,50 @@
+import email.utils
+import time
+
+import pytest
+
+from services.http_cache import HTTPCache, freshness
+from services.http_client import HTTPClient
+
+NOW = 1_700_000_000.0
+
+
+def http_date(timestamp):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+@pytest.mark.parametrize("headers, lifetime", [
+    ({"Cache-Control": "max-age=60"}, 60),
+    ({"Cache-Control": "max-age=60", "Age": "50"}, 10),
+    ({"Cache-Control": "max-age=60", "Age": "100"}, -40),
+    ({"Cache-Control": "max-age=60", "Date": http_date(NOW - 20)}, 40),
+    ({"Expires": http_date(NOW + 60), "Date": http_date(NOW)}, 60),
+    ({"Expires": http_date(NOW + 60), "Date": http_date(NOW), "Age": "30"}, 30),
+])
+def test_lifetime_counts_the_age_of_the_response(headers, lifetime):
+    storable, expires_at, must_revalidate = freshness(headers, now=NOW)
+    assert storable and not must_revalidate
+    assert expires_at == NOW + lifetime
+
+
+def test_cached_response_has_no_made_up_reason(tmp_path, stub_server):
+    base_url = stub_server(lambda request: (200, {"Cache-Control": "max-age=60", "Content-Type": "text/plain"}, "body"))
+    client = HTTPClient(cache=HTTPCache(str(tmp_path)))
+    assert client.get(base_url).reason == "OK"
+    cached = client.get(base_url)
+    assert cached.from_cache and cached.text == "body"
+    assert cached.reason is None
+
+
+def test_aged_response_is_not_served_from_cache(tmp_path, stub_server):
+    calls = []
+
+    def respond(request):
+        calls.append(request)
+        return 200, {"Cache-Control": "max-age=60", "Age": "120", "Date": http_date(time.time())}, "body"
+
+    client = HTTPClient(cache=HTTPCache(str(tmp_path)))
+    base_url = stub_server(respond)
+    client.get(base_url)
+    client.get(base_url)
+    assert len(calls) == 2
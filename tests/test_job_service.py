@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+import pytest
+
+from config.settings import settings
+from services.crawl_engine import AsyncCrawler
+from services.job_service import JobService
+from services.scraper_service import scraper_service
+
+
+@pytest.fixture
+def service(tmp_path):
+    return JobService(path=str(tmp_path / "jobs" / "jobs.sqlite3"), workers=1)
+
+
+def test_database_is_created_on_first_use(service):
+    assert not os.path.exists(os.path.dirname(service.path))
+    assert service.get("missing") is None
+    assert os.path.exists(service.path)
+
+
+
+@pytest.mark.parametrize("params", [
+    {"max_depth": -1}, {"max_depth": 100}, {"max_depth": "2"}, {"max_depth": True},
+    {"max_pages": 0}, {"max_pages": 10 ** 9},
+])
+def test_crawl_limits_are_validated(service, params):
+    with pytest.raises(ValueError):
+        asyncio.run(service.submit("crawl", {"url": "https://example.com/", **params}))
+    assert service._queue is None
+
+
+def test_crawl_stops_at_max_pages(stub_server):
+    def respond(request):
+        number = int(request.path.strip("/") or 0)
+        links = "".join(f"<a href='/{number * 10 + i}'>page</a>" for i in range(1, 10))
+        return 200, {"Content-Type": "text/html"}, f"<html><body><p>Page {number} {links}</p></body></html>"
+
+    async def crawl(url):
+        return [page_url async for page_url, _ in AsyncCrawler(scraper_service).iter_pages(url, max_depth=3, max_pages=5)]
+
+    assert len(asyncio.run(crawl(stub_server(respond) + "/"))) == 5
+
+
+def test_unknown_default_mode_is_reported(service, monkeypatch):
+    monkeypatch.setattr(settings, "CRAWL_MODE", "threaded")
+    with pytest.raises(ValueError, match="'threaded'"):
+        asyncio.run(service.submit("crawl", {"url": "https://example.com/"}))
@@ -0,0 +1,25 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import jobs
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(jobs.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("body", ["[1, 2]", '"crawl"', "null", "{not json"])
+def test_submit_rejects_a_body_that_is_not_an_object(client, body):
+    response = client.post("/jobs", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "The body must be a JSON object."
+
+
+def test_submit_rejects_an_unbounded_crawl(client):
+    response = client.post("/jobs", json={"kind": "crawl", "url": "https://example.com/", "max_depth": 1000})
+    assert response.status_code == 400
+    assert "max_depth" in response.json()["detail"]
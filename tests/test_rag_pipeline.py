@@ -0,0 +1,86 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore
+
+import services.bm25_index
+import services.rag_pipeline
+from services.ai_service import ai_chat_service
+from services.bm25_index import BM25Index, FusionRetriever, session_retriever
+from services.rag_pipeline import RAGPipeline
+from services.search_service import search_service
+from services.vector_index import VectorIndex
+
+
+class GatedEmbeddings(DeterministicFakeEmbedding):
+    """Embeds nothing until the test opens the gate."""
+
+    gate: threading.Event
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def embed_documents(self, texts):
+        assert self.gate.wait(timeout=10)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch, gate):
+    index = VectorIndex(str(tmp_path), embeddings=GatedEmbeddings(size=16, gate=gate),
+                        vectorstore_factory=lambda embeddings, *args: InMemoryVectorStore(embeddings))
+    monkeypatch.setattr(services.bm25_index, "vector_index", index)
+    bm25 = BM25Index()
+    monkeypatch.setattr(services.bm25_index, "bm25_index", bm25)
+    monkeypatch.setattr(services.rag_pipeline, "bm25_index", bm25)
+    return index
+
+
+@pytest.fixture
+def site(stub_server, monkeypatch):
+    base_url = stub_server(lambda request: (
+        200, {"Content-Type": "text/html"}, f"<html><body><p>Page {request.path[1:]} about topic{request.path[1:]}.</p></body></html>"
+    ))
+
+    async def compress(question, name):
+        return json.dumps({"type": "agent", "status": "finished", "response": question})
+
+    async def search(query, max_results=5):
+        return {"query": query, "results": [{"title": "", "url": f"{base_url}/{i}", "snippet": ""} for i in range(max_results)]}
+
+    monkeypatch.setattr(ai_chat_service, "compress_user_query", compress)
+    monkeypatch.setattr(search_service, "advanced_search_async", search)
+    return base_url
+
+
+def test_hybrid_run_returns_before_embedding_and_fuses_vectors_in_later(site, index, gate):
+    pipeline = RAGPipeline(max_results=3, retrieval="hybrid")
+    result = asyncio.run(asyncio.wait_for(pipeline.run("report", site, index), timeout=10))
+    assert len(result.documents) == 3
+    assert not result.embedded.done()
+
+    retriever = session_retriever(result.documents, "hybrid", skip_index=True, embedded=result.embedded)
+    assert isinstance(retriever, FusionRetriever)
+    assert retriever.invoke("topic1")[0].page_content == "Page 1 about topic1."
+    assert not retriever.semantic.done()
+
+    gate.set()
+    result.embedded.result(timeout=10)
+    assert retriever.semantic.result(timeout=10).invoke("topic1")
+    assert index.stats["added"] == 3
+
+
+def test_vector_run_waits_for_embedding(site, index, gate):
+    gate.set()
+    result = asyncio.run(RAGPipeline(max_results=2, retrieval="vector").run("report", site, index))
+    assert result.embedded.done() and "embed" in result.timings
+    assert index.stats["added"] == 2
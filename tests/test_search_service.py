@@ -0,0 +1,62 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from config.settings import settings
+from services.search_service import AISearchTools
+
+
+@pytest.fixture
+def queries():
+    return []
+
+
+@pytest.fixture
+def search(stub_server, queries, monkeypatch):
+    def respond(request):
+        query = request.query["q"]
+        queries.append(query)
+        time.sleep(0.1)  # upstream latency, so concurrent callers overlap
+        return 200, {"Content-Type": "application/json"}, json.dumps({"organic_results": [
+            {"title": f"{query} result {i}", "link": f"https://example.com/{i}", "snippet": "..."} for i in range(3)
+        ]})
+
+    monkeypatch.setattr(settings, "SERPAPI_BASE_URL", f"{stub_server(respond)}/search.json")
+    return AISearchTools()
+
+
+def test_concurrent_identical_searches_share_one_upstream_call(search, queries):
+    async def run():
+        return await asyncio.gather(*(search.advanced_search_async("acme annual report") for _ in range(20)))
+
+    results = asyncio.run(run())
+
+    assert queries == ["acme annual report"]
+    assert all(result == results[0] for result in results)
+    assert len(results[0]["results"]) == 3
+    # Every caller gets its own copy.
+    results[0]["results"].clear()
+    assert len(results[1]["results"]) == 3
+
+
+def test_repeated_search_is_served_from_cache_with_the_callers_query(search, queries):
+    async def run():
+        await search.advanced_search_async("acme annual report")
+        return await search.advanced_search_async("ACME  annual report")
+
+    result = asyncio.run(run())
+
+    assert queries == ["acme annual report"]
+    assert result["query"] == "ACME  annual report"
+
+
+def test_different_searches_are_not_coalesced(search, queries):
+    async def run():
+        await asyncio.gather(search.advanced_search_async("acme"), search.advanced_search_async("acme", max_results=3),
+                             search.get_organization_website_async("Acme"))
+
+    asyncio.run(run())
+
+    assert len(queries) == 3
@@ -0,0 +1,52 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+import services.sharded_crawler as sharded
+from services.sharded_crawler import CrawlBroker, ShardedCrawler, shard_for
+
+ROOT = "http://127.0.0.1:1/"
+
+
+def test_abort_ends_the_crawl_for_every_worker():
+    broker = CrawlBroker(shards=2, max_pages=10)
+    broker.push_many([(ROOT, 1), ("http://127.0.0.2:1/", 1)])
+    broker.pop(shard_for(ROOT, 2), timeout=0)
+    assert not broker.finished()
+    broker.abort()
+    assert broker.finished()
+    assert broker.pop(0, timeout=0) is None and broker.pop(1, timeout=0) is None
+    assert broker.push_many([("http://127.0.0.3:1/", 1)]) == 0
+
+
+def test_failed_worker_does_not_hang_the_crawl(monkeypatch):
+    run_shard = sharded._run_shard
+
+    def failing_run_shard(address, authkey, shard, root_url, max_depth, concurrency):
+        if shard != shard_for(root_url, 2):
+            return run_shard(address, authkey, shard, root_url, max_depth, concurrency)
+        # Take the root URL and die with it, so it is never completed.
+        manager = sharded.BrokerManager(address=address, authkey=authkey)
+        manager.connect()
+        manager.get_broker().pop(shard, 1.0)
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(sharded, "_run_shard", failing_run_shard)
+    crawler = ShardedCrawler(workers=2)
+    # Threads stand in for the worker processes, which couldn't see the patched entry point.
+    crawler._pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    outcome = []
+
+    def crawl():
+        try:
+            crawler.crawl(ROOT)
+        except RuntimeError as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=crawl, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "the crawl is still waiting on the failed worker"
+    assert str(outcome[0]) == "worker died"
+    crawler.close()
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import summarizer
+from services.ai_service import ai_chat_service
+from services.search_service import search_service
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(summarizer.router)
+    return TestClient(app)
+
+
+def events(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+async def compressed_query(question, name):
+    return json.dumps({"type": "agent", "status": "finished", "response": f'"{question}"'})
+
+
+def test_failed_search_ends_the_stream_with_an_error_event(client, monkeypatch):
+    async def failing_search(query, max_results=5):
+        raise RuntimeError("search backend down")
+
+    monkeypatch.setattr(ai_chat_service, "compress_user_query", compressed_query)
+    monkeypatch.setattr(search_service, "advanced_search_async", failing_search)
+    response = client.post("/summarize", json={"question": "annual report", "url": "https://example.com"})
+    assert response.status_code == 200
+    assert [(event["type"], event["status"]) for event in events(response)] == [("query", "finished"), ("error", "error")]
+    assert events(response)[-1]["error"] == "search backend down"
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from services.crawl_engine import AsyncCrawler
+from services.scraper_service import scraper_service
+from services.sharded_crawler import CrawlBroker
+from services.url_canonicalizer import canonicalize_url, url_key
+from services.url_extractor import extract_all_urls
+
+BROKEN_LINKS = ["http://127.0.0.1:99999/", "http://127.0.0.1:abc/", "http://[::1/broken"]
+
+
+@pytest.mark.parametrize("url", BROKEN_LINKS)
+def test_unparseable_urls_are_returned_unchanged(url):
+    assert canonicalize_url(url) == url
+    assert canonicalize_url(url, base="https://example.com/") == url
+    assert url_key(url)
+
+
+def test_query_keeps_flags_and_blank_values_apart():
+    url = "https://Example.com/a/../b?view&q=&utm_source=x&b=a+b#top"
+    assert canonicalize_url(url) == "https://example.com/b?b=a+b&q=&view"
+    assert url_key("https://example.com/b?view") != url_key("https://example.com/b?view=")
+
+
+@pytest.fixture
+def site(stub_server):
+    def respond(request):
+        if request.path == "/":
+            links = "".join(f"<a href='{href}'>link</a>" for href in BROKEN_LINKS + ["/good"])
+            return 200, {"Content-Type": "text/html"}, f"<html><body><p>Home {links}</p></body></html>"
+        if request.path == "/good":
+            return 200, {"Content-Type": "text/html"}, "<html><body><p>Good page</p></body></html>"
+        return 404, {"Content-Type": "text/plain"}, "Not found"
+
+    return stub_server(respond) + "/"
+
+
+def test_broken_links_do_not_end_the_crawl(site):
+    pages = asyncio.run(AsyncCrawler(scraper_service).crawl(site, max_depth=2))
+    assert set(pages) == {site, site + "good"}
+    assert "Good page" in pages[site + "good"].content
+
+
+def test_broken_links_do_not_end_the_url_extraction(site):
+    assert extract_all_urls(site, max_depth=2, delay=0) == {site + "good"}
+
+
+def test_broken_links_do_not_break_the_sharded_frontier():
+    broker = CrawlBroker(shards=2, max_pages=10)
+    # Bad ports fail when fetched; a host that can't be sharded is dropped.
+    assert broker.push_many([(url, 1) for url in BROKEN_LINKS + ["http://127.0.0.1/good"]]) == 3